@@ -1,7 +1,7 @@
 import asyncio
 from logging.config import fileConfig
 
-from sqlalchemy import pool
+from sqlalchemy import pool, inspect
 from sqlalchemy.engine import Connection
 from sqlalchemy.ext.asyncio import async_engine_from_config
 
@@ -58,7 +58,20 @@ def run_migrations_offline() -> None:
 
 
 def do_run_migrations(connection: Connection) -> None:
-    context.configure(connection=connection, target_metadata=target_metadata)
+    # SQLite can not alter most column properties in place, autogenerated migrations copy the table instead
+    context.configure(
+        connection=connection,
+        target_metadata=target_metadata,
+        render_as_batch=connection.dialect.name == "sqlite",
+    )
+
+    if connection.dialect.name == "sqlite" and not inspect(connection).has_table("alembic_version"):
+        # the migration history alters PostgreSQL constraints in place, which SQLite can not do;
+        # a new SQLite database gets the current schema at once and later migrations from there on
+        target_metadata.create_all(connection)
+        context.get_context().stamp(context.script, "heads")
+        connection.commit()
+        return
 
     with context.begin_transaction():
         context.run_migrations()
@@ -0,0 +1,33 @@
+"""Add coin statistics shards
+
+Revision ID: 5b2f9c1d7e40
+Revises: 0c73f61f75a7
+Create Date: 2026-10-19 09:15:12.418203
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "5b2f9c1d7e40"
+down_revision: Union[str, None] = "0c73f61f75a7"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("coin_statistics", sa.Column("shard", sa.Integer(), server_default="0", nullable=False))
+    op.drop_constraint("uix_user_id_coin_id", "coin_statistics", type_="unique")
+    op.create_unique_constraint("uix_user_id_coin_id_shard", "coin_statistics", ["user_id", "coin_id", "shard"])
+
+
+def downgrade() -> None:
+    # merge shards (merge_statistics_shards) before downgrading, rows left outside shard 0 are dropped here
+    op.execute("DELETE FROM coin_statistics WHERE shard <> 0")
+    op.drop_constraint("uix_user_id_coin_id_shard", "coin_statistics", type_="unique")
+    op.create_unique_constraint("uix_user_id_coin_id", "coin_statistics", ["user_id", "coin_id"])
+    op.drop_column("coin_statistics", "shard")
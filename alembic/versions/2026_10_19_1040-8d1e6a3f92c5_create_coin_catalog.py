@@ -0,0 +1,72 @@
+"""Create coin catalog
+
+Revision ID: 8d1e6a3f92c5
+Revises: 5b2f9c1d7e40
+Create Date: 2026-10-19 10:40:27.905114
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "8d1e6a3f92c5"
+down_revision: Union[str, None] = "5b2f9c1d7e40"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "coin_catalog",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("name", sa.String(length=100), nullable=False),
+        sa.Column("symbol", sa.String(length=100), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("id"),
+        sa.UniqueConstraint("name", "symbol", name="uix_coin_catalog_name_symbol"),
+    )
+
+    # backfill the catalog and point every holding at its catalog entry
+    op.execute("INSERT INTO coin_catalog (name, symbol) SELECT DISTINCT name, symbol FROM coins")
+    op.add_column("coins", sa.Column("catalog_id", sa.Integer(), nullable=True))
+    op.execute(
+        "UPDATE coins SET catalog_id = coin_catalog.id FROM coin_catalog "
+        "WHERE coin_catalog.name = coins.name AND coin_catalog.symbol = coins.symbol"
+    )
+    op.alter_column("coins", "catalog_id", nullable=False)
+
+    op.create_foreign_key("coins_catalog_id_fkey", "coins", "coin_catalog", ["catalog_id"], ["id"])
+    op.create_index(op.f("ix_coins_catalog_id"), "coins", ["catalog_id"], unique=False)
+    op.create_unique_constraint("uix_user_id_catalog_id", "coins", ["user_id", "catalog_id"])
+
+    op.drop_constraint("uix_user_coin_name_symbol", "coins", type_="unique")
+    op.drop_index(op.f("ix_coins_symbol"), table_name="coins")
+    op.drop_index(op.f("ix_coins_name"), table_name="coins")
+    op.drop_column("coins", "symbol")
+    op.drop_column("coins", "name")
+
+
+def downgrade() -> None:
+    op.add_column("coins", sa.Column("name", sa.String(length=100), nullable=True))
+    op.add_column("coins", sa.Column("symbol", sa.String(length=100), nullable=True))
+    op.execute(
+        "UPDATE coins SET name = coin_catalog.name, symbol = coin_catalog.symbol FROM coin_catalog "
+        "WHERE coin_catalog.id = coins.catalog_id"
+    )
+    op.alter_column("coins", "name", nullable=False)
+    op.alter_column("coins", "symbol", nullable=False)
+
+    op.create_index(op.f("ix_coins_name"), "coins", ["name"], unique=False)
+    op.create_index(op.f("ix_coins_symbol"), "coins", ["symbol"], unique=False)
+    op.create_unique_constraint("uix_user_coin_name_symbol", "coins", ["user_id", "name", "symbol"])
+
+    op.drop_constraint("uix_user_id_catalog_id", "coins", type_="unique")
+    op.drop_index(op.f("ix_coins_catalog_id"), table_name="coins")
+    op.drop_constraint("coins_catalog_id_fkey", "coins", type_="foreignkey")
+    op.drop_column("coins", "catalog_id")
+
+    op.drop_table("coin_catalog")
@@ -0,0 +1,45 @@
+"""Create portfolio snapshots
+
+Revision ID: c47a0e5b19d8
+Revises: 8d1e6a3f92c5
+Create Date: 2026-10-19 12:05:51.230667
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "c47a0e5b19d8"
+down_revision: Union[str, None] = "8d1e6a3f92c5"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "portfolio_snapshots",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("coin_id", sa.Integer(), nullable=False),
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("holdings", sa.Numeric(precision=25, scale=10), nullable=False),
+        sa.Column("invested_total", sa.Numeric(precision=25, scale=10), nullable=False),
+        sa.Column("realized_total", sa.Numeric(precision=25, scale=10), nullable=False),
+        sa.Column("last_price", sa.Numeric(precision=25, scale=10), nullable=False),
+        sa.Column("value", sa.Numeric(precision=25, scale=10), nullable=False),
+        sa.ForeignKeyConstraint(["coin_id"], ["coins.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("id"),
+        sa.UniqueConstraint("user_id", "coin_id", "day", name="uix_user_id_coin_id_day"),
+    )
+    op.create_index("ix_portfolio_snapshots_user_id_day", "portfolio_snapshots", ["user_id", "day"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_portfolio_snapshots_user_id_day", table_name="portfolio_snapshots")
+    op.drop_table("portfolio_snapshots")
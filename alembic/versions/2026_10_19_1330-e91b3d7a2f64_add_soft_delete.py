@@ -0,0 +1,62 @@
+"""Add soft delete to users and coins
+
+Revision ID: e91b3d7a2f64
+Revises: c47a0e5b19d8
+Create Date: 2026-10-19 13:30:12.418903
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "e91b3d7a2f64"
+down_revision: Union[str, None] = "c47a0e5b19d8"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+NOT_DELETED = sa.text("deleted_at IS NULL")
+
+
+def upgrade() -> None:
+    op.add_column("users", sa.Column("deleted_at", sa.TIMESTAMP(timezone=True), nullable=True))
+    op.create_index(op.f("ix_users_deleted_at"), "users", ["deleted_at"], unique=False)
+    op.add_column("coins", sa.Column("deleted_at", sa.TIMESTAMP(timezone=True), nullable=True))
+    op.create_index(op.f("ix_coins_deleted_at"), "coins", ["deleted_at"], unique=False)
+
+    # usernames, emails and coins only have to be unique among the rows that are not deleted
+    op.drop_index("ix_users_username", table_name="users")
+    op.create_index(op.f("ix_users_username"), "users", ["username"], unique=False)
+    op.create_index(
+        "uix_users_username_active", "users", ["username"], unique=True, postgresql_where=NOT_DELETED
+    )
+    op.drop_constraint("users_email_key", "users", type_="unique")
+    op.create_index("uix_users_email_active", "users", ["email"], unique=True, postgresql_where=NOT_DELETED)
+
+    op.drop_constraint("uix_user_id_catalog_id", "coins", type_="unique")
+    op.create_index(
+        "uix_user_id_catalog_id", "coins", ["user_id", "catalog_id"], unique=True, postgresql_where=NOT_DELETED
+    )
+
+
+def downgrade() -> None:
+    # soft deleted rows would break the restored unique constraints
+    op.execute("DELETE FROM coins WHERE deleted_at IS NOT NULL")
+    op.execute("DELETE FROM users WHERE deleted_at IS NOT NULL")
+
+    op.drop_index("uix_user_id_catalog_id", table_name="coins")
+    op.create_unique_constraint("uix_user_id_catalog_id", "coins", ["user_id", "catalog_id"])
+
+    op.drop_index("uix_users_email_active", table_name="users")
+    op.create_unique_constraint("users_email_key", "users", ["email"])
+    op.drop_index("uix_users_username_active", table_name="users")
+    op.drop_index(op.f("ix_users_username"), table_name="users")
+    op.create_index(op.f("ix_users_username"), "users", ["username"], unique=True)
+
+    op.drop_index(op.f("ix_coins_deleted_at"), table_name="coins")
+    op.drop_column("coins", "deleted_at")
+    op.drop_index(op.f("ix_users_deleted_at"), table_name="users")
+    op.drop_column("users", "deleted_at")
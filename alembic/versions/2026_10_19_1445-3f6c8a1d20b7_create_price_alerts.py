@@ -0,0 +1,50 @@
+"""Create price alerts
+
+Revision ID: 3f6c8a1d20b7
+Revises: e91b3d7a2f64
+Create Date: 2026-10-19 14:45:37.902114
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "3f6c8a1d20b7"
+down_revision: Union[str, None] = "e91b3d7a2f64"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "price_alerts",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("catalog_id", sa.Integer(), nullable=False),
+        sa.Column("direction", sa.String(length=5), nullable=False),
+        sa.Column("threshold", sa.Numeric(precision=25, scale=10), nullable=False),
+        sa.Column("created_at", sa.TIMESTAMP(timezone=True), nullable=False),
+        sa.Column("triggered_at", sa.TIMESTAMP(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(["catalog_id"], ["coin_catalog.id"]),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("id"),
+    )
+    op.create_index(op.f("ix_price_alerts_user_id"), "price_alerts", ["user_id"], unique=False)
+    op.create_index(
+        "ix_price_alerts_active",
+        "price_alerts",
+        ["catalog_id"],
+        unique=False,
+        postgresql_where=sa.text("triggered_at IS NULL"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_price_alerts_active", table_name="price_alerts")
+    op.drop_index(op.f("ix_price_alerts_user_id"), table_name="price_alerts")
+    op.drop_table("price_alerts")
@@ -0,0 +1,38 @@
+"""Create coin leaderboards
+
+Revision ID: a7d4e2c9b815
+Revises: 3f6c8a1d20b7
+Create Date: 2026-10-19 16:00:44.516078
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "a7d4e2c9b815"
+down_revision: Union[str, None] = "3f6c8a1d20b7"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "coin_leaderboards",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("catalog_id", sa.Integer(), nullable=False),
+        sa.Column("holders", sa.Integer(), nullable=False),
+        sa.Column("top", sa.JSON(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(["catalog_id"], ["coin_catalog.id"]),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("id"),
+        sa.UniqueConstraint("catalog_id"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("coin_leaderboards")
@@ -0,0 +1,38 @@
+"""Create user emails
+
+Revision ID: 6e3b9d0a4c21
+Revises: a7d4e2c9b815
+Create Date: 2026-10-19 17:00:18.204631
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "6e3b9d0a4c21"
+down_revision: Union[str, None] = "a7d4e2c9b815"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "user_emails",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("email", sa.String(length=70), nullable=False),
+        sa.Column("username", sa.String(length=50), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("id"),
+        sa.UniqueConstraint("email"),
+    )
+
+    # only the primary's table is used; the live users of every other shard have to be copied in as well
+    op.execute("INSERT INTO user_emails (email, username) SELECT email, username FROM users WHERE deleted_at IS NULL")
+
+
+def downgrade() -> None:
+    op.drop_table("user_emails")
@@ -1,21 +1,201 @@
 import os
+from typing import Annotated, Literal
+from functools import lru_cache
 
-from pydantic import PostgresDsn, BaseModel
+from pydantic import AnyUrl, PostgresDsn, BaseModel, Field, UrlConstraints
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
 class RunConfig(BaseModel):
+    environment: Literal["development", "staging", "production"] = "production"
     host: str = "127.0.0.1"
     port: int = 8000
-    reload: bool = True
+    # the single-process auto-reloading development server; `workers` processes otherwise
+    reload: bool = False
+    workers: int = Field(default_factory=lambda: os.cpu_count() or 1, ge=1)
+    timeout_graceful_shutdown: int = Field(default=30, ge=0)
+    timeout_keep_alive: int = Field(default=5, ge=0)
+
+
+SqliteDsn = Annotated[AnyUrl, UrlConstraints(allowed_schemes=["sqlite+aiosqlite"])]
+
+
+class SqliteConfig(BaseModel):
+    # applied to every connection of a sqlite+aiosqlite database
+    journal_mode: Literal["wal", "delete", "truncate", "persist", "memory"] = "wal"
+    # NORMAL is safe with WAL: a power loss may drop the last commits but never corrupts the database
+    synchronous: Literal["off", "normal", "full", "extra"] = "normal"
+    mmap_size: int = Field(default=256 * 1024 * 1024, ge=0)
+    cache_size_kib: int = Field(default=64 * 1024, ge=0)
+    busy_timeout_ms: int = Field(default=5000, ge=0)
+    # connections serving GET requests; writes share a single connection and queue for it
+    read_pool_size: int = Field(default=4, ge=1)
+    write_timeout_s: float = Field(default=30, gt=0)
 
 
 class DatabaseConfig(BaseModel):
-    url: PostgresDsn | None = None
+    # PostgreSQL, or SQLite for single node deployments, e.g. "sqlite+aiosqlite:///./cryptosphere.db"
+    url: PostgresDsn | SqliteDsn | None = None
     echo: bool | None = None
     echo_pool: bool | None = None
     pool_size: int | None = None
     max_overflow: int | None = None
+    # further databases for user data; `url` stays the primary shard that also holds the coin catalog
+    shard_urls: list[PostgresDsn] = []
+    shard_virtual_nodes: int = Field(default=64, ge=1)
+    sqlite: SqliteConfig = SqliteConfig()
+
+
+class TransactionsConfig(BaseModel):
+    coalesce_window_ms: float = Field(default=0, ge=0)
+    coalesce_max_batch: int = Field(default=100, ge=1)
+
+
+class StatisticsConfig(BaseModel):
+    shards: int = Field(default=8, ge=1)
+    sharded_user_ids: set[int] = set()
+    merge_idle_s: float = Field(default=300, gt=0)
+    merge_interval_s: float = Field(default=60, gt=0)
+
+
+class CatalogConfig(BaseModel):
+    # catalog ids cached per worker process, least recently used ones go first
+    cache_size: int = Field(default=100_000, ge=1)
+
+
+class SearchConfig(BaseModel):
+    enabled: bool = True
+    top_k: int = Field(default=10, ge=1)
+    reload_interval_s: float = Field(default=300, gt=0)
+    # fuzzy matching through similarity(); needs `CREATE EXTENSION pg_trgm`
+    trigram_fallback: bool = False
+    trigram_threshold: float = Field(default=0.3, ge=0, le=1)
+
+
+class SnapshotsConfig(BaseModel):
+    # off on nodes that only serve reads; the chart keeps reading what the other nodes wrote
+    enabled: bool = True
+    flush_interval_s: float = Field(default=60, gt=0)
+    chart_max_points: int = Field(default=365, ge=3)
+
+
+class AnalyticsConfig(BaseModel):
+    max_workers: int = Field(default=2, ge=1)
+    cache_size: int = Field(default=1024, ge=1)
+    risk_free_rate: float = 0.0
+
+
+class SimulationConfig(BaseModel):
+    max_workers: int = Field(default=2, ge=1)
+    # paths simulated by one worker task
+    batch_paths: int = Field(default=1000, ge=1)
+    max_paths: int = Field(default=20000, ge=1)
+    max_days: int = Field(default=1825, ge=1)
+    timeout_s: float = Field(default=10, gt=0)
+    cache_size: int = Field(default=256, ge=1)
+    # used for coins without enough trade prices to estimate them
+    default_volatility: float = Field(default=0.8, ge=0)
+    default_correlation: float = Field(default=0.5, ge=0, lt=1)
+
+
+class AlertsConfig(BaseModel):
+    enabled: bool = True
+    # fired alerts waiting for delivery; when full new ones are dropped and fire again after a reload
+    queue_size: int = Field(default=10000, ge=1)
+    delivery_batch: int = Field(default=500, ge=1)
+    reload_interval_s: float = Field(default=60, gt=0)
+    max_per_user: int = Field(default=100, ge=1)
+
+
+class EncodingConfig(BaseModel):
+    # smaller list responses are sent uncompressed, compression would cost more than it saves
+    min_compress_size: int = Field(default=1024, ge=0)
+    zstd_level: int = Field(default=3, ge=1, le=22)
+    gzip_level: int = Field(default=6, ge=1, le=9)
+
+
+class LeaderboardConfig(BaseModel):
+    enabled: bool = True
+    top_k: int = Field(default=10, ge=1)
+    # holders tracked per coin beyond the top K, so a top holder selling rarely needs a refill from the database
+    tracked: int = Field(default=50, ge=1)
+    persist_interval_s: float = Field(default=30, gt=0)
+    # picks up the changes written by other worker processes
+    reseed_interval_s: float = Field(default=600, gt=0)
+
+
+class ExportConfig(BaseModel):
+    batch_size: int = Field(default=1000, ge=1)
+    gzip_level: int = Field(default=6, ge=1, le=9)
+
+
+class PurgeConfig(BaseModel):
+    # off when another deployment or a scheduled job purges the same databases
+    enabled: bool = True
+    batch_size: int = Field(default=1000, ge=1)
+    # pause between two batches, gives replicas and concurrent writers room to catch up
+    pause_s: float = Field(default=0.05, ge=0)
+    interval_s: float = Field(default=60, gt=0)
+
+
+class RateLimitRule(BaseModel):
+    rate: float = Field(gt=0)
+    burst: int = Field(ge=1)
+
+
+class RateLimitConfig(BaseModel):
+    enabled: bool = True
+    # requests per second and bucket size of every user across all routes
+    user_rate: float = Field(default=20, gt=0)
+    user_burst: int = Field(default=40, ge=1)
+    # stricter per-user limits for single routes, keyed by "<METHOD> <route path>", e.g. "POST /coins/"
+    routes: dict[str, RateLimitRule] = {"POST /coins/": RateLimitRule(rate=5, burst=10)}
+    # "memory" or the import path of a shared backend class, e.g. "mypackage.limits:RedisBackend"
+    backend: str = "memory"
+    max_keys: int = Field(default=100_000, ge=1)
+
+
+class ConcurrencyConfig(BaseModel):
+    enabled: bool = True
+    initial_limit: int = Field(default=20, ge=1)
+    min_limit: int = Field(default=2, ge=1)
+    max_limit: int = Field(default=200, ge=1)
+    # the limit shrinks when responses start later than this or connections wait longer than this in the pool
+    target_latency_ms: float = Field(default=250, gt=0)
+    target_pool_wait_ms: float = Field(default=20, gt=0)
+    backoff: float = Field(default=0.9, gt=0, lt=1)
+    # share of the limit that only writes may use
+    write_share: float = Field(default=0.2, ge=0, lt=1)
+    exempt_paths: set[str] = {"/docs", "/redoc", "/openapi.json"}
+
+
+class TracingConfig(BaseModel):
+    enabled: bool = False
+    # share of new traces recorded; requests carrying a `traceparent` header follow its sampled flag
+    sample_ratio: float = Field(default=0.01, ge=0, le=1)
+    # "log", "file", "otlp", "memory" or the import path of an exporter class, e.g. "mypackage.tracing:Exporter"
+    exporter: str = "log"
+    file_path: str = "traces.jsonl"
+    otlp_endpoint: str = "http://127.0.0.1:4318/v1/traces"
+    service_name: str = "cryptosphereapi"
+    # finished spans waiting for export; beyond it new spans are dropped
+    queue_size: int = Field(default=10000, ge=1)
+    export_batch: int = Field(default=512, ge=1)
+    export_interval_s: float = Field(default=5, gt=0)
+    # longer statements are cut in the `db.statement` attribute
+    max_statement_length: int = Field(default=1000, ge=0)
+
+
+class SlowQueryConfig(BaseModel):
+    enabled: bool = True
+    threshold_ms: float = Field(default=200, ge=0)
+    # the most recent slow statements kept in memory per worker process
+    buffer_size: int = Field(default=200, ge=1)
+    max_parameters_length: int = Field(default=500, ge=0)
+    # EXPLAIN ANALYZE runs the statement once more: only sampled SELECTs, and never in production
+    explain_sample_ratio: float = Field(default=0.1, ge=0, le=1)
+    # required in the `X-Admin-Token` header of the admin endpoints, which are disabled without it
+    admin_token: str | None = None
 
 
 class Settings(BaseSettings):
@@ -28,6 +208,32 @@ class Settings(BaseSettings):
     )
     run: RunConfig = RunConfig()
     db: DatabaseConfig = DatabaseConfig()
+    transactions: TransactionsConfig = TransactionsConfig()
+    statistics: StatisticsConfig = StatisticsConfig()
+    catalog: CatalogConfig = CatalogConfig()
+    search: SearchConfig = SearchConfig()
+    snapshots: SnapshotsConfig = SnapshotsConfig()
+    analytics: AnalyticsConfig = AnalyticsConfig()
+    simulation: SimulationConfig = SimulationConfig()
+    alerts: AlertsConfig = AlertsConfig()
+    encoding: EncodingConfig = EncodingConfig()
+    leaderboard: LeaderboardConfig = LeaderboardConfig()
+    export: ExportConfig = ExportConfig()
+    purge: PurgeConfig = PurgeConfig()
+    rate_limit: RateLimitConfig = RateLimitConfig()
+    concurrency: ConcurrencyConfig = ConcurrencyConfig()
+    tracing: TracingConfig = TracingConfig()
+    slow_queries: SlowQueryConfig = SlowQueryConfig()
+
+
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """Build the settings on first use and reuse them afterwards."""
+    return Settings()
 
 
-settings = Settings()
+def __getattr__(name: str):
+    # `from api.config import settings` keeps working, but the environment is read only when it is asked for
+    if name == "settings":
+        return get_settings()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
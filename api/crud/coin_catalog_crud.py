@@ -0,0 +1,171 @@
+"""
+Module for the shared coin catalog: resolving coin names and symbols to catalog ids.
+"""
+
+from typing import Iterable
+from collections import OrderedDict
+
+from loguru import logger
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api.config import get_settings
+from api.database.dialects import dialect_insert
+from api.database.models import CoinCatalogORM
+from api.database.shard_router import shard_router
+
+CoinKey = tuple[str, str]
+
+
+class CoinCatalogCache:
+    """
+    Per-process map of (name, symbol) to catalog id, holding at most `max_size` coins.
+
+    Catalog rows are never deleted or renamed, so a cached id stays valid for the lifetime of the database;
+    users may add any coin to the catalog, so the least recently used ids are evicted.
+    """
+
+    def __init__(self, max_size: int | None = None):
+        """Without `max_size` it is read from the settings on first use."""
+        self.max_size = max_size
+        self._ids: OrderedDict[CoinKey, int] = OrderedDict()
+
+    def configure_from_settings(self) -> None:
+        """Take the maximum size from the application settings."""
+        if self.max_size is None:
+            self.max_size = get_settings().catalog.cache_size
+
+    def get(self, name: str, symbol: str) -> int | None:
+        catalog_id = self._ids.get((name, symbol))
+        if catalog_id is not None:
+            self._ids.move_to_end((name, symbol))
+        return catalog_id
+
+    def put(self, name: str, symbol: str, catalog_id: int) -> None:
+        if self.max_size is None:
+            self.configure_from_settings()
+
+        self._ids[(name, symbol)] = catalog_id
+        self._ids.move_to_end((name, symbol))
+        while len(self._ids) > self.max_size:
+            self._ids.popitem(last=False)
+
+    def update(self, catalog_ids: dict[CoinKey, int]) -> None:
+        for (name, symbol), catalog_id in catalog_ids.items():
+            self.put(name, symbol, catalog_id)
+
+    def clear(self) -> None:
+        self._ids.clear()
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    async def warm(self, session: AsyncSession) -> None:
+        """Load the newest `max_size` coins of the catalog; called once at startup."""
+        if self.max_size is None:
+            self.configure_from_settings()
+
+        query_result = await session.execute(
+            select(CoinCatalogORM.id, CoinCatalogORM.name, CoinCatalogORM.symbol)
+            .order_by(CoinCatalogORM.id.desc())
+            .limit(self.max_size)
+        )
+        # oldest first, so the newest coins are the last to be evicted
+        for catalog_id, name, symbol in reversed(query_result.all()):
+            self.put(name, symbol, catalog_id)
+
+        logger.info(f"Coin catalog cache warmed with {len(self)} coins.")
+
+
+coin_catalog_cache = CoinCatalogCache()
+
+
+async def select_catalog_ids(session: AsyncSession, coins: list[CoinKey]) -> dict[CoinKey, int]:
+    """Read the catalog ids of coins from the database, bypassing the cache."""
+
+    query_result = await session.execute(
+        select(CoinCatalogORM.id, CoinCatalogORM.name, CoinCatalogORM.symbol).where(
+            tuple_(CoinCatalogORM.name, CoinCatalogORM.symbol).in_(coins)
+        )
+    )
+    return {(name, symbol): catalog_id for catalog_id, name, symbol in query_result}
+
+
+async def get_catalog_ids(session: AsyncSession, coins: Iterable[CoinKey]) -> dict[CoinKey, int]:
+    """Resolve coins to catalog ids; coins missing from the catalog are left out of the result."""
+
+    catalog_ids: dict[CoinKey, int] = {}
+    missing: list[CoinKey] = []
+
+    for name, symbol in coins:
+        catalog_id = coin_catalog_cache.get(name, symbol)
+        if catalog_id is None:
+            missing.append((name, symbol))
+        else:
+            catalog_ids[(name, symbol)] = catalog_id
+
+    if missing:
+        for (name, symbol), catalog_id in (await select_catalog_ids(session, missing)).items():
+            coin_catalog_cache.put(name, symbol, catalog_id)
+            catalog_ids[(name, symbol)] = catalog_id
+
+    return catalog_ids
+
+
+async def get_catalog_id(session: AsyncSession, name: str, symbol: str) -> int | None:
+    """Resolve a single coin to its catalog id, None if the coin is not in the catalog."""
+
+    catalog_id = coin_catalog_cache.get(name, symbol)
+    if catalog_id is not None:
+        return catalog_id
+
+    catalog_ids = await get_catalog_ids(session, [(name, symbol)])
+    return catalog_ids.get((name, symbol))
+
+
+async def get_or_create_catalog_ids(session: AsyncSession, coins: Iterable[CoinKey]) -> dict[CoinKey, int]:
+    """
+    Resolve coins to catalog ids, adding the missing ones to the catalog.
+
+    The new catalog rows are part of the session's transaction and the caller commits them together with
+    the rows that refer to them. Their ids are not cached, so the cache never holds the id of a rolled back
+    row: the caller passes the result to `coin_catalog_cache.update()` after the commit.
+    """
+
+    coins = list(coins)
+    if not shard_router.is_primary(session):
+        return await copy_catalog_ids_to_shard(session, coins)
+
+    catalog_ids = await get_catalog_ids(session, coins)
+
+    missing = [coin for coin in coins if coin not in catalog_ids]
+    if missing:
+        await session.execute(
+            dialect_insert(session, CoinCatalogORM)
+            .values([{"name": name, "symbol": symbol} for name, symbol in missing])
+            .on_conflict_do_nothing(index_elements=["name", "symbol"])
+        )
+        catalog_ids.update(await select_catalog_ids(session, missing))
+
+    return catalog_ids
+
+
+async def copy_catalog_ids_to_shard(session: AsyncSession, coins: list[CoinKey]) -> dict[CoinKey, int]:
+    """
+    Resolve coins in the primary catalog and copy their rows to the catalog of the session's shard.
+
+    Catalog ids are assigned by the primary only, so an id means the same coin on every shard and the
+    process-wide cache and search index stay valid. The primary commits its rows right away, the copies
+    are committed by the caller.
+    """
+
+    async with shard_router.primary.async_session_factory() as primary_session:
+        catalog_ids = await get_or_create_catalog_ids(primary_session, coins)
+        await primary_session.commit()
+
+    await session.execute(
+        dialect_insert(session, CoinCatalogORM)
+        .values([{"id": catalog_id, "name": name, "symbol": symbol} for (name, symbol), catalog_id in catalog_ids.items()])
+        .on_conflict_do_nothing()
+    )
+    return catalog_ids
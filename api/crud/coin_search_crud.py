@@ -0,0 +1,241 @@
+"""
+Module for coin type-ahead search: an in-memory prefix index over catalog names and symbols.
+"""
+
+import heapq
+import asyncio
+import contextlib
+from typing import Callable, Sequence
+from dataclasses import dataclass, field
+
+from loguru import logger
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api.config import get_settings
+from api.database.models import CoinCatalogORM, CoinsORM
+from api.schemas.coins_crud_schemas import CoinSearchResultSchema, CoinSearchResponseSchema
+
+
+@dataclass
+class CoinEntry:
+    catalog_id: int
+    name: str
+    symbol: str
+    holders: int = 0
+
+
+@dataclass
+class PrefixNode:
+    children: dict[str, "PrefixNode"] = field(default_factory=dict)
+    # coins whose name, symbol or name word ends exactly at this node
+    coin_ids: set[int] = field(default_factory=set)
+    # the most held coins of the whole subtree, best first
+    top: list[int] = field(default_factory=list)
+    stale: bool = False
+
+
+class CoinSearchIndex:
+    """
+    Prefix index over coin names, name words and symbols.
+
+    Every trie node caches the `top_k` most held coins below it, so a lookup costs O(len(query) + top_k)
+    regardless of the catalog size. Holder counts are updated incrementally as users add and remove coins.
+    """
+
+    def __init__(self, top_k: int = 10):
+        self.top_k = top_k
+        self.root = PrefixNode()
+        self.coins: dict[int, CoinEntry] = {}
+
+    def clear(self) -> None:
+        self.root = PrefixNode()
+        self.coins.clear()
+
+    def __len__(self) -> int:
+        return len(self.coins)
+
+    @staticmethod
+    def index_keys(name: str, symbol: str) -> set[str]:
+        """Lookup keys of a coin: the symbol, the full name and every word of the name."""
+        name = name.lower()
+        return {symbol.lower(), name, *name.split()}
+
+    def _rank(self, catalog_id: int) -> tuple[int, str]:
+        coin = self.coins[catalog_id]
+        return -coin.holders, coin.name
+
+    def _paths(self, catalog_id: int):
+        """Yield the nodes on the paths of every key of a coin."""
+        coin = self.coins[catalog_id]
+        seen: set[int] = set()
+        for key in self.index_keys(coin.name, coin.symbol):
+            node = self.root
+            for char in key:
+                node = node.children.setdefault(char, PrefixNode())
+                if id(node) not in seen:
+                    seen.add(id(node))
+                    yield node
+            node.coin_ids.add(catalog_id)
+
+    def _promote(self, node: PrefixNode, catalog_id: int) -> None:
+        if catalog_id not in node.top:
+            node.top.append(catalog_id)
+        node.top.sort(key=self._rank)
+        del node.top[self.top_k :]
+
+    def add_coin(self, catalog_id: int, name: str, symbol: str, holders: int = 0) -> None:
+        """Add a catalog coin to the index, or update its holder count if it is already indexed."""
+        if catalog_id in self.coins:
+            self.change_holders(catalog_id, holders - self.coins[catalog_id].holders)
+            return
+
+        self.coins[catalog_id] = CoinEntry(catalog_id=catalog_id, name=name, symbol=symbol, holders=holders)
+        for node in self._paths(catalog_id):
+            self._promote(node, catalog_id)
+
+    def change_holders(self, catalog_id: int, delta: int) -> None:
+        """Adjust a coin's holder count and its position in the cached rankings."""
+        coin = self.coins.get(catalog_id)
+        if coin is None or delta == 0:
+            return
+
+        coin.holders = max(coin.holders + delta, 0)
+        for node in self._paths(catalog_id):
+            if delta > 0:
+                self._promote(node, catalog_id)
+            elif catalog_id in node.top and len(node.top) >= self.top_k:
+                # a coin outside the cached top may now outrank this one, re-rank the node on its next read
+                node.stale = True
+            elif catalog_id in node.top:
+                node.top.sort(key=self._rank)
+
+    def record_holders(self, catalog_id: int, name: str, symbol: str, delta: int) -> None:
+        """Keep the index in step with a coin being added to (+1) or removed from (-1) a portfolio."""
+        if catalog_id not in self.coins:
+            self.add_coin(catalog_id, name, symbol)
+        self.change_holders(catalog_id, delta)
+
+    def _rank_subtree(self, node: PrefixNode, stale_only: bool = False) -> list[int]:
+        """
+        Fill the cached rankings of a subtree bottom-up from the children's rankings; with `stale_only`
+        the fresh children keep theirs and their subtrees are not visited.
+        """
+        candidates = set(node.coin_ids)
+        for child in node.children.values():
+            fresh = stale_only and not child.stale
+            candidates.update(child.top if fresh else self._rank_subtree(child, stale_only))
+
+        node.top = heapq.nsmallest(self.top_k, candidates, key=self._rank)
+        node.stale = False
+        return node.top
+
+    def search(self, query: str, limit: int | None = None) -> list[CoinEntry]:
+        """Return the most held coins whose symbol, name or a name word starts with the query."""
+        node = self.root
+        for char in query.strip().lower():
+            node = node.children.get(char)
+            if node is None:
+                return []
+
+        if node is self.root:
+            return []
+
+        if node.stale:
+            # only the nodes on the paths of coins that lost holders are stale
+            self._rank_subtree(node, stale_only=True)
+        return [self.coins[catalog_id] for catalog_id in node.top[: limit or self.top_k]]
+
+    async def load(self, session: AsyncSession, shard_sessions: Sequence[AsyncSession] = ()) -> None:
+        """
+        Rebuild the index from the catalog of the primary `session` and the number of holders of every coin,
+        summed over the primary and the other shards.
+        """
+        query_result = await session.execute(
+            select(CoinCatalogORM.id, CoinCatalogORM.name, CoinCatalogORM.symbol, func.count(CoinsORM.id))
+            .outerjoin(CoinsORM, (CoinsORM.catalog_id == CoinCatalogORM.id) & CoinsORM.deleted_at.is_(None))
+            .group_by(CoinCatalogORM.id, CoinCatalogORM.name, CoinCatalogORM.symbol)
+        )
+        catalog = query_result.all()
+
+        # catalog ids are assigned by the primary, so they mean the same coin on every shard
+        shard_holders: dict[int, int] = {}
+        for shard_session in shard_sessions:
+            shard_result = await shard_session.execute(
+                select(CoinsORM.catalog_id, func.count(CoinsORM.id))
+                .where(CoinsORM.deleted_at.is_(None))
+                .group_by(CoinsORM.catalog_id)
+            )
+            for catalog_id, holders in shard_result:
+                shard_holders[catalog_id] = shard_holders.get(catalog_id, 0) + holders
+
+        self.clear()
+        for catalog_id, name, symbol, holders in catalog:
+            holders += shard_holders.get(catalog_id, 0)
+            self.coins[catalog_id] = CoinEntry(catalog_id=catalog_id, name=name, symbol=symbol, holders=holders)
+            for _ in self._paths(catalog_id):
+                pass
+
+        self._rank_subtree(self.root)
+
+        logger.info(f"Coin search index loaded with {len(self)} coins.")
+
+
+coin_search_index = CoinSearchIndex()
+
+
+async def load_coin_search_index(session_factories: Sequence[Callable[[], AsyncSession]]) -> None:
+    """Load the index from every shard; the first session factory is the primary's."""
+
+    async with contextlib.AsyncExitStack() as stack:
+        sessions = [await stack.enter_async_context(session_factory()) for session_factory in session_factories]
+        await coin_search_index.load(sessions[0], sessions[1:])
+
+
+async def reload_coin_search_index(session_factories: Sequence[Callable[[], AsyncSession]], interval_s: float) -> None:
+    """Reload the index periodically to pick up coins added through other worker processes."""
+
+    while True:
+        await asyncio.sleep(interval_s)
+        try:
+            await load_coin_search_index(session_factories)
+        except Exception as e:
+            logger.error(f"Error while reloading the coin search index: {e}")
+
+
+async def search_coins(session: AsyncSession, query: str, limit: int | None = None) -> CoinSearchResponseSchema:
+    """Search coins by prefix; optionally fall back to pg_trgm similarity when nothing matches the prefix."""
+
+    limit = min(limit or coin_search_index.top_k, coin_search_index.top_k)
+    coins = coin_search_index.search(query, limit)
+
+    search_settings = get_settings().search
+    if not coins and search_settings.trigram_fallback and session.bind.dialect.name == "postgresql":
+        coins = await search_coins_by_similarity(session, query, limit, search_settings.trigram_threshold)
+
+    return CoinSearchResponseSchema(
+        coins=[
+            CoinSearchResultSchema(coin_name=coin.name, coin_symbol=coin.symbol, holders=coin.holders)
+            for coin in coins
+        ]
+    )
+
+
+async def search_coins_by_similarity(session: AsyncSession, query: str, limit: int, threshold: float) -> list[CoinEntry]:
+    """Fuzzy lookup through the pg_trgm `similarity()` function; requires the pg_trgm extension."""
+
+    similarity = func.greatest(
+        func.similarity(CoinCatalogORM.name, query),
+        func.similarity(CoinCatalogORM.symbol, query),
+    )
+    query_result = await session.execute(
+        select(CoinCatalogORM.id, CoinCatalogORM.name, CoinCatalogORM.symbol)
+        .where(similarity > threshold)
+        .order_by(similarity.desc())
+        .limit(limit)
+    )
+
+    return [
+        coin_search_index.coins.get(catalog_id) or CoinEntry(catalog_id=catalog_id, name=name, symbol=symbol)
+        for catalog_id, name, symbol in query_result
+    ]
@@ -3,20 +3,31 @@ Module for managing user coin data: adding, retrieving, and deleting user coins.
 """
 
 from loguru import logger
-from sqlalchemy import select, delete
+from sqlalchemy import select, update, func
 from fastapi import HTTPException, status
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from api.database.models import UsersORM, CoinsORM
-from api.schemas.coins_crud_schemas import CoinActionSchema, UserCoinsResponseSchema, CoinInfoResponseSchema
+from api.database.dialects import dialect_insert
+from api.database.models import UsersORM, CoinsORM, CoinCatalogORM
+from api.crud.coin_search_crud import coin_search_index
+from api.crud.leaderboard_crud import coin_leaderboards
+from api.crud.coin_catalog_crud import coin_catalog_cache, get_catalog_id, get_catalog_ids, get_or_create_catalog_ids
+from api.schemas.coins_crud_schemas import (
+    CoinActionSchema,
+    UserCoinsResponseSchema,
+    CoinInfoResponseSchema,
+    BulkCoinActionSchema,
+    BulkCoinResultSchema,
+    BulkCoinsResponseSchema,
+)
 
 
 async def add_coin_for_user(coin_data: CoinActionSchema, session: AsyncSession) -> CoinInfoResponseSchema:
     """Add a new coin for a user identified by a username."""
 
     try:
-        query = await session.execute(select(UsersORM.id).where(UsersORM.username == coin_data.username))
+        query = await session.execute(select(UsersORM.id).where(UsersORM.username == coin_data.username, UsersORM.deleted_at.is_(None)))
 
         user_id = query.scalar_one_or_none()
         if not user_id:
@@ -25,16 +36,21 @@ async def add_coin_for_user(coin_data: CoinActionSchema, session: AsyncSession)
                 detail=f"User '{coin_data.username}' not found.",
             )
 
-        new_coin = CoinsORM(user_id=user_id, name=coin_data.coin_name, symbol=coin_data.coin_symbol)
+        coin_key = (coin_data.coin_name, coin_data.coin_symbol)
+        catalog_ids = await get_or_create_catalog_ids(session, [coin_key])
+
+        new_coin = CoinsORM(user_id=user_id, catalog_id=catalog_ids[coin_key])
         session.add(new_coin)
         await session.commit()
+        coin_catalog_cache.update(catalog_ids)
+        coin_search_index.record_holders(new_coin.catalog_id, *coin_key, delta=1)
 
         logger.info(
-            f"Coin '{new_coin.name}' ({new_coin.symbol}) successfully added for user '{coin_data.username}'.",
+            f"Coin '{coin_data.coin_name}' ({coin_data.coin_symbol}) successfully added for user '{coin_data.username}'.",
         )
         return CoinInfoResponseSchema(
-            coin_name=new_coin.name,
-            coin_symbol=new_coin.symbol,
+            coin_name=coin_data.coin_name,
+            coin_symbol=coin_data.coin_symbol,
         )
 
     except IntegrityError as e:
@@ -63,17 +79,25 @@ async def get_all_coins_for_user(username: str, session: AsyncSession) -> UserCo
 
     try:
         coins_query = await session.execute(
-            select(CoinsORM).join(UsersORM, UsersORM.id == CoinsORM.user_id).where(UsersORM.username == username)
+            select(CoinCatalogORM.name, CoinCatalogORM.symbol)
+            .join(CoinsORM, CoinsORM.catalog_id == CoinCatalogORM.id)
+            .join(UsersORM, UsersORM.id == CoinsORM.user_id)
+            .where(
+                UsersORM.username == username,
+                UsersORM.deleted_at.is_(None),
+                CoinsORM.deleted_at.is_(None),
+            )
+            .order_by(CoinsORM.id)
         )
 
-        all_coins = coins_query.scalars().all()
+        all_coins = coins_query.all()
         if not all_coins:
             logger.warning(f"Attempted to get all coins for user '{username}', but no coins were found.")
             return UserCoinsResponseSchema(coins=[])
 
         logger.info(f"Retrieved {len(all_coins)} coins for user '{username}'.")
         return UserCoinsResponseSchema(
-            coins=[CoinInfoResponseSchema(coin_name=coin.name, coin_symbol=coin.symbol) for coin in all_coins]
+            coins=[CoinInfoResponseSchema(coin_name=name, coin_symbol=symbol) for name, symbol in all_coins]
         )
 
     except Exception as e:
@@ -84,20 +108,53 @@ async def get_all_coins_for_user(username: str, session: AsyncSession) -> UserCo
         )
 
 
+async def read_coins_version(username: str, session: AsyncSession) -> tuple | None:
+    """
+    Change marker of a user's coin list: the user id, the number of live coins and the newest coin id,
+    addition and deletion. None when there is no such user.
+    """
+
+    query_result = await session.execute(
+        select(
+            UsersORM.id,
+            func.count(CoinsORM.id).filter(CoinsORM.deleted_at.is_(None)),
+            func.max(CoinsORM.id),
+            func.max(CoinsORM.date_added),
+            func.max(CoinsORM.deleted_at),
+        )
+        .outerjoin(CoinsORM, CoinsORM.user_id == UsersORM.id)
+        .where(UsersORM.username == username, UsersORM.deleted_at.is_(None))
+        .group_by(UsersORM.id)
+    )
+    version = query_result.one_or_none()
+    return tuple(version) if version is not None else None
+
+
 async def delete_coin_for_user(coin_data: CoinActionSchema, session: AsyncSession) -> CoinInfoResponseSchema:
-    """Remove a user's coin from the database."""
+    """Mark a user's coin as deleted; its transactions and statistics are removed later by the purge worker."""
 
     try:
-        user_id_subquery = select(UsersORM.id).where(UsersORM.username == coin_data.username).scalar_subquery()
+        user_id_subquery = (
+            select(UsersORM.id)
+            .where(UsersORM.username == coin_data.username, UsersORM.deleted_at.is_(None))
+            .scalar_subquery()
+        )
+        catalog_id = await get_catalog_id(session, coin_data.coin_name, coin_data.coin_symbol)
 
-        result = await session.execute(
-            delete(CoinsORM).where(
-                CoinsORM.user_id == user_id_subquery,
-                CoinsORM.name == coin_data.coin_name,
-                CoinsORM.symbol == coin_data.coin_symbol,
+        deleted_count = 0
+        if catalog_id is not None:
+            result = await session.execute(
+                update(CoinsORM)
+                .where(
+                    CoinsORM.user_id == user_id_subquery,
+                    CoinsORM.catalog_id == catalog_id,
+                    CoinsORM.deleted_at.is_(None),
+                )
+                .values(deleted_at=func.now())
             )
-        )
-        if result.rowcount == 0:
+            deleted_count = result.rowcount
+
+        if deleted_count == 0:
             logger.warning(
                 f"Attempted to delete non-existent coin '{coin_data.coin_name}' ({coin_data.coin_symbol}) for user '{coin_data.username}'."
             )
@@ -107,6 +164,8 @@ async def delete_coin_for_user(coin_data: CoinActionSchema, session: AsyncSessio
             )
 
         await session.commit()
+        coin_search_index.record_holders(catalog_id, coin_data.coin_name, coin_data.coin_symbol, delta=-1)
+        coin_leaderboards.invalidate(catalog_id)
 
         logger.info(
             f"Coin '{coin_data.coin_name}' ({coin_data.coin_symbol}) successfully deleted for user '{coin_data.username}'."
@@ -135,3 +194,124 @@ async def delete_coin_for_user(coin_data: CoinActionSchema, session: AsyncSessio
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Unexpected error occurred while deleting coin '{coin_data.coin_name}' for user '{coin_data.username}': {str(e)}",
         )
+
+
+async def add_coins_for_user(coins_data: BulkCoinActionSchema, session: AsyncSession) -> BulkCoinsResponseSchema:
+    """Add several coins for a user in one statement; coins the user already has are reported as existing."""
+
+    try:
+        query = await session.execute(select(UsersORM.id).where(UsersORM.username == coins_data.username, UsersORM.deleted_at.is_(None)))
+
+        user_id = query.scalar_one_or_none()
+        if not user_id:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"User '{coins_data.username}' not found.",
+            )
+
+        catalog_ids = await get_or_create_catalog_ids(
+            session, [(coin.coin_name, coin.coin_symbol) for coin in coins_data.coins]
+        )
+
+        insert_result = await session.execute(
+            dialect_insert(session, CoinsORM)
+            .values([{"user_id": user_id, "catalog_id": catalog_id} for catalog_id in catalog_ids.values()])
+            .on_conflict_do_nothing(index_elements=["user_id", "catalog_id"], index_where=CoinsORM.deleted_at.is_(None))
+            .returning(CoinsORM.catalog_id)
+        )
+        added_catalog_ids = set(insert_result.scalars().all())
+        await session.commit()
+        coin_catalog_cache.update(catalog_ids)
+
+        added_coins = {coin for coin, catalog_id in catalog_ids.items() if catalog_id in added_catalog_ids}
+        for coin in added_coins:
+            coin_search_index.record_holders(catalog_ids[coin], *coin, delta=1)
+
+        logger.info(f"Added {len(added_coins)} of {len(coins_data.coins)} coins for user '{coins_data.username}'.")
+        return BulkCoinsResponseSchema(
+            coins=[
+                BulkCoinResultSchema(
+                    coin_name=coin.coin_name,
+                    coin_symbol=coin.coin_symbol,
+                    status="added" if (coin.coin_name, coin.coin_symbol) in added_coins else "exists",
+                )
+                for coin in coins_data.coins
+            ]
+        )
+
+    except HTTPException:
+        logger.warning(f"Attempted to add coins for non-existent user '{coins_data.username}'.")
+        raise
+
+    except Exception as e:
+        logger.error(f"Unexpected error while adding coins for user '{coins_data.username}': {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="An unexpected error occurred while adding the coins.",
+        )
+
+
+async def delete_coins_for_user(coins_data: BulkCoinActionSchema, session: AsyncSession) -> BulkCoinsResponseSchema:
+    """
+    Mark several of a user's coins as deleted in one statement; coins the user does not have are reported as
+    not found, an unknown user is a 404 like for the bulk add.
+    """
+
+    try:
+        user_id_subquery = (
+            select(UsersORM.id)
+            .where(UsersORM.username == coins_data.username, UsersORM.deleted_at.is_(None))
+            .scalar_subquery()
+        )
+        catalog_ids = await get_catalog_ids(session, [(coin.coin_name, coin.coin_symbol) for coin in coins_data.coins])
+
+        deleted_catalog_ids = set()
+        if catalog_ids:
+            delete_result = await session.execute(
+                update(CoinsORM)
+                .where(
+                    CoinsORM.user_id == user_id_subquery,
+                    CoinsORM.catalog_id.in_(catalog_ids.values()),
+                    CoinsORM.deleted_at.is_(None),
+                )
+                .values(deleted_at=func.now())
+                .returning(CoinsORM.catalog_id)
+            )
+            deleted_catalog_ids = set(delete_result.scalars().all())
+            await session.commit()
+
+        if not deleted_catalog_ids:
+            # nothing was deleted, which is also the outcome for an unknown user: look them up like the bulk add
+            query = await session.execute(select(user_id_subquery))
+            if query.scalar_one_or_none() is None:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail=f"User '{coins_data.username}' not found.",
+                )
+
+        deleted_coins = {coin for coin, catalog_id in catalog_ids.items() if catalog_id in deleted_catalog_ids}
+        for coin in deleted_coins:
+            coin_search_index.record_holders(catalog_ids[coin], *coin, delta=-1)
+            coin_leaderboards.invalidate(catalog_ids[coin])
+
+        logger.info(f"Deleted {len(deleted_coins)} of {len(coins_data.coins)} coins for user '{coins_data.username}'.")
+        return BulkCoinsResponseSchema(
+            coins=[
+                BulkCoinResultSchema(
+                    coin_name=coin.coin_name,
+                    coin_symbol=coin.coin_symbol,
+                    status="deleted" if (coin.coin_name, coin.coin_symbol) in deleted_coins else "not_found",
+                )
+                for coin in coins_data.coins
+            ]
+        )
+
+    except HTTPException:
+        raise
+
+    except Exception as e:
+        logger.error(f"Unexpected error while deleting coins for user '{coins_data.username}': {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Unexpected error occurred while deleting coins for user '{coins_data.username}': {str(e)}",
+        )
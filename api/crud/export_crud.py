@@ -0,0 +1,129 @@
+"""
+Module for streaming exports of a user's transactions and statistics as CSV or NDJSON.
+"""
+
+import io
+import csv
+import zlib
+from typing import AsyncIterator, Callable, Literal
+
+import orjson
+from loguru import logger
+from sqlalchemy import select, Select
+from fastapi import HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api.crud.statistics_crud import statistics_totals_select
+from api.database.models import UsersORM, CoinsORM, CoinCatalogORM, CoinTransactionsORM
+
+ExportTable = Literal["transactions", "statistics"]
+ExportFormat = Literal["csv", "ndjson"]
+
+MEDIA_TYPES: dict[ExportFormat, str] = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+
+def export_select(table: ExportTable, user_id: int) -> Select:
+    """Rows of an export, with the coin name and symbol in place of the internal coin id."""
+
+    if table == "transactions":
+        return (
+            select(
+                CoinTransactionsORM.id,
+                CoinCatalogORM.name.label("coin_name"),
+                CoinCatalogORM.symbol.label("coin_symbol"),
+                CoinTransactionsORM.buy,
+                CoinTransactionsORM.sell,
+                CoinTransactionsORM.paid,
+                CoinTransactionsORM.average_price,
+                CoinTransactionsORM.fee,
+                CoinTransactionsORM.date_added,
+            )
+            .join(CoinsORM, CoinsORM.id == CoinTransactionsORM.coin_id)
+            .join(CoinCatalogORM, CoinCatalogORM.id == CoinsORM.catalog_id)
+            .where(CoinTransactionsORM.user_id == user_id, CoinsORM.deleted_at.is_(None))
+            .order_by(CoinTransactionsORM.id)
+        )
+
+    totals = statistics_totals_select().subquery()
+    return (
+        select(
+            CoinCatalogORM.name.label("coin_name"),
+            CoinCatalogORM.symbol.label("coin_symbol"),
+            *(column for column in totals.c if column.name not in ("user_id", "coin_id")),
+        )
+        .join(CoinsORM, CoinsORM.id == totals.c.coin_id)
+        .join(CoinCatalogORM, CoinCatalogORM.id == CoinsORM.catalog_id)
+        .where(totals.c.user_id == user_id, CoinsORM.deleted_at.is_(None))
+        .order_by(CoinsORM.id)
+    )
+
+
+async def get_export_user_id(session: AsyncSession, username: str) -> int:
+    """Resolve the user of an export before the response starts, so a missing user is still a 404."""
+
+    query_result = await session.execute(
+        select(UsersORM.id).where(UsersORM.username == username, UsersORM.deleted_at.is_(None))
+    )
+    user_id = query_result.scalar_one_or_none()
+
+    if user_id is None:
+        logger.warning(f"Attempted to export the data of non-existent user '{username}'.")
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"User '{username}' not found.",
+        )
+
+    return user_id
+
+
+def format_rows(rows, columns: list[str], export_format: ExportFormat) -> bytes:
+    """Encode one batch of rows."""
+
+    if export_format == "ndjson":
+        # the amounts are Decimal; JSON has a single number type, as in the API responses
+        return b"".join(orjson.dumps(dict(zip(columns, row)), default=float) + b"\n" for row in rows)
+
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    return buffer.getvalue().encode()
+
+
+async def stream_export(
+    session_factory: Callable[[], AsyncSession],
+    user_id: int,
+    table: ExportTable,
+    export_format: ExportFormat,
+    batch_size: int,
+    gzip_level: int | None = None,
+) -> AsyncIterator[bytes]:
+    """
+    Yield an export chunk by chunk, reading the rows through a server-side cursor `batch_size` rows at a time.
+
+    The export runs in its own session because the request session is closed before a streamed body is sent.
+    With `gzip_level` the output is a gzip stream, flushed after every batch so the client receives data
+    as soon as it is read.
+    """
+
+    compressor = zlib.compressobj(gzip_level, zlib.DEFLATED, 16 + zlib.MAX_WBITS) if gzip_level else None
+
+    def encode(chunk: bytes) -> bytes:
+        if compressor is None:
+            return chunk
+        return compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    query = export_select(table, user_id).execution_options(yield_per=batch_size)
+    columns = [column.name for column in query.selected_columns]
+    if export_format == "csv":
+        yield encode(format_rows([columns], columns, export_format))
+
+    rows_count = 0
+    async with session_factory() as session:
+        result = await session.stream(query)
+        async for rows in result.partitions():
+            rows_count += len(rows)
+            yield encode(format_rows(rows, columns, export_format))
+
+    if compressor is not None:
+        yield compressor.flush()
+
+    logger.info(f"Exported {rows_count} {table} rows of user {user_id} as {export_format}.")
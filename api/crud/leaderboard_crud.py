@@ -0,0 +1,239 @@
+"""
+Module for the per-coin top holders leaderboard: an in-memory bounded top list and holder count per coin.
+"""
+
+import heapq
+from typing import Iterable, Sequence
+from dataclasses import dataclass, field
+
+from loguru import logger
+from sqlalchemy import select, func, Row, Select
+from fastapi import HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api.database.dialects import dialect_insert
+from api.crud.coin_catalog_crud import get_catalog_id
+from api.database.models import UsersORM, CoinsORM, CoinStatisticsORM, CoinLeaderboardsORM
+from api.schemas.coins_crud_schemas import CoinLeaderboardEntrySchema, CoinLeaderboardResponseSchema
+
+Holder = tuple[str, float]
+
+
+@dataclass
+class CoinLeaderboard:
+    holders: int = 0
+    # the tracked holders: username -> (username, holdings); user ids repeat across shards, usernames do not
+    entries: dict[str, Holder] = field(default_factory=dict)
+    # no untracked holder holds more than this, so tracked holders above it are ranked exactly
+    floor: float = 0.0
+    top: list[Holder] | None = None
+
+
+class CoinLeaderboards:
+    """
+    Top holders and number of holders of every coin, kept up to date from each statistics change.
+
+    Every coin tracks at most `tracked` holders. A holder outside them is only known not to hold more
+    than the coin's floor: newcomers above the floor join, tracked holders that fall below it leave.
+    When fewer than `top_k` holders are left above the floor while others exist, the coin is marked
+    stale and refilled from the database. Reads cost O(top_k) whatever the number of holders.
+    """
+
+    def __init__(self, top_k: int = 10, tracked: int = 50):
+        self.top_k = top_k
+        self.tracked = max(tracked, top_k)
+        self.coins: dict[int, CoinLeaderboard] = {}
+        # changed since the last persist, and needing a refill from the database
+        self.dirty: set[int] = set()
+        self.stale: set[int] = set()
+
+    def configure(self, top_k: int, tracked: int) -> None:
+        """Change the list sizes; takes effect for every coin with the next seed."""
+        self.top_k = top_k
+        self.tracked = max(tracked, top_k)
+        for board in self.coins.values():
+            board.top = None
+
+    def clear(self) -> None:
+        self.coins.clear()
+        self.dirty.clear()
+        self.stale.clear()
+
+    def _evict(self, board: CoinLeaderboard) -> None:
+        while len(board.entries) > self.tracked:
+            username, (_, holdings) = min(board.entries.items(), key=lambda item: item[1][1])
+            del board.entries[username]
+            board.floor = max(board.floor, holdings)
+
+    def _changed(self, catalog_id: int, board: CoinLeaderboard) -> None:
+        board.top = None
+        self.dirty.add(catalog_id)
+        if len(board.entries) < min(self.top_k, board.holders):
+            self.stale.add(catalog_id)
+
+    def record(self, catalog_id: int, username: str, old_holdings: float, new_holdings: float) -> None:
+        """Apply the change of a user's total holdings of a coin."""
+        old_holdings, new_holdings = float(old_holdings), float(new_holdings)
+        board = self.coins.setdefault(catalog_id, CoinLeaderboard())
+        board.holders = max(board.holders + (new_holdings > 0) - (old_holdings > 0), 0)
+
+        if username in board.entries:
+            if new_holdings > 0 and new_holdings >= board.floor:
+                board.entries[username] = (username, new_holdings)
+            else:
+                # below the floor its rank among the untracked holders is unknown
+                del board.entries[username]
+        elif new_holdings > board.floor:
+            board.entries[username] = (username, new_holdings)
+            self._evict(board)
+
+        self._changed(catalog_id, board)
+
+    def invalidate(self, catalog_id: int) -> None:
+        """Refill a coin from the database, e.g. after positions were deleted."""
+        self.stale.add(catalog_id)
+
+    def seed(self, shards: Iterable[Sequence[Row]], catalog_ids: Iterable[int] | None = None) -> None:
+        """
+        Replace the leaderboards of `catalog_ids`, or all of them, with the rows of `leaderboard_select()`
+        read from every shard.
+        """
+        seeded: dict[int, CoinLeaderboard] = {}
+        for rows in shards:
+            shard_boards: dict[int, CoinLeaderboard] = {}
+            for catalog_id, _, username, holdings, holders in rows:
+                board = shard_boards.setdefault(catalog_id, CoinLeaderboard(holders=holders))
+                board.entries[username] = (username, float(holdings))
+
+            for catalog_id, shard_board in shard_boards.items():
+                board = seeded.setdefault(catalog_id, CoinLeaderboard())
+                board.holders += shard_board.holders
+                board.entries.update(shard_board.entries)
+                if shard_board.holders > len(shard_board.entries):
+                    # the holders the query left out hold at most the smallest it returned
+                    shard_floor = min(holdings for _, holdings in shard_board.entries.values())
+                    board.floor = max(board.floor, shard_floor)
+
+        if catalog_ids is None:
+            self.coins.clear()
+            self.stale.clear()
+            catalog_ids = seeded.keys()
+
+        for catalog_id in list(catalog_ids):
+            board = seeded.get(catalog_id, CoinLeaderboard())
+            self._evict(board)
+            self.coins[catalog_id] = board
+            self.stale.discard(catalog_id)
+            self.dirty.add(catalog_id)
+
+    def pop_dirty(self) -> dict[int, tuple[int, list[Holder]]]:
+        """The holders and top list of every coin changed since the last call."""
+        dirty, self.dirty = self.dirty, set()
+        return {catalog_id: self.top(catalog_id) for catalog_id in dirty}
+
+    def top(self, catalog_id: int, limit: int | None = None) -> tuple[int, list[Holder]]:
+        """The number of holders and the largest holders of a coin, largest first."""
+        board = self.coins.get(catalog_id)
+        if board is None:
+            return 0, []
+
+        if board.top is None:
+            board.top = heapq.nlargest(self.top_k, board.entries.values(), key=lambda holder: holder[1])
+        return board.holders, board.top[: limit or self.top_k]
+
+
+def leaderboard_select(tracked: int, catalog_ids: Iterable[int] | None = None) -> Select:
+    """
+    Select the `tracked` largest holders of every coin, or of the given catalog ids, in one query:
+    (catalog_id, user_id, username, holdings, holders) with `holders` the number of holders of the coin.
+    """
+
+    totals_query = (
+        select(
+            CoinsORM.catalog_id,
+            UsersORM.id.label("user_id"),
+            UsersORM.username,
+            func.sum(CoinStatisticsORM.holdings).label("holdings"),
+        )
+        .join(CoinsORM, CoinsORM.id == CoinStatisticsORM.coin_id)
+        .join(UsersORM, UsersORM.id == CoinStatisticsORM.user_id)
+        .where(UsersORM.deleted_at.is_(None), CoinsORM.deleted_at.is_(None))
+        .group_by(CoinsORM.catalog_id, UsersORM.id, UsersORM.username)
+        .having(func.sum(CoinStatisticsORM.holdings) > 0)
+    )
+    if catalog_ids is not None:
+        totals_query = totals_query.where(CoinsORM.catalog_id.in_(list(catalog_ids)))
+    totals = totals_query.subquery()
+
+    ranked = select(
+        totals,
+        func.row_number()
+        .over(partition_by=totals.c.catalog_id, order_by=(totals.c.holdings.desc(), totals.c.user_id))
+        .label("rank"),
+        func.count().over(partition_by=totals.c.catalog_id).label("holders"),
+    ).subquery()
+
+    return select(
+        ranked.c.catalog_id, ranked.c.user_id, ranked.c.username, ranked.c.holdings, ranked.c.holders
+    ).where(ranked.c.rank <= tracked).order_by(ranked.c.catalog_id, ranked.c.rank)
+
+
+async def load_leaderboard_rows(session: AsyncSession, tracked: int, catalog_ids: Iterable[int] | None = None) -> Sequence[Row]:
+    query_result = await session.execute(leaderboard_select(tracked, catalog_ids))
+    return query_result.all()
+
+
+async def persist_leaderboards(session: AsyncSession, leaderboards: dict[int, tuple[int, list[Holder]]]) -> int:
+    """Upsert the holders and top list of the given coins; return the number of rows written."""
+
+    if not leaderboards:
+        return 0
+
+    insert_statement = dialect_insert(session, CoinLeaderboardsORM).values(
+        [
+            {"catalog_id": catalog_id, "holders": holders, "top": [list(holder) for holder in top]}
+            for catalog_id, (holders, top) in leaderboards.items()
+        ]
+    )
+    await session.execute(
+        insert_statement.on_conflict_do_update(
+            index_elements=["catalog_id"],
+            set_={
+                "holders": insert_statement.excluded.holders,
+                "top": insert_statement.excluded.top,
+                "updated_at": func.now(),
+            },
+        )
+    )
+    await session.commit()
+
+    logger.info(f"Persisted the leaderboards of {len(leaderboards)} coins.")
+    return len(leaderboards)
+
+
+coin_leaderboards = CoinLeaderboards()
+
+
+async def read_coin_leaderboard(
+    session: AsyncSession,
+    coin_name: str,
+    coin_symbol: str,
+    limit: int | None = None,
+) -> CoinLeaderboardResponseSchema:
+    """The largest holders of a coin, served from memory; no query once the catalog id is cached."""
+
+    catalog_id = await get_catalog_id(session, coin_name, coin_symbol)
+    if catalog_id is None:
+        logger.warning(f"Leaderboard requested for unknown coin '{coin_name}' ({coin_symbol}).")
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Coin '{coin_name}' ({coin_symbol}) not found.",
+        )
+
+    holders, top = coin_leaderboards.top(catalog_id, limit)
+    return CoinLeaderboardResponseSchema.model_construct(
+        coin_name=coin_name,
+        coin_symbol=coin_symbol,
+        holders=holders,
+        top=[CoinLeaderboardEntrySchema.model_construct(username=username, holdings=holdings) for username, holdings in top],
+    )
@@ -0,0 +1,332 @@
+"""
+Module for daily portfolio snapshots and the history chart built from them.
+"""
+
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Iterable, Sequence
+
+from loguru import logger
+from sqlalchemy import select, func, tuple_, case, Subquery
+from fastapi import HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api.database.dialects import dialect_insert
+from api.crud.statistics_crud import statistics_totals_select
+from api.database.models import UsersORM, CoinsORM, CoinTransactionsORM, CoinStatisticsORM, PortfolioSnapshotsORM
+from api.schemas.portfolio_schemas import PortfolioChartPointSchema, PortfolioChartResponseSchema
+
+Position = tuple[int, int]
+
+
+def utc_today() -> date:
+    """Snapshot days are UTC days, whatever the timezone of the server."""
+    return datetime.now(timezone.utc).date()
+
+
+def utc_day_bounds(day: date) -> tuple[datetime, datetime]:
+    """Start of `day` and of the next day in UTC, the boundaries the snapshots and transactions are split on."""
+    start = datetime.combine(day, time.min, tzinfo=timezone.utc)
+    return start, start + timedelta(days=1)
+
+
+async def write_portfolio_snapshots(session: AsyncSession, day: date, totals: Subquery, until: datetime | None = None) -> int:
+    """
+    Upsert the snapshot of `day` of every position of `totals` (user_id, coin_id, holdings, invested_total,
+    realized_total), valued at the price of its latest transaction before `until`.
+    """
+
+    last_price_query = (
+        select(CoinTransactionsORM.average_price)
+        .where(
+            CoinTransactionsORM.user_id == totals.c.user_id,
+            CoinTransactionsORM.coin_id == totals.c.coin_id,
+            CoinTransactionsORM.average_price > 0,
+        )
+        .order_by(CoinTransactionsORM.id.desc())
+        .limit(1)
+    )
+    if until is not None:
+        last_price_query = last_price_query.where(CoinTransactionsORM.date_added < until)
+    last_price = last_price_query.scalar_subquery()
+
+    query_result = await session.execute(
+        select(
+            totals.c.user_id,
+            totals.c.coin_id,
+            totals.c.holdings,
+            totals.c.invested_total,
+            totals.c.realized_total,
+            func.coalesce(last_price, 0),
+        )
+    )
+
+    snapshots = [
+        {
+            "user_id": user_id,
+            "coin_id": coin_id,
+            "day": day,
+            "holdings": holdings,
+            "invested_total": invested_total,
+            "realized_total": realized_total,
+            "last_price": price,
+            "value": holdings * price,
+        }
+        for user_id, coin_id, holdings, invested_total, realized_total, price in query_result
+    ]
+    if not snapshots:
+        return 0
+
+    insert_statement = dialect_insert(session, PortfolioSnapshotsORM).values(snapshots)
+    await session.execute(
+        insert_statement.on_conflict_do_update(
+            index_elements=["user_id", "coin_id", "day"],
+            set_={
+                field: insert_statement.excluded[field]
+                for field in ("holdings", "invested_total", "realized_total", "last_price", "value")
+            },
+        )
+    )
+    await session.commit()
+
+    logger.info(f"Refreshed {len(snapshots)} portfolio snapshots for {day}.")
+    return len(snapshots)
+
+
+async def refresh_portfolio_snapshots(session: AsyncSession, day: date, positions: Iterable[Position]) -> int:
+    """
+    Write the snapshot of `day` for the given (user_id, coin_id) positions from their current statistics;
+    untouched positions keep their last snapshot. Return the number of snapshots written.
+    """
+
+    positions = list(positions)
+    if not positions:
+        return 0
+
+    totals = (
+        statistics_totals_select()
+        .where(tuple_(CoinStatisticsORM.user_id, CoinStatisticsORM.coin_id).in_(positions))
+        .subquery()
+    )
+    return await write_portfolio_snapshots(session, day, totals)
+
+
+async def refresh_daily_portfolio_snapshots(session: AsyncSession, day: date) -> int:
+    """
+    Nightly run: snapshot every position with transactions during the UTC `day` as it stood at the end
+    of it, folding its transactions up to that moment; later ones belong to the next day's snapshot.
+    """
+
+    start, end = utc_day_bounds(day)
+    active_positions = select(CoinTransactionsORM.user_id, CoinTransactionsORM.coin_id).where(
+        CoinTransactionsORM.date_added >= start, CoinTransactionsORM.date_added < end
+    )
+    totals = (
+        select(
+            CoinTransactionsORM.user_id,
+            CoinTransactionsORM.coin_id,
+            func.sum(CoinTransactionsORM.buy - CoinTransactionsORM.sell).label("holdings"),
+            func.sum(case((CoinTransactionsORM.buy > 0, CoinTransactionsORM.paid), else_=0)).label("invested_total"),
+            func.sum(case((CoinTransactionsORM.sell > 0, CoinTransactionsORM.paid), else_=0)).label("realized_total"),
+        )
+        .where(
+            CoinTransactionsORM.date_added < end,
+            tuple_(CoinTransactionsORM.user_id, CoinTransactionsORM.coin_id).in_(active_positions),
+        )
+        .group_by(CoinTransactionsORM.user_id, CoinTransactionsORM.coin_id)
+        .subquery()
+    )
+    return await write_portfolio_snapshots(session, day, totals, until=end)
+
+
+def lttb(points: Sequence[tuple[float, float]], threshold: int) -> list[int]:
+    """
+    Largest-Triangle-Three-Buckets downsampling.
+
+    Return the indexes of at most `threshold` (3 or more) points that keep the visual shape of the series;
+    the first and the last point are always kept.
+    """
+
+    if threshold >= len(points) or threshold < 3:
+        return list(range(len(points)))
+
+    selected = [0]
+    bucket_size = (len(points) - 2) / (threshold - 2)
+    previous = 0
+
+    for bucket in range(threshold - 2):
+        start = int(bucket * bucket_size) + 1
+        end = int((bucket + 1) * bucket_size) + 1
+
+        # the average of the next bucket is the third corner of the triangles
+        next_start, next_end = end, min(int((bucket + 2) * bucket_size) + 1, len(points))
+        next_points = points[next_start:next_end]
+        average_x = sum(x for x, _ in next_points) / len(next_points)
+        average_y = sum(y for _, y in next_points) / len(next_points)
+
+        previous_x, previous_y = points[previous]
+        best_area, best = -1.0, start
+        for index in range(start, end):
+            x, y = points[index]
+            area = abs((previous_x - average_x) * (y - previous_y) - (previous_x - x) * (average_y - previous_y))
+            if area > best_area:
+                best_area, best = area, index
+
+        selected.append(best)
+        previous = best
+
+    selected.append(len(points) - 1)
+    return selected
+
+
+async def get_portfolio_chart(
+    session: AsyncSession,
+    username: str,
+    start: date,
+    end: date,
+    max_points: int,
+) -> PortfolioChartResponseSchema:
+    """Daily portfolio totals between `start` and `end`, downsampled to at most `max_points` points."""
+
+    user_query = await session.execute(
+        select(UsersORM.id).where(UsersORM.username == username, UsersORM.deleted_at.is_(None))
+    )
+    user_id = user_query.scalar_one_or_none()
+    if user_id is None:
+        logger.warning(f"Attempted to get the portfolio chart of non-existent user '{username}'.")
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"User '{username}' not found.",
+        )
+
+    # the latest snapshot of every coin before the range is the starting state
+    latest_days = (
+        select(PortfolioSnapshotsORM.coin_id, func.max(PortfolioSnapshotsORM.day).label("day"))
+        .join(CoinsORM, CoinsORM.id == PortfolioSnapshotsORM.coin_id)
+        .where(PortfolioSnapshotsORM.user_id == user_id, PortfolioSnapshotsORM.day < start, CoinsORM.deleted_at.is_(None))
+        .group_by(PortfolioSnapshotsORM.coin_id)
+        .subquery()
+    )
+    initial_query = await session.execute(
+        select(PortfolioSnapshotsORM).join(
+            latest_days,
+            (latest_days.c.coin_id == PortfolioSnapshotsORM.coin_id) & (latest_days.c.day == PortfolioSnapshotsORM.day),
+        ).where(PortfolioSnapshotsORM.user_id == user_id)
+    )
+    range_query = await session.execute(
+        select(PortfolioSnapshotsORM)
+        .join(CoinsORM, CoinsORM.id == PortfolioSnapshotsORM.coin_id)
+        .where(
+            PortfolioSnapshotsORM.user_id == user_id,
+            PortfolioSnapshotsORM.day >= start,
+            PortfolioSnapshotsORM.day <= end,
+            CoinsORM.deleted_at.is_(None),
+        )
+        .order_by(PortfolioSnapshotsORM.day)
+    )
+
+    current = {snapshot.coin_id: snapshot for snapshot in initial_query.scalars().all()}
+    chart: list[PortfolioChartPointSchema] = []
+
+    range_snapshots = range_query.scalars().all()
+    for index, snapshot in enumerate(range_snapshots):
+        current[snapshot.coin_id] = snapshot
+        # one point per day, after every coin of that day has been applied
+        if index + 1 < len(range_snapshots) and range_snapshots[index + 1].day == snapshot.day:
+            continue
+        chart.append(
+            PortfolioChartPointSchema(
+                day=snapshot.day,
+                value=sum(position.value for position in current.values()),
+                invested_total=sum(position.invested_total for position in current.values()),
+                realized_total=sum(position.realized_total for position in current.values()),
+            )
+        )
+
+    selected = lttb([(point.day.toordinal(), point.value) for point in chart], max_points)
+    return PortfolioChartResponseSchema(username=username, points=[chart[index] for index in selected])
+
+
+async def get_analytics_version(session: AsyncSession, username: str) -> tuple[int, int | None, datetime | None]:
+    """
+    Return the user's id, the id of their latest transaction and the time their latest coin was deleted;
+    together they change whenever the portfolio does.
+    """
+
+    last_transaction_id = (
+        select(func.max(CoinTransactionsORM.id)).where(CoinTransactionsORM.user_id == UsersORM.id).scalar_subquery()
+    )
+    last_deleted_at = select(func.max(CoinsORM.deleted_at)).where(CoinsORM.user_id == UsersORM.id).scalar_subquery()
+    query_result = await session.execute(
+        select(UsersORM.id, last_transaction_id, last_deleted_at).where(
+            UsersORM.username == username, UsersORM.deleted_at.is_(None)
+        )
+    )
+    version = query_result.one_or_none()
+
+    if version is None:
+        logger.warning(f"Attempted to get the portfolio analytics of non-existent user '{username}'.")
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"User '{username}' not found.",
+        )
+
+    return version[0], version[1], version[2]
+
+
+async def get_transactions_until(session: AsyncSession, user_id: int, end: date) -> Sequence[CoinTransactionsORM]:
+    """All transactions of a user on coins they still hold up to the end of `end`, in execution order."""
+
+    query_result = await session.execute(
+        select(CoinTransactionsORM)
+        .join(CoinsORM, CoinsORM.id == CoinTransactionsORM.coin_id)
+        .where(
+            CoinTransactionsORM.user_id == user_id,
+            CoinTransactionsORM.date_added < utc_day_bounds(end)[1],
+            CoinsORM.deleted_at.is_(None),
+        )
+        .order_by(CoinTransactionsORM.id)
+    )
+    return query_result.scalars().all()
+
+
+async def get_simulation_positions(session: AsyncSession, username: str) -> list[tuple[int, float, float]]:
+    """
+    Current (coin_id, holdings, price) of every held coin of a user, the price being the average price
+    of the coin's latest transaction; coins without a known price are left out.
+    """
+
+    user_query = await session.execute(
+        select(UsersORM.id).where(UsersORM.username == username, UsersORM.deleted_at.is_(None))
+    )
+    user_id = user_query.scalar_one_or_none()
+    if user_id is None:
+        logger.warning(f"Attempted to simulate the portfolio of non-existent user '{username}'.")
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"User '{username}' not found.",
+        )
+
+    totals = (
+        statistics_totals_select()
+        .join(CoinsORM, CoinsORM.id == CoinStatisticsORM.coin_id)
+        .where(CoinStatisticsORM.user_id == user_id, CoinsORM.deleted_at.is_(None))
+        .subquery()
+    )
+    last_price = (
+        select(CoinTransactionsORM.average_price)
+        .where(
+            CoinTransactionsORM.user_id == totals.c.user_id,
+            CoinTransactionsORM.coin_id == totals.c.coin_id,
+            CoinTransactionsORM.average_price > 0,
+        )
+        .order_by(CoinTransactionsORM.id.desc())
+        .limit(1)
+        .scalar_subquery()
+    )
+    query_result = await session.execute(
+        select(totals.c.coin_id, totals.c.holdings, func.coalesce(last_price, 0))
+        .where(totals.c.holdings > 0)
+        .order_by(totals.c.coin_id)
+    )
+
+    return [(coin_id, holdings, price) for coin_id, holdings, price in query_result if price > 0]
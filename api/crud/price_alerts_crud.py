@@ -0,0 +1,143 @@
+"""
+Module for price alerts: creating, listing and deleting them, and loading the active ones for matching.
+"""
+
+from typing import Sequence
+
+from loguru import logger
+from sqlalchemy import select, update, delete, func, Row
+from fastapi import HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api.config import get_settings
+from api.crud.transactions_crud import get_coin_or_raise_error
+from api.database.models import UsersORM, CoinCatalogORM, PriceAlertsORM
+from api.schemas.price_alerts_schemas import (
+    PriceAlertActionSchema,
+    PriceAlertResponseSchema,
+    UserPriceAlertsResponseSchema,
+)
+
+
+def active_users_ids():
+    return select(UsersORM.id).where(UsersORM.deleted_at.is_(None))
+
+
+async def create_price_alert(session: AsyncSession, alert_data: PriceAlertActionSchema) -> PriceAlertsORM:
+    """Create an alert on a coin the user holds."""
+
+    coin_record = await get_coin_or_raise_error(session, alert_data.username, alert_data.coin_name, alert_data.coin_symbol)
+
+    active_count = await session.scalar(
+        select(func.count(PriceAlertsORM.id)).where(
+            PriceAlertsORM.user_id == coin_record.user_id,
+            PriceAlertsORM.triggered_at.is_(None),
+        )
+    )
+    max_per_user = get_settings().alerts.max_per_user
+    if active_count >= max_per_user:
+        logger.warning(f"User '{alert_data.username}' reached the limit of {max_per_user} active price alerts.")
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"A user can have at most {max_per_user} active price alerts.",
+        )
+
+    alert_record = PriceAlertsORM(
+        user_id=coin_record.user_id,
+        catalog_id=coin_record.catalog_id,
+        direction=alert_data.direction,
+        threshold=alert_data.threshold,
+    )
+    session.add(alert_record)
+    await session.commit()
+    await session.refresh(alert_record)
+
+    logger.info(
+        f"Price alert {alert_data.direction} {alert_data.threshold} on '{alert_data.coin_name}' ({alert_data.coin_symbol}) created for user '{alert_data.username}'."
+    )
+    return alert_record
+
+
+async def get_price_alerts_for_user(session: AsyncSession, username: str) -> UserPriceAlertsResponseSchema:
+    """Retrieve every alert of a user, triggered ones included, newest first."""
+
+    query_result = await session.execute(
+        select(PriceAlertsORM, CoinCatalogORM.name, CoinCatalogORM.symbol)
+        .join(CoinCatalogORM, CoinCatalogORM.id == PriceAlertsORM.catalog_id)
+        .join(UsersORM, UsersORM.id == PriceAlertsORM.user_id)
+        .where(UsersORM.username == username, UsersORM.deleted_at.is_(None))
+        .order_by(PriceAlertsORM.id.desc())
+    )
+
+    return UserPriceAlertsResponseSchema(
+        alerts=[
+            PriceAlertResponseSchema(
+                id=alert.id,
+                coin_name=name,
+                coin_symbol=symbol,
+                direction=alert.direction,
+                threshold=alert.threshold,
+                created_at=alert.created_at,
+                triggered_at=alert.triggered_at,
+            )
+            for alert, name, symbol in query_result
+        ]
+    )
+
+
+async def delete_price_alert(session: AsyncSession, username: str, alert_id: int) -> Row:
+    """Delete an alert of a user; return its (id, catalog_id, direction, threshold)."""
+
+    user_id_subquery = (
+        select(UsersORM.id).where(UsersORM.username == username, UsersORM.deleted_at.is_(None)).scalar_subquery()
+    )
+    query_result = await session.execute(
+        delete(PriceAlertsORM)
+        .where(PriceAlertsORM.id == alert_id, PriceAlertsORM.user_id == user_id_subquery)
+        .returning(PriceAlertsORM.id, PriceAlertsORM.catalog_id, PriceAlertsORM.direction, PriceAlertsORM.threshold)
+    )
+    deleted_alert = query_result.one_or_none()
+
+    if deleted_alert is None:
+        logger.warning(f"Attempted to delete non-existent price alert {alert_id} of user '{username}'.")
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Price alert {alert_id} not found for user '{username}'.",
+        )
+
+    await session.commit()
+    logger.info(f"Price alert {alert_id} of user '{username}' deleted.")
+    return deleted_alert
+
+
+async def load_active_price_alerts(session: AsyncSession) -> Sequence[Row]:
+    """(id, catalog_id, direction, threshold) of every alert that has not fired yet."""
+
+    query_result = await session.execute(
+        select(PriceAlertsORM.id, PriceAlertsORM.catalog_id, PriceAlertsORM.direction, PriceAlertsORM.threshold).where(
+            PriceAlertsORM.triggered_at.is_(None),
+            PriceAlertsORM.user_id.in_(active_users_ids()),
+        )
+    )
+    return query_result.all()
+
+
+async def mark_price_alerts_triggered(session: AsyncSession, alert_ids: list[int]) -> list[int]:
+    """
+    Mark alerts as triggered and return the ids that were actually marked; alerts already fired
+    (by another worker process), deleted or of deleted users are left out.
+    """
+
+    query_result = await session.execute(
+        update(PriceAlertsORM)
+        .where(
+            PriceAlertsORM.id.in_(alert_ids),
+            PriceAlertsORM.triggered_at.is_(None),
+            PriceAlertsORM.user_id.in_(active_users_ids()),
+        )
+        .values(triggered_at=func.now())
+        .returning(PriceAlertsORM.id)
+    )
+    triggered_ids = list(query_result.scalars().all())
+    await session.commit()
+    return triggered_ids
@@ -0,0 +1,88 @@
+"""
+Module for purging soft deleted users and coins in small batches.
+"""
+
+import asyncio
+
+from loguru import logger
+from sqlalchemy import select, delete, exists, ColumnElement
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api.database.models import (
+    Base,
+    UsersORM,
+    CoinsORM,
+    CoinTransactionsORM,
+    CoinStatisticsORM,
+    PortfolioSnapshotsORM,
+    PriceAlertsORM,
+)
+
+COIN_DEPENDENT_MODELS = (CoinTransactionsORM, CoinStatisticsORM, PortfolioSnapshotsORM)
+
+
+async def delete_in_batches(
+    session: AsyncSession,
+    model: type[Base],
+    condition: ColumnElement[bool],
+    batch_size: int,
+    pause_s: float,
+) -> int:
+    """
+    Delete the rows matching `condition`, at most `batch_size` rows per transaction.
+
+    Every batch is committed on its own, so row locks are held briefly and the replication stream
+    gets a series of small transactions instead of one huge one. Return the number of deleted rows.
+    """
+
+    deleted = 0
+    while True:
+        batch = select(model.id).where(condition).limit(batch_size)
+        result = await session.execute(delete(model).where(model.id.in_(batch)))
+        await session.commit()
+
+        deleted += result.rowcount
+        if result.rowcount < batch_size:
+            return deleted
+        await asyncio.sleep(pause_s)
+
+
+async def purge_deleted_coins(session: AsyncSession, batch_size: int, pause_s: float) -> int:
+    """Remove soft deleted coins with everything that refers to them; return the number of purged coins."""
+
+    query_result = await session.execute(select(CoinsORM.id).where(CoinsORM.deleted_at.is_not(None)))
+    coin_ids = query_result.scalars().all()
+    await session.commit()
+
+    for coin_id in coin_ids:
+        for model in COIN_DEPENDENT_MODELS:
+            await delete_in_batches(session, model, model.coin_id == coin_id, batch_size, pause_s)
+
+        # nothing refers to the coin any more, the cascade has nothing left to do
+        await session.execute(delete(CoinsORM).where(CoinsORM.id == coin_id))
+        await session.commit()
+
+    return len(coin_ids)
+
+
+async def purge_deleted_users(session: AsyncSession, batch_size: int, pause_s: float) -> int:
+    """Remove soft deleted users whose coins are already purged, and their price alerts; return the number of purged users."""
+
+    deleted_users = select(UsersORM.id).where(UsersORM.deleted_at.is_not(None))
+    await delete_in_batches(session, PriceAlertsORM, PriceAlertsORM.user_id.in_(deleted_users), batch_size, pause_s)
+
+    has_coins = exists().where(CoinsORM.user_id == UsersORM.id)
+    return await delete_in_batches(
+        session, UsersORM, UsersORM.deleted_at.is_not(None) & ~has_coins, batch_size, pause_s
+    )
+
+
+async def purge_deleted(session: AsyncSession, batch_size: int, pause_s: float) -> tuple[int, int]:
+    """Purge soft deleted coins, then the users they belonged to; return the purged coins and users."""
+
+    coins = await purge_deleted_coins(session, batch_size, pause_s)
+    users = await purge_deleted_users(session, batch_size, pause_s)
+
+    if coins or users:
+        logger.info(f"Purged {coins} deleted coins and {users} deleted users.")
+    return coins, users
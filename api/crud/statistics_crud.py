@@ -0,0 +1,156 @@
+"""
+Module for reading coin statistics and merging the shard rows of sharded positions.
+"""
+
+from datetime import timedelta
+
+from loguru import logger
+from sqlalchemy import select, delete, func, Select
+from fastapi import HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api.crud.coin_catalog_crud import get_catalog_id
+from api.database.models import UsersORM, CoinsORM, CoinStatisticsORM
+from api.schemas.coins_crud_schemas import CoinStatisticsResponseSchema
+
+ADDITIVE_STATISTICS_FIELDS = (
+    "buy_total",
+    "invested_total",
+    "sell_total",
+    "realized_total",
+    "holdings",
+    "fee_total",
+    "transactions_count",
+)
+
+
+def statistics_totals_select() -> Select:
+    """Select the statistics of every position with its shard rows summed up."""
+
+    return select(
+        CoinStatisticsORM.user_id,
+        CoinStatisticsORM.coin_id,
+        *(func.sum(getattr(CoinStatisticsORM, field)).label(field) for field in ADDITIVE_STATISTICS_FIELDS),
+        func.max(CoinStatisticsORM.updated_at).label("updated_at"),
+    ).group_by(CoinStatisticsORM.user_id, CoinStatisticsORM.coin_id)
+
+
+def average(total: float, units: float) -> float:
+    """Average price per unit, zero when there are no units."""
+    return total / units if units > 0 else 0
+
+
+async def read_coin_statistics(
+    session: AsyncSession,
+    username: str,
+    coin_name: str,
+    coin_symbol: str,
+) -> CoinStatisticsResponseSchema:
+    """Retrieve the statistics of a user's coin; shards are summed and the averages derived from the totals."""
+
+    totals = None
+
+    catalog_id = await get_catalog_id(session, coin_name, coin_symbol)
+    if catalog_id is not None:
+        query_result = await session.execute(
+            statistics_totals_select()
+            .join(CoinsORM, CoinsORM.id == CoinStatisticsORM.coin_id)
+            .join(UsersORM, UsersORM.id == CoinStatisticsORM.user_id)
+            .where(
+                UsersORM.username == username,
+                UsersORM.deleted_at.is_(None),
+                CoinsORM.catalog_id == catalog_id,
+                CoinsORM.deleted_at.is_(None),
+            )
+        )
+        totals = query_result.one_or_none()
+
+    if totals is None:
+        logger.warning(f"Statistics for coin '{coin_name}' ({coin_symbol}) not found for user '{username}'.")
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Statistics for coin '{coin_name}' ({coin_symbol}) not found for user '{username}'.",
+        )
+
+    return CoinStatisticsResponseSchema(
+        coin_name=coin_name,
+        coin_symbol=coin_symbol,
+        buy_total=totals.buy_total,
+        invested_total=totals.invested_total,
+        invested_avg=average(totals.invested_total, totals.buy_total),
+        sell_total=totals.sell_total,
+        realized_total=totals.realized_total,
+        realized_avg=average(totals.realized_total, totals.sell_total),
+        holdings=totals.holdings,
+        fee_total=totals.fee_total,
+        transactions_count=totals.transactions_count,
+        updated_at=totals.updated_at,
+    )
+
+
+async def merge_statistics_shards(session: AsyncSession, user_id: int, coin_id: int) -> bool:
+    """
+    Fold every shard row of a position into shard 0.
+
+    The rows are locked for the duration of the caller's transaction; the caller commits.
+    Return False when the position has nothing to merge.
+    """
+
+    query_result = await session.execute(
+        select(CoinStatisticsORM)
+        .where(CoinStatisticsORM.user_id == user_id, CoinStatisticsORM.coin_id == coin_id)
+        .order_by(CoinStatisticsORM.shard)
+        .with_for_update()
+    )
+    shard_records = query_result.scalars().all()
+
+    if len(shard_records) < 2 and all(record.shard == 0 for record in shard_records):
+        return False
+
+    base_record, *other_records = shard_records
+    for record in other_records:
+        for field in ADDITIVE_STATISTICS_FIELDS:
+            setattr(base_record, field, getattr(base_record, field) + getattr(record, field))
+
+    base_record.invested_avg = average(base_record.invested_total, base_record.buy_total)
+    base_record.realized_avg = average(base_record.realized_total, base_record.sell_total)
+
+    await session.execute(
+        delete(CoinStatisticsORM).where(CoinStatisticsORM.id.in_([record.id for record in other_records]))
+    )
+    base_record.shard = 0
+    await session.flush()
+
+    logger.info(f"Merged {len(shard_records)} statistics shards of coin {coin_id} for user {user_id}.")
+    return True
+
+
+def idle_cutoff(session: AsyncSession, idle_seconds: float):
+    """SQL expression for the database time `idle_seconds` ago."""
+
+    if session.bind.dialect.name == "sqlite":
+        return func.datetime("now", f"-{idle_seconds} seconds")
+    return func.now() - timedelta(seconds=idle_seconds)
+
+
+async def merge_idle_statistics_shards(session: AsyncSession, idle_seconds: float) -> int:
+    """Merge the shards of every position that has not been written for `idle_seconds`; return the merged count."""
+
+    idle_positions = await session.execute(
+        select(CoinStatisticsORM.user_id, CoinStatisticsORM.coin_id)
+        .group_by(CoinStatisticsORM.user_id, CoinStatisticsORM.coin_id)
+        .having(
+            func.max(CoinStatisticsORM.shard) > 0,
+            func.max(CoinStatisticsORM.updated_at) < idle_cutoff(session, idle_seconds),
+        )
+    )
+    positions = idle_positions.all()
+    await session.commit()
+
+    merged = 0
+    for user_id, coin_id in positions:
+        # one short transaction per position keeps the row locks brief
+        merged += await merge_statistics_shards(session, user_id, coin_id)
+        await session.commit()
+
+    return merged
@@ -2,29 +2,44 @@
 Module for handling coin transactions: creating and managing user coin operations.
 """
 
+import random
+from typing import Sequence
+from decimal import Decimal
+
 from loguru import logger
-from sqlalchemy import select
+from sqlalchemy import select, func
 from fastapi import HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from api.config import get_settings
+from api.database.dialects import dialect_insert
+from api.crud.coin_catalog_crud import get_catalog_id
+from api.crud.leaderboard_crud import coin_leaderboards
+from api.services.tracing import traced
 from api.database.models import UsersORM, CoinsORM, CoinTransactionsORM, CoinStatisticsORM
 from api.schemas.coins_crud_schemas import OperationActionSchema
 
 
+@traced(attributes={"enduser.id": "username", "coin.name": "coin_name", "coin.symbol": "coin_symbol"})
 async def get_coin_or_raise_error(session: AsyncSession, username: str, coin_name: str, coin_symbol: str):
     """Fetch coin information for a user. Raise HTTPException if the coin does not exist."""
 
     try:
-        query_result = await session.execute(
-            select(CoinsORM)
-            .join(UsersORM, UsersORM.id == CoinsORM.user_id)
-            .where(
-                UsersORM.username == username,
-                CoinsORM.name == coin_name,
-                CoinsORM.symbol == coin_symbol,
+        coin_record = None
+
+        catalog_id = await get_catalog_id(session, coin_name, coin_symbol)
+        if catalog_id is not None:
+            query_result = await session.execute(
+                select(CoinsORM)
+                .join(UsersORM, UsersORM.id == CoinsORM.user_id)
+                .where(
+                    UsersORM.username == username,
+                    UsersORM.deleted_at.is_(None),
+                    CoinsORM.catalog_id == catalog_id,
+                    CoinsORM.deleted_at.is_(None),
+                )
             )
-        )
-        coin_record = query_result.scalar_one_or_none()
+            coin_record = query_result.scalar_one_or_none()
 
         if coin_record is None:
             logger.error(f"Coin '{coin_name}' ({coin_symbol}) not found for user '{username}'.")
@@ -35,6 +50,9 @@ async def get_coin_or_raise_error(session: AsyncSession, username: str, coin_nam
 
         return coin_record
 
+    except HTTPException:
+        raise
+
     except Exception as e:
         logger.critical(f"Error while fetching coin for user '{username}': {str(e)}")
         raise HTTPException(
@@ -43,6 +61,24 @@ async def get_coin_or_raise_error(session: AsyncSession, username: str, coin_nam
         )
 
 
+def build_transaction_record(coin_info: CoinsORM, transaction_data: OperationActionSchema) -> CoinTransactionsORM:
+    """
+    Transaction record of an operation on a user's coin, with the amounts as Decimal like the statistics
+    columns they are added to; str() keeps the value the client sent instead of its binary expansion.
+    """
+
+    return CoinTransactionsORM(
+        coin_id=coin_info.id,
+        user_id=coin_info.user_id,
+        buy=Decimal(str(transaction_data.buy)),
+        sell=Decimal(str(transaction_data.sell)),
+        paid=Decimal(str(transaction_data.paid)),
+        average_price=Decimal(str(transaction_data.average_price)),
+        fee=Decimal(str(transaction_data.fee)),
+    )
+
+
+@traced(attributes={"enduser.id": "transaction_data.username", "coin.symbol": "transaction_data.coin_symbol"})
 async def new_transaction_record(session: AsyncSession, transaction_data: OperationActionSchema) -> CoinTransactionsORM:
     """Create a new transaction record for the specified user and coin."""
 
@@ -53,70 +89,145 @@ async def new_transaction_record(session: AsyncSession, transaction_data: Operat
         transaction_data.coin_symbol,
     )
 
-    transaction_record = CoinTransactionsORM(
-        coin_id=coin_info.id,
-        user_id=coin_info.user_id,
-        buy=transaction_data.buy,
-        sell=transaction_data.sell,
-        paid=transaction_data.paid,
-        average_price=transaction_data.average_price,
-        fee=transaction_data.fee,
-    )
+    transaction_record = build_transaction_record(coin_info, transaction_data)
 
     logger.info(f"Transaction record created for user '{transaction_data.username}'.")
     return transaction_record
 
 
-async def update_coin_statistics(session: AsyncSession, transaction: CoinTransactionsORM) -> CoinStatisticsORM:
-    """Update or create coin statistics for a user based on the provided transaction."""
+def apply_transaction_to_statistics(
+    statistics_record: CoinStatisticsORM,
+    transaction: CoinTransactionsORM,
+) -> CoinStatisticsORM:
+    """Add a transaction to an existing statistics record and recalculate the average values."""
+
+    statistics_record.buy_total += transaction.buy
+    statistics_record.sell_total += transaction.sell
+    statistics_record.invested_total += transaction.paid if transaction.buy > 0 else 0
+    statistics_record.realized_total += transaction.paid if transaction.sell > 0 else 0
+    statistics_record.holdings += transaction.buy - transaction.sell
+    statistics_record.fee_total += transaction.fee
+    statistics_record.transactions_count += 1
+
+    # Update average values
+    statistics_record.invested_avg = (
+        statistics_record.invested_total / statistics_record.buy_total if statistics_record.buy_total > 0 else 0
+    )
+    statistics_record.realized_avg = (
+        statistics_record.realized_total / statistics_record.sell_total if statistics_record.sell_total > 0 else 0
+    )
+    return statistics_record
+
+
+def new_statistics_values(transaction: CoinTransactionsORM, shard: int = 0) -> dict:
+    """Column values of the statistics row created by the first transaction of a user's coin (or of one of its shards)."""
+
+    return {
+        "user_id": transaction.user_id,
+        "coin_id": transaction.coin_id,
+        "shard": shard,
+        "buy_total": transaction.buy,
+        "sell_total": transaction.sell,
+        "invested_total": transaction.paid if transaction.buy > 0 else 0,
+        "realized_total": transaction.paid if transaction.sell > 0 else 0,
+        "invested_avg": transaction.average_price if transaction.buy > 0 else 0,
+        "realized_avg": transaction.average_price if transaction.sell > 0 else 0,
+        "holdings": transaction.buy - transaction.sell,
+        "fee_total": transaction.fee,
+        "transactions_count": 1,
+    }
+
+
+def choose_statistics_shard(user_id: int) -> int:
+    """Pick the statistics row to write to: a random shard for sharded users, shard 0 for everyone else."""
+
+    statistics_settings = get_settings().statistics
+    if user_id in statistics_settings.sharded_user_ids:
+        return random.randrange(statistics_settings.shards)
+    return 0
 
-    query_result = await session.execute(
+
+@traced(attributes={"user.id": "transaction.user_id", "coin.id": "transaction.coin_id"})
+async def update_coin_statistics(
+    session: AsyncSession,
+    transaction: CoinTransactionsORM,
+    *more_transactions: CoinTransactionsORM,
+) -> CoinStatisticsORM:
+    """
+    Update or create coin statistics for a user based on the provided transaction.
+
+    Further transactions of the same user and coin can be passed to apply them under the same row lock.
+    For sharded users only one randomly chosen shard row is locked and updated.
+    """
+
+    shard = choose_statistics_shard(transaction.user_id)
+    statistics_query = (
         select(CoinStatisticsORM)
         .where(
             CoinStatisticsORM.user_id == transaction.user_id,
             CoinStatisticsORM.coin_id == transaction.coin_id,
+            CoinStatisticsORM.shard == shard,
         )
+        # SQLite has no row locks: there write transactions hold the database write lock from BEGIN IMMEDIATE
         .with_for_update()
     )
-    statistics_record = query_result.scalar_one_or_none()
 
+    statistics_record = (await session.execute(statistics_query)).scalar_one_or_none()
     if statistics_record is not None:
-        # Update existing statistics record
-        statistics_record.buy_total += transaction.buy
-        statistics_record.sell_total += transaction.sell
-        statistics_record.invested_total += transaction.paid if transaction.buy > 0 else 0
-        statistics_record.realized_total += transaction.paid if transaction.sell > 0 else 0
-        statistics_record.holdings += transaction.buy - transaction.sell
-        statistics_record.fee_total += transaction.fee
-        statistics_record.transactions_count += 1
-
-        # Update average values
-        statistics_record.invested_avg = (
-            statistics_record.invested_total / statistics_record.buy_total if statistics_record.buy_total > 0 else 0
+        apply_transaction_to_statistics(statistics_record, transaction)
+    else:
+        # a concurrent first transaction may insert the row in between: it wins and this one waits for its lock
+        statistics_record = await session.scalar(
+            dialect_insert(session, CoinStatisticsORM)
+            .values(new_statistics_values(transaction, shard=shard))
+            .on_conflict_do_nothing(index_elements=["user_id", "coin_id", "shard"])
+            .returning(CoinStatisticsORM)
         )
-        statistics_record.realized_avg = (
-            statistics_record.realized_total / statistics_record.sell_total if statistics_record.sell_total > 0 else 0
+        if statistics_record is None:
+            statistics_record = (await session.execute(statistics_query)).scalar_one()
+            apply_transaction_to_statistics(statistics_record, transaction)
+
+    for next_transaction in more_transactions:
+        apply_transaction_to_statistics(statistics_record, next_transaction)
+
+    return statistics_record
+
+
+async def position_holdings(session: AsyncSession, statistics_record: CoinStatisticsORM) -> float:
+    """Total holdings of the position of an updated statistics row, inside the updating transaction."""
+
+    if statistics_record.user_id not in get_settings().statistics.sharded_user_ids:
+        return statistics_record.holdings
+
+    # the updated row is only one of the shards of the position; the application sessions do not autoflush
+    await session.flush()
+    return await session.scalar(
+        select(func.sum(CoinStatisticsORM.holdings)).where(
+            CoinStatisticsORM.user_id == statistics_record.user_id,
+            CoinStatisticsORM.coin_id == statistics_record.coin_id,
         )
-        return statistics_record
-
-    # Create a new statistics record
-    new_statistics_record = CoinStatisticsORM(
-        user_id=transaction.user_id,
-        coin_id=transaction.coin_id,
-        buy_total=transaction.buy,
-        sell_total=transaction.sell,
-        invested_total=transaction.paid if transaction.buy > 0 else 0,
-        realized_total=transaction.paid if transaction.sell > 0 else 0,
-        invested_avg=transaction.average_price if transaction.buy > 0 else 0,
-        realized_avg=transaction.average_price if transaction.sell > 0 else 0,
-        holdings=transaction.buy - transaction.sell,
-        fee_total=transaction.fee,
-        transactions_count=1,
     )
-    return new_statistics_record
 
 
-async def process_coin_transaction(session: AsyncSession, transaction_data: OperationActionSchema) -> None:
+def record_holdings_change(
+    username: str,
+    catalog_id: int,
+    holdings: float,
+    transactions: Sequence[CoinTransactionsORM],
+) -> None:
+    """Feed the committed change of a position's holdings to the leaderboard of its coin."""
+
+    try:
+        change = sum(transaction.buy - transaction.sell for transaction in transactions)
+        coin_leaderboards.record(catalog_id, username, holdings - change, holdings)
+
+    except Exception as e:
+        # the next reseed catches up, the transaction itself is committed
+        logger.error(f"Error while updating the leaderboard of coin {catalog_id}: {str(e)}")
+
+
+@traced(attributes={"enduser.id": "transaction_data.username", "coin.symbol": "transaction_data.coin_symbol"})
+async def process_coin_transaction(session: AsyncSession, transaction_data: OperationActionSchema) -> CoinTransactionsORM:
     """Process a coin transaction: create the transaction record and update statistics."""
 
     try:
@@ -126,10 +237,15 @@ async def process_coin_transaction(session: AsyncSession, transaction_data: Oper
 
             session.add(transaction_record)
             session.add(statistics_record)
+            catalog_id = await get_catalog_id(session, transaction_data.coin_name, transaction_data.coin_symbol)
+            holdings = await position_holdings(session, statistics_record)
+
+        record_holdings_change(transaction_data.username, catalog_id, holdings, [transaction_record])
 
         logger.info(
             f"Transaction processed successfully for user '{transaction_data.username}', coin '{transaction_data.coin_name}' ({transaction_data.coin_symbol})."
         )
+        return transaction_record
 
     except HTTPException as e:
         logger.error(f"HTTPException during transaction processing: {e.detail}")
@@ -141,3 +257,52 @@ async def process_coin_transaction(session: AsyncSession, transaction_data: Oper
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Unexpected error while processing the transaction.",
         )
+
+
+@traced()
+async def process_coin_transactions_batch(
+    session: AsyncSession,
+    transactions_data: Sequence[OperationActionSchema],
+) -> list[CoinTransactionsORM]:
+    """
+    Process several transactions of the same user and coin in one database transaction.
+
+    The coin is looked up once and the statistics row is locked and updated once for the whole batch.
+    """
+
+    first_transaction = transactions_data[0]
+
+    try:
+        async with session.begin():
+            coin_info = await get_coin_or_raise_error(
+                session,
+                first_transaction.username,
+                first_transaction.coin_name,
+                first_transaction.coin_symbol,
+            )
+            transaction_records = [
+                build_transaction_record(coin_info, transaction_data) for transaction_data in transactions_data
+            ]
+            statistics_record = await update_coin_statistics(session, *transaction_records)
+
+            session.add_all(transaction_records)
+            session.add(statistics_record)
+            holdings = await position_holdings(session, statistics_record)
+
+        record_holdings_change(first_transaction.username, coin_info.catalog_id, holdings, transaction_records)
+
+        logger.info(
+            f"Batch of {len(transaction_records)} transactions processed for user '{first_transaction.username}', coin '{first_transaction.coin_name}' ({first_transaction.coin_symbol})."
+        )
+        return transaction_records
+
+    except HTTPException as e:
+        logger.error(f"HTTPException during batch transaction processing: {e.detail}")
+        raise
+
+    except Exception as e:
+        logger.critical(f"Critical error during batch transaction processing: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Unexpected error while processing the transaction.",
+        )
@@ -4,32 +4,71 @@ Module for managing user operations: creating, retrieving, and deleting user acc
 
 from loguru import logger
 from pydantic import ValidationError
-from sqlalchemy import delete, select
+from sqlalchemy import select, update, delete, func
 from sqlalchemy.exc import IntegrityError
 from fastapi import HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from api.database.models import UsersORM
+from api.database.models import UsersORM, CoinsORM, UserEmailsORM
+from api.database.shard_router import shard_router
+from api.crud.coin_search_crud import coin_search_index
+from api.crud.leaderboard_crud import coin_leaderboards
 from api.schemas.users_crud_schemas import UserActionSchema, UserInfoResponseSchema, AllUsersResponseSchema
 
 
+def user_info(user) -> UserInfoResponseSchema:
+    """
+    Response schema of a stored user, built without validation.
+
+    Usernames and emails were validated and normalized when the user was created, running the username
+    rules and `EmailStr` again on every read is pure overhead.
+    """
+    return UserInfoResponseSchema.model_construct(
+        id=user.id,
+        username=user.username,
+        email=user.email,
+        registered_at=user.registered_at,
+    )
+
+
+async def reserve_email(user_data: UserActionSchema) -> None:
+    """
+    Register the email of a new user on the primary; with several shards the unique index of each shard's
+    `users` table only covers the users of that shard.
+    """
+
+    async with shard_router.primary.async_session_factory() as primary_session:
+        primary_session.add(UserEmailsORM(email=user_data.email, username=user_data.username))
+        await primary_session.commit()
+
+
+async def release_email(email: str) -> None:
+    """Free the email of a deleted user, or of a registration that failed after reserving it."""
+
+    async with shard_router.primary.async_session_factory() as primary_session:
+        await primary_session.execute(delete(UserEmailsORM).where(UserEmailsORM.email == email))
+        await primary_session.commit()
+
+
 async def create_user(user_data: UserActionSchema, session: AsyncSession) -> UserInfoResponseSchema:
     """Add a new user to the database."""
 
+    reserved = False
     try:
+        if shard_router.sharded:
+            await reserve_email(user_data)
+            reserved = True
+
         new_user = UsersORM(**user_data.model_dump())
         session.add(new_user)
         await session.commit()
 
         logger.info(f"User created: username='{user_data.username}', email='{user_data.email}'.")
-        return UserInfoResponseSchema(
-            id=new_user.id,
-            username=new_user.username,
-            email=new_user.email,
-            registered_at=new_user.registered_at,
-        )
+        return user_info(new_user)
     except IntegrityError:
         logger.warning(f"Integrity error for user '{user_data.username}'.")
+        if reserved:
+            await release_email(user_data.email)
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
             detail="Username or email already exists.",
@@ -47,30 +86,57 @@ async def read_all_users(session: AsyncSession) -> AllUsersResponseSchema:
     """Retrieve all registered users."""
 
     try:
-        users_query = await session.execute(select(UsersORM))
-        users = users_query.scalars().all()
-        logger.info(f"Retrieved {len(users)} users.")
-        return AllUsersResponseSchema(
-            users=[
-                UserInfoResponseSchema(
-                    id=user.id,
-                    username=user.username,
-                    email=user.email,
-                    registered_at=user.registered_at,
-                )
-                for user in users
-            ]
+        users_query = await session.execute(
+            select(UsersORM.id, UsersORM.username, UsersORM.email, UsersORM.registered_at).where(
+                UsersORM.deleted_at.is_(None)
+            )
         )
+        users = [user_info(user) for user in users_query]
+        logger.info(f"Retrieved {len(users)} users.")
+        return AllUsersResponseSchema.model_construct(users=users)
 
     except Exception as e:
         logger.error(f"Error retrieving users: {e}")
         return AllUsersResponseSchema(users=[])
 
 
+def merge_user_lists(user_lists: list[AllUsersResponseSchema]) -> AllUsersResponseSchema:
+    """Combine the user lists read from several shards."""
+    return AllUsersResponseSchema.model_construct(users=[user for user_list in user_lists for user in user_list.users])
+
+
+async def read_users_version(session: AsyncSession) -> tuple:
+    """
+    Change marker of the user list: the number of live users and the newest id, registration and deletion.
+
+    Users are never updated in place, a new one raises the largest id and a deleted one lowers the count.
+    """
+
+    query_result = await session.execute(
+        select(
+            func.count(UsersORM.id).filter(UsersORM.deleted_at.is_(None)),
+            func.max(UsersORM.id),
+            func.max(UsersORM.registered_at),
+            func.max(UsersORM.deleted_at),
+        )
+    )
+    return tuple(query_result.one())
+
+
+async def read_user_version(username: str, session: AsyncSession) -> tuple | None:
+    """Change marker of a user record, its id and registration time; None when there is no such user."""
+
+    query_result = await session.execute(
+        select(UsersORM.id, UsersORM.registered_at).where(UsersORM.username == username, UsersORM.deleted_at.is_(None))
+    )
+    version = query_result.one_or_none()
+    return tuple(version) if version is not None else None
+
+
 async def read_user_by_username(username: str, session: AsyncSession) -> UserInfoResponseSchema:
     """Retrieve a user by their username."""
 
-    user_query = await session.execute(select(UsersORM).where(UsersORM.username == username))
+    user_query = await session.execute(select(UsersORM).where(UsersORM.username == username, UsersORM.deleted_at.is_(None)))
 
     user = user_query.scalar_one_or_none()
     if not user:
@@ -81,16 +147,16 @@ async def read_user_by_username(username: str, session: AsyncSession) -> UserInf
         )
 
     logger.info(f"User '{username}' retrieved.")
-    return UserInfoResponseSchema(
-        id=user.id,
-        username=user.username,
-        email=user.email,
-        registered_at=user.registered_at,
-    )
+    return user_info(user)
 
 
 async def delete_user_by_username(user_data: UserActionSchema, session: AsyncSession) -> UserInfoResponseSchema:
-    """Delete a user from the database."""
+    """
+    Mark a user and all their coins as deleted.
+
+    The request only touches the user's own rows; their transactions, statistics and snapshots are removed
+    in small batches by the purge worker.
+    """
 
     try:
         user_query = await session.execute(
@@ -98,6 +164,7 @@ async def delete_user_by_username(user_data: UserActionSchema, session: AsyncSes
                 UsersORM.username == user_data.username,
                 UsersORM.email == user_data.email,
                 UsersORM.password == user_data.password,
+                UsersORM.deleted_at.is_(None),
             )
         )
         user = user_query.scalar_one_or_none()
@@ -110,16 +177,24 @@ async def delete_user_by_username(user_data: UserActionSchema, session: AsyncSes
                 detail=f"User with username '{user_data.username}' and the provided email and password not found for deletion.",
             )
 
-        await session.execute(delete(UsersORM).where(UsersORM.id == user.id))
+        await session.execute(update(UsersORM).where(UsersORM.id == user.id).values(deleted_at=func.now()))
+        coins_result = await session.execute(
+            update(CoinsORM)
+            .where(CoinsORM.user_id == user.id, CoinsORM.deleted_at.is_(None))
+            .values(deleted_at=func.now())
+            .returning(CoinsORM.catalog_id)
+        )
+        deleted_catalog_ids = coins_result.scalars().all()
         await session.commit()
+        if shard_router.sharded:
+            await release_email(user.email)
+
+        for catalog_id in deleted_catalog_ids:
+            coin_search_index.change_holders(catalog_id, -1)
+            coin_leaderboards.invalidate(catalog_id)
 
         logger.info(f"User deleted successfully: username='{user.username}', email='{user.email}'.")
-        return UserInfoResponseSchema(
-            id=user.id,
-            username=user.username,
-            email=user.email,
-            registered_at=user.registered_at,
-        )
+        return user_info(user)
 
     except HTTPException as e:
         logger.error(f"HTTP exception occurred: {e.detail}")
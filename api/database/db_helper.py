@@ -4,44 +4,145 @@ Database helper module for managing asynchronous database connections and sessio
 
 from typing import AsyncGenerator
 
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine, AsyncSession, async_sessionmaker
 
-from api.config import settings
+from api.config import SqliteConfig, get_settings
+from api.database.lazy_session import LazySession
+from api.database.sqlite import is_sqlite, is_memory, configure_sqlite_engine
 
 
 class DatabaseHelper:
-    """Helper class for managing database connections."""
+    """
+    Helper class for managing database connections.
 
-    def __init__(self, db_url: str, echo: bool = False, echo_pool=True, pool_size=5, max_overflow=1):
-        """Initialize the database engine and session factory."""
+    A SQLite database gets two engines: the writer, a single connection that every write transaction
+    queues for in arrival order, and `read_engine`, a pool of read-only connections for GET requests
+    that run concurrently with the writer thanks to WAL.
+    """
+
+    def __init__(
+        self,
+        db_url: str | None = None,
+        echo: bool = False,
+        echo_pool=True,
+        pool_size=5,
+        max_overflow=1,
+        sqlite: SqliteConfig | None = None,
+    ):
+        """
+        Store the engine configuration.
+
+        The engine itself is created by `connect()`, which is called from the application lifespan,
+        so every worker process builds its own connection pool after it has been started.
+        Without `db_url` the configuration is read from the settings on the first `connect()`.
+        """
+        self.db_url = db_url
+        self.echo = echo
+        self.echo_pool = echo_pool
+        self.pool_size = pool_size
+        self.max_overflow = max_overflow
+        self.sqlite = sqlite or SqliteConfig()
+
+        self.engine: AsyncEngine | None = None
+        self.async_session_factory: async_sessionmaker[AsyncSession] | None = None
+        # only set for SQLite files; sessions that only read may use it instead of `async_session_factory`
+        self.read_engine: AsyncEngine | None = None
+        self.read_session_factory: async_sessionmaker[AsyncSession] | None = None
+
+    def connect(self) -> None:
+        """Create the database engine and session factory for the current process."""
+        if self.engine is not None:
+            return
+
+        if self.db_url is None:
+            self.configure_from_settings()
+
+        if is_sqlite(self.db_url):
+            self._connect_sqlite()
+            return
+
+        pool_options = {"pool_size": self.pool_size, "max_overflow": self.max_overflow}
         self.engine = create_async_engine(
-            db_url,
-            echo=echo,
-            echo_pool=echo_pool,
-            pool_size=pool_size,
-            max_overflow=max_overflow,
+            self.db_url,
+            echo=self.echo,
+            echo_pool=self.echo_pool,
+            **{key: value for key, value in pool_options.items() if value is not None},
         )
-        self.async_session_factory: async_sessionmaker[AsyncSession] = async_sessionmaker(
-            bind=self.engine,
+        self.async_session_factory = self._session_factory(self.engine)
+
+    def _connect_sqlite(self) -> None:
+        if is_memory(self.db_url):
+            # one connection holds the whole database, there is nothing to read concurrently
+            self.engine = create_async_engine(self.db_url, echo=self.echo)
+            configure_sqlite_engine(self.engine, self.sqlite, immediate=True)
+            self.async_session_factory = self._session_factory(self.engine)
+            return
+
+        self.engine = create_async_engine(
+            self.db_url,
+            echo=self.echo,
+            echo_pool=self.echo_pool,
+            pool_size=1,
+            max_overflow=0,
+            pool_timeout=self.sqlite.write_timeout_s,
+        )
+        configure_sqlite_engine(self.engine, self.sqlite, immediate=True)
+        self.read_engine = create_async_engine(
+            self.db_url,
+            echo=self.echo,
+            echo_pool=self.echo_pool,
+            pool_size=self.sqlite.read_pool_size,
+            max_overflow=0,
+        )
+        configure_sqlite_engine(self.read_engine, self.sqlite, immediate=False, query_only=True)
+        self.async_session_factory = self._session_factory(self.engine)
+        self.read_session_factory = self._session_factory(self.read_engine)
+
+    @staticmethod
+    def _session_factory(engine: AsyncEngine) -> async_sessionmaker[AsyncSession]:
+        return async_sessionmaker(
+            bind=engine,
             autoflush=False,
             autocommit=False,
             expire_on_commit=False,
         )
 
+    def configure_from_settings(self) -> None:
+        """Take the engine configuration from the application settings."""
+        db_settings = get_settings().db
+        self.db_url = str(db_settings.url)
+        self.echo = db_settings.echo
+        self.echo_pool = db_settings.echo_pool
+        self.pool_size = db_settings.pool_size
+        self.max_overflow = db_settings.max_overflow
+        self.sqlite = db_settings.sqlite
+
     async def dispose(self) -> None:
-        """Dispose of the database engine."""
+        """Dispose of the database engines and close every pooled connection."""
+        if self.engine is None:
+            return
+
         await self.engine.dispose()
+        if self.read_engine is not None:
+            await self.read_engine.dispose()
+        self.engine = self.read_engine = None
+        self.async_session_factory = self.read_session_factory = None
 
     async def session_getter(self) -> AsyncGenerator[AsyncSession, None]:
-        """Give an async session generator."""
-        async with self.async_session_factory() as session:
+        """
+        Give a request session.
+
+        The session is opened on its first use and checks out a connection on its first statement; routes of
+        `SessionReleasingRoute` release it before the response is serialized, otherwise it is closed here.
+        """
+        if self.async_session_factory is None:
+            raise RuntimeError("Database engine is not initialized. Call 'connect()' during application startup.")
+
+        session = LazySession(self.async_session_factory)
+        try:
             yield session
+        finally:
+            await session.release()
 
 
-db_helper = DatabaseHelper(
-    str(settings.db.url),
-    echo=settings.db.echo,
-    echo_pool=settings.db.echo_pool,
-    pool_size=settings.db.pool_size,
-    max_overflow=settings.db.max_overflow,
-)
+db_helper = DatabaseHelper()
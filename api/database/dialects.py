@@ -0,0 +1,14 @@
+"""
+Helpers for statements whose syntax differs between PostgreSQL and the SQLite databases used in tests.
+"""
+
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+def dialect_insert(session: AsyncSession, table):
+    """Give the `INSERT` construct of the session's dialect, which supports `ON CONFLICT` clauses."""
+
+    if session.bind.dialect.name == "sqlite":
+        return sqlite.insert(table)
+    return postgresql.insert(table)
@@ -0,0 +1,58 @@
+"""
+Request sessions that are created on first use and released before the response is serialized.
+"""
+
+import functools
+from typing import Any, Callable
+
+from fastapi.routing import APIRoute
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+class LazySession:
+    """
+    Stand-in for an `AsyncSession` that opens the real session on first use.
+
+    A request that fails validation, hits a cache or returns early never creates a session. `release()`
+    closes the session, rolling back anything uncommitted and returning its connection to the pool;
+    the session is opened again if it is used afterwards.
+    """
+
+    def __init__(self, session_factory: Callable[[], AsyncSession]):
+        self._session_factory = session_factory
+        self._session: AsyncSession | None = None
+
+    @property
+    def opened(self) -> bool:
+        return self._session is not None
+
+    def __getattr__(self, name: str) -> Any:
+        if self._session is None:
+            self._session = self._session_factory()
+        return getattr(self._session, name)
+
+    async def release(self) -> None:
+        if self._session is not None:
+            session, self._session = self._session, None
+            await session.close()
+
+
+class SessionReleasingRoute(APIRoute):
+    """
+    Route that releases the request's lazy sessions as soon as the endpoint returns.
+
+    FastAPI serializes the response before it tears down the dependencies, so without this the
+    connection of a read-only request would stay checked out during serialization.
+    """
+
+    def __init__(self, path: str, endpoint: Callable[..., Any], **kwargs: Any):
+        @functools.wraps(endpoint)
+        async def release_after(*args: Any, **values: Any) -> Any:
+            try:
+                return await endpoint(*args, **values)
+            finally:
+                for value in values.values():
+                    if isinstance(value, LazySession):
+                        await value.release()
+
+        super().__init__(path, release_after, **kwargs)
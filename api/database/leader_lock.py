@@ -0,0 +1,101 @@
+"""
+Electing one worker process of all for background jobs that every worker runs, like the purge.
+"""
+
+import fcntl
+import hashlib
+import contextlib
+from typing import IO
+
+from loguru import logger
+from sqlalchemy import select, func
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+from api.database.sqlite import is_memory
+
+
+class LeaderLock:
+    """
+    A lock that one worker process holds until it releases it or exits; the others skip the job.
+
+    On PostgreSQL it is a session level advisory lock, kept on a connection of its own outside any
+    transaction. On a SQLite file it is an exclusive `flock` of a file next to the database, and an
+    in-memory SQLite database belongs to a single process, which always holds it. `acquire()` never
+    waits: a worker that did not get the lock tries again on its next run and takes over once the
+    leader has exited.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        # advisory lock keys are signed 64 bit integers shared by every application using the database
+        self.key = int.from_bytes(hashlib.blake2b(name.encode(), digest_size=8).digest(), "big", signed=True)
+        self._connection: AsyncConnection | None = None
+        self._file: IO | None = None
+        self._memory = False
+
+    @property
+    def held(self) -> bool:
+        return self._connection is not None or self._file is not None or self._memory
+
+    async def acquire(self, engine: AsyncEngine) -> bool:
+        """Take the lock on the database of `engine` unless another process holds it; return whether this one does."""
+        if self._connection is not None:
+            try:
+                await self._connection.scalar(select(1))
+                return True
+            except DBAPIError:
+                # the lock went with the connection, another worker may hold it by now
+                logger.warning(f"Lost the connection holding the '{self.name}' leader lock.")
+                await self._close_connection()
+        if self.held:
+            return True
+
+        if engine.dialect.name == "postgresql":
+            await self._acquire_advisory_lock(engine)
+        elif is_memory(engine.url.render_as_string()):
+            self._memory = True
+        else:
+            self._acquire_file_lock(f"{engine.url.database}.{self.name}.lock")
+
+        if self.held:
+            logger.info(f"This worker process holds the '{self.name}' leader lock.")
+        return self.held
+
+    async def _acquire_advisory_lock(self, engine: AsyncEngine) -> None:
+        connection = await engine.connect()
+        try:
+            await connection.execution_options(isolation_level="AUTOCOMMIT")
+            if await connection.scalar(select(func.pg_try_advisory_lock(self.key))):
+                self._connection = connection
+                return
+        except Exception:
+            await connection.close()
+            raise
+        await connection.close()
+
+    def _acquire_file_lock(self, path: str) -> None:
+        file = open(path, "a")
+        try:
+            fcntl.flock(file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            file.close()
+            return
+        self._file = file
+
+    async def _close_connection(self) -> None:
+        with contextlib.suppress(DBAPIError):
+            await self._connection.close()
+        self._connection = None
+
+    async def release(self) -> None:
+        """Let another worker process take over."""
+        if self._connection is not None:
+            with contextlib.suppress(DBAPIError):
+                await self._connection.scalar(select(func.pg_advisory_unlock(self.key)))
+            await self._close_connection()
+        if self._file is not None:
+            # closing the file drops the flock
+            self._file.close()
+            self._file = None
+        self._memory = False
@@ -1,13 +1,16 @@
 """Models for interaction with the database"""
 
-from datetime import datetime
+from datetime import datetime, date
 
-from sqlalchemy import ForeignKey, func, UniqueConstraint
-from sqlalchemy import Integer, String, Numeric, TIMESTAMP
-from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
+from sqlalchemy import ForeignKey, func, UniqueConstraint, Index, text
+from sqlalchemy import Integer, String, Numeric, TIMESTAMP, Date, JSON
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 
 CUSTOM_NUMERIC = Numeric(25, 10)
 
+# soft deleted rows keep their values until they are purged, uniqueness only applies to the live ones
+NOT_DELETED = text("deleted_at IS NULL")
+
 
 class Base(DeclarativeBase):
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True, unique=True, nullable=False)
@@ -16,29 +19,75 @@ class Base(DeclarativeBase):
 class UsersORM(Base):
     __tablename__ = "users"
 
-    username: Mapped[str] = mapped_column(String(length=50), nullable=False, unique=True, index=True)
-    email: Mapped[str] = mapped_column(String(length=70), nullable=False, unique=True)
+    username: Mapped[str] = mapped_column(String(length=50), nullable=False, index=True)
+    email: Mapped[str] = mapped_column(String(length=70), nullable=False)
     password: Mapped[str] = mapped_column(String(length=64), nullable=False)
 
     registered_at: Mapped[datetime] = mapped_column(nullable=False, default=func.now())
+    deleted_at: Mapped[datetime | None] = mapped_column(TIMESTAMP(timezone=True), nullable=True, index=True)
+
+    __table_args__ = (
+        Index(
+            "uix_users_username_active",
+            "username",
+            unique=True,
+            postgresql_where=NOT_DELETED,
+            sqlite_where=NOT_DELETED,
+        ),
+        Index("uix_users_email_active", "email", unique=True, postgresql_where=NOT_DELETED, sqlite_where=NOT_DELETED),
+    )
 
     def __str__(self):
         return self.username
 
 
+class UserEmailsORM(Base):
+    __tablename__ = "user_emails"
+
+    # with several shards every live user's email is registered here, on the primary, so it is unique across shards
+    email: Mapped[str] = mapped_column(String(length=70), nullable=False, unique=True)
+    username: Mapped[str] = mapped_column(String(length=50), nullable=False)
+
+    def __str__(self):
+        return self.email
+
+
+class CoinCatalogORM(Base):
+    __tablename__ = "coin_catalog"
+
+    name: Mapped[str] = mapped_column(String(length=100), nullable=False)
+    symbol: Mapped[str] = mapped_column(String(length=100), nullable=False)
+
+    __table_args__ = (UniqueConstraint("name", "symbol", name="uix_coin_catalog_name_symbol"),)
+
+    def __str__(self):
+        return self.name + " " + self.symbol
+
+
 class CoinsORM(Base):
     __tablename__ = "coins"
 
     user_id: Mapped[int] = mapped_column(ForeignKey(UsersORM.id, ondelete="CASCADE"), index=True)
+    catalog_id: Mapped[int] = mapped_column(ForeignKey(CoinCatalogORM.id), nullable=False, index=True)
 
-    name: Mapped[str] = mapped_column(String(length=100), nullable=False, index=True)
-    symbol: Mapped[str] = mapped_column(String(length=100), nullable=False, index=True)
     date_added: Mapped[datetime] = mapped_column(TIMESTAMP(timezone=True), nullable=False, default=func.now())
+    deleted_at: Mapped[datetime | None] = mapped_column(TIMESTAMP(timezone=True), nullable=True, index=True)
 
-    __table_args__ = (UniqueConstraint("user_id", "name", "symbol", name="uix_user_coin_name_symbol"),)
+    catalog: Mapped[CoinCatalogORM] = relationship()
+
+    __table_args__ = (
+        Index(
+            "uix_user_id_catalog_id",
+            "user_id",
+            "catalog_id",
+            unique=True,
+            postgresql_where=NOT_DELETED,
+            sqlite_where=NOT_DELETED,
+        ),
+    )
 
     def __str__(self):
-        return self.name + " " + self.symbol
+        return str(self.catalog)
 
 
 class CoinTransactionsORM(Base):
@@ -75,6 +124,58 @@ class CoinStatisticsORM(Base):
     fee_total: Mapped[float] = mapped_column(CUSTOM_NUMERIC, nullable=False, default=0)
     transactions_count: Mapped[int] = mapped_column(nullable=False, default=0)
 
+    # hot positions spread their totals over several rows, all other positions use shard 0 only
+    shard: Mapped[int] = mapped_column(nullable=False, default=0, server_default="0")
+
     updated_at: Mapped[datetime] = mapped_column(nullable=False, default=func.now(), onupdate=func.now())
 
-    __table_args__ = (UniqueConstraint("user_id", "coin_id", name="uix_user_id_coin_id"),)
+    __table_args__ = (UniqueConstraint("user_id", "coin_id", "shard", name="uix_user_id_coin_id_shard"),)
+
+
+class PortfolioSnapshotsORM(Base):
+    __tablename__ = "portfolio_snapshots"
+
+    user_id: Mapped[int] = mapped_column(ForeignKey(UsersORM.id, ondelete="CASCADE"), nullable=False)
+    coin_id: Mapped[int] = mapped_column(ForeignKey(CoinsORM.id, ondelete="CASCADE"), nullable=False)
+    day: Mapped[date] = mapped_column(Date, nullable=False)
+
+    holdings: Mapped[float] = mapped_column(CUSTOM_NUMERIC, nullable=False, default=0)
+    invested_total: Mapped[float] = mapped_column(CUSTOM_NUMERIC, nullable=False, default=0)
+    realized_total: Mapped[float] = mapped_column(CUSTOM_NUMERIC, nullable=False, default=0)
+    last_price: Mapped[float] = mapped_column(CUSTOM_NUMERIC, nullable=False, default=0)
+    value: Mapped[float] = mapped_column(CUSTOM_NUMERIC, nullable=False, default=0)
+
+    __table_args__ = (
+        UniqueConstraint("user_id", "coin_id", "day", name="uix_user_id_coin_id_day"),
+        Index("ix_portfolio_snapshots_user_id_day", "user_id", "day"),
+    )
+
+
+class PriceAlertsORM(Base):
+    __tablename__ = "price_alerts"
+
+    user_id: Mapped[int] = mapped_column(ForeignKey(UsersORM.id, ondelete="CASCADE"), nullable=False, index=True)
+    catalog_id: Mapped[int] = mapped_column(ForeignKey(CoinCatalogORM.id), nullable=False)
+
+    # "above" fires when the price rises to the threshold, "below" when it falls to it
+    direction: Mapped[str] = mapped_column(String(length=5), nullable=False)
+    threshold: Mapped[float] = mapped_column(CUSTOM_NUMERIC, nullable=False)
+
+    created_at: Mapped[datetime] = mapped_column(TIMESTAMP(timezone=True), nullable=False, default=func.now())
+    triggered_at: Mapped[datetime | None] = mapped_column(TIMESTAMP(timezone=True), nullable=True)
+
+    catalog: Mapped[CoinCatalogORM] = relationship()
+
+    __table_args__ = (Index("ix_price_alerts_active", "catalog_id", postgresql_where=text("triggered_at IS NULL")),)
+
+
+class CoinLeaderboardsORM(Base):
+    __tablename__ = "coin_leaderboards"
+
+    catalog_id: Mapped[int] = mapped_column(ForeignKey(CoinCatalogORM.id), nullable=False, unique=True)
+
+    holders: Mapped[int] = mapped_column(nullable=False, default=0)
+    # [[username, holdings], ...], largest holdings first
+    top: Mapped[list] = mapped_column(JSON, nullable=False, default=list)
+
+    updated_at: Mapped[datetime] = mapped_column(nullable=False, default=func.now(), onupdate=func.now())
@@ -0,0 +1,54 @@
+"""
+Measurement of how long sessions wait for a connection from the pool.
+"""
+
+import time
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+
+class PoolWaitMonitor:
+    """
+    Exponentially weighted average of the pool checkout wait.
+
+    A session takes its connection on its first statement: the wait is the time between the statement
+    being issued (`do_orm_execute`) and the transaction beginning on the checked out connection (`after_begin`).
+    """
+
+    def __init__(self, alpha: float = 0.2):
+        self.alpha = alpha
+        self.average_s = 0.0
+        self.installed = False
+
+    def observe(self, wait_s: float) -> None:
+        self.average_s += self.alpha * (wait_s - self.average_s)
+
+    def install(self) -> None:
+        """Listen to every ORM session; safe to call more than once."""
+        if self.installed:
+            return
+
+        event.listen(Session, "do_orm_execute", self._execute_started)
+        event.listen(Session, "after_begin", self._connection_acquired)
+        self.installed = True
+
+    def uninstall(self) -> None:
+        if not self.installed:
+            return
+
+        event.remove(Session, "do_orm_execute", self._execute_started)
+        event.remove(Session, "after_begin", self._connection_acquired)
+        self.installed = False
+
+    @staticmethod
+    def _execute_started(orm_execute_state) -> None:
+        orm_execute_state.session.info["execute_started"] = time.perf_counter()
+
+    def _connection_acquired(self, session: Session, transaction, connection) -> None:
+        started = session.info.pop("execute_started", None)
+        if started is not None:
+            self.observe(time.perf_counter() - started)
+
+
+pool_wait_monitor = PoolWaitMonitor()
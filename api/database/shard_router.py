@@ -0,0 +1,154 @@
+"""
+Routing of user data to one of several databases.
+"""
+
+import bisect
+import asyncio
+import hashlib
+from typing import AsyncGenerator, Awaitable, Callable, TypeVar
+
+from fastapi import Request
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from api.config import get_settings
+from api.database.lazy_session import LazySession
+from api.database.db_helper import DatabaseHelper, db_helper
+
+T = TypeVar("T")
+
+READ_METHODS = frozenset({"GET", "HEAD"})
+
+
+def stable_hash(key: str) -> int:
+    """Hash that is the same in every process, unlike the salted built-in `hash()`."""
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
+
+
+class ConsistentHashRing:
+    """
+    Map keys to shards with consistent hashing.
+
+    Every shard owns `virtual_nodes` points on the ring, so adding a shard moves only about 1/N of the keys,
+    all of them to the new shard.
+    """
+
+    def __init__(self, shards_count: int, virtual_nodes: int = 64):
+        points = sorted(
+            (stable_hash(f"shard-{shard}-{node}"), shard) for shard in range(shards_count) for node in range(virtual_nodes)
+        )
+        self._hashes = [point_hash for point_hash, _ in points]
+        self._shards = [shard for _, shard in points]
+
+    def shard_for(self, key: str) -> int:
+        index = bisect.bisect(self._hashes, stable_hash(key)) % len(self._hashes)
+        return self._shards[index]
+
+
+class ShardRouter:
+    """
+    One `DatabaseHelper` per shard; a user's rows live on the shard their username hashes to.
+
+    Shard 0 is `db_helper`, the primary database: it holds the canonical coin catalog and serves requests
+    that are not about one user. With no extra shard URLs configured everything goes to the primary.
+    """
+
+    def __init__(self, helpers: list[DatabaseHelper] | None = None, virtual_nodes: int | None = None):
+        """Without arguments the shards are read from the settings on `connect()`."""
+        self.helpers = helpers or []
+        self.virtual_nodes = virtual_nodes
+        self.ring: ConsistentHashRing | None = None
+
+    def configure_from_settings(self) -> None:
+        """Build a helper for every shard URL in the settings, next to the primary `db_helper`."""
+        db_settings = get_settings().db
+        self.helpers = [
+            db_helper,
+            *(
+                DatabaseHelper(
+                    str(url),
+                    echo=db_settings.echo,
+                    echo_pool=db_settings.echo_pool,
+                    pool_size=db_settings.pool_size,
+                    max_overflow=db_settings.max_overflow,
+                )
+                for url in db_settings.shard_urls
+            ),
+        ]
+        if self.virtual_nodes is None:
+            self.virtual_nodes = db_settings.shard_virtual_nodes
+
+    @property
+    def sharded(self) -> bool:
+        return len(self.helpers) > 1
+
+    @property
+    def primary(self) -> DatabaseHelper:
+        return self.helpers[0] if self.helpers else db_helper
+
+    def connect(self) -> None:
+        """Create the engine of every shard for the current process."""
+        if not self.helpers:
+            self.configure_from_settings()
+
+        for helper in self.helpers:
+            helper.connect()
+        self.ring = ConsistentHashRing(len(self.helpers), self.virtual_nodes or 64)
+
+    async def dispose(self) -> None:
+        await asyncio.gather(*(helper.dispose() for helper in self.helpers))
+
+    def shard_for(self, username: str) -> int:
+        # usernames are stored stripped and lowercased, raw path and body values are routed the same way
+        return self.ring.shard_for(username.strip().lower()) if self.sharded else 0
+
+    def session_factory_for(self, username: str | None, read_only: bool = False) -> async_sessionmaker[AsyncSession]:
+        """
+        Session factory of the user's shard, of the primary without a user; sessions that only read
+        get the read-only connections of a SQLite database.
+        """
+        helper = self.helpers[self.shard_for(username)] if username is not None and self.sharded else self.primary
+        if helper.async_session_factory is None:
+            raise RuntimeError("Database engine is not initialized. Call 'connect()' during application startup.")
+        if read_only and helper.read_session_factory is not None:
+            return helper.read_session_factory
+        return helper.async_session_factory
+
+    def is_primary(self, session: AsyncSession) -> bool:
+        return not self.sharded or session.bind is self.primary.engine
+
+    async def session_getter(self, request: Request) -> AsyncGenerator[AsyncSession, None]:
+        """
+        Give a lazy session on the shard of the request's user, a read-only one for GET and HEAD requests.
+
+        The user is the `username` path or query parameter or the `username` field of the JSON body,
+        which FastAPI has already parsed and cached on the request.
+        """
+        username = request.path_params.get("username") or request.query_params.get("username")
+        if username is None and self.sharded and "json" in request.headers.get("content-type", ""):
+            try:
+                body = await request.json()
+            except ValueError:
+                body = None
+            if isinstance(body, dict) and isinstance(body.get("username"), str):
+                username = body["username"]
+
+        session = LazySession(self.session_factory_for(username, read_only=request.method in READ_METHODS))
+        try:
+            yield session
+        finally:
+            await session.release()
+
+    async def fan_out(self, query: Callable[[AsyncSession], Awaitable[T]]) -> list[T]:
+        """
+        Run the read-only `query` on every shard concurrently, each with its own session; results are in shard
+        order. Like GET requests it uses the read-only connections of a SQLite database.
+        """
+
+        async def run(helper: DatabaseHelper) -> T:
+            async with (helper.read_session_factory or helper.async_session_factory)() as session:
+                return await query(session)
+
+        return list(await asyncio.gather(*(run(helper) for helper in self.helpers or [self.primary])))
+
+
+shard_router = ShardRouter()
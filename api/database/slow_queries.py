@@ -0,0 +1,168 @@
+"""
+Recording of slow SQL statements with their plans, for spotting plan regressions in a running process.
+"""
+
+import sys
+import time
+import random
+from collections import deque
+from datetime import datetime, timezone
+from dataclasses import dataclass
+from typing import Callable
+
+from greenlet import getcurrent
+from loguru import logger
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from api.config import SlowQueryConfig, get_settings
+
+EXPLAIN_PREFIXES = {"postgresql": "EXPLAIN (ANALYZE, BUFFERS) ", "sqlite": "EXPLAIN QUERY PLAN "}
+
+
+@dataclass(frozen=True, slots=True)
+class SlowQuery:
+    statement: str
+    parameters: str
+    duration_ms: float
+    caller: str | None
+    recorded_at: datetime
+    plan: str | None = None
+
+
+def calling_function(prefix: str = "api.crud.") -> str | None:
+    """
+    The innermost function of a module under `prefix` that led to the current statement.
+
+    An async session runs the statement in a greenlet whose own stack starts inside SQLAlchemy; the
+    awaiting coroutines are on the stack of the parent greenlet, suspended where it switched over.
+    """
+    frames = [sys._getframe(1)]
+    parent = getcurrent().parent
+    if parent is not None and parent.gr_frame is not None:
+        frames.append(parent.gr_frame)
+
+    for frame in frames:
+        while frame is not None:
+            module = frame.f_globals.get("__name__", "")
+            if module.startswith(prefix):
+                return f"{module}.{frame.f_code.co_name}"
+            frame = frame.f_back
+    return None
+
+
+def is_select(statement: str) -> bool:
+    # a WITH statement may hide a data modifying CTE, only plain SELECTs are run a second time
+    return statement.lstrip()[:6].upper() == "SELECT"
+
+
+class SlowQueryLog:
+    """
+    Engine listener keeping the statements slower than `threshold_ms` in a bounded ring buffer.
+
+    Outside production a sampled share of the slow SELECTs is explained on a second cursor of the same
+    connection, in the same transaction, right after the statement ran.
+    """
+
+    def __init__(self, config: SlowQueryConfig | None = None, environment: str | None = None, sample: Callable[[], float] = random.random):
+        """Without arguments the threshold, buffer size and environment are taken from the settings on install."""
+        self.config = config
+        self.environment = environment
+        self.sample = sample
+        self.records: deque[SlowQuery] = deque(maxlen=config.buffer_size if config else None)
+        self.installed = False
+
+    def configure_from_settings(self) -> None:
+        settings = get_settings()
+        if self.config is None:
+            self.config = settings.slow_queries
+            self.records = deque(self.records, maxlen=self.config.buffer_size)
+        if self.environment is None:
+            self.environment = settings.run.environment
+
+    def install(self) -> None:
+        """Listen to every engine; safe to call more than once."""
+        self.configure_from_settings()
+        if self.installed or not self.config.enabled:
+            return
+
+        event.listen(Engine, "before_cursor_execute", self._before_execute)
+        event.listen(Engine, "after_cursor_execute", self._after_execute)
+        self.installed = True
+
+    def uninstall(self) -> None:
+        if not self.installed:
+            return
+
+        event.remove(Engine, "before_cursor_execute", self._before_execute)
+        event.remove(Engine, "after_cursor_execute", self._after_execute)
+        self.installed = False
+
+    def recent(self, limit: int | None = None) -> list[SlowQuery]:
+        """The slow statements recorded so far, newest first."""
+        records = list(reversed(self.records))
+        return records[:limit] if limit is not None else records
+
+    def clear(self) -> None:
+        self.records.clear()
+
+    @staticmethod
+    def _before_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+        conn.info.setdefault("slow_query_started", []).append(time.perf_counter())
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        started = conn.info.get("slow_query_started")
+        if not started:
+            return
+        duration_ms = (time.perf_counter() - started.pop()) * 1000
+        if duration_ms < self.config.threshold_ms:
+            return
+
+        plan = None
+        if self._should_explain(conn, statement, executemany):
+            plan = self._explain(conn, statement, parameters)
+
+        record = SlowQuery(
+            statement=statement,
+            parameters=repr(parameters)[: self.config.max_parameters_length],
+            duration_ms=round(duration_ms, 3),
+            caller=calling_function(),
+            recorded_at=datetime.now(timezone.utc),
+            plan=plan,
+        )
+        self.records.append(record)
+        logger.warning(f"Slow query ({record.duration_ms} ms) from {record.caller}: {statement[:200]}")
+
+    def _should_explain(self, conn, statement: str, executemany: bool) -> bool:
+        return (
+            self.environment != "production"
+            and not executemany
+            and conn.dialect.name in EXPLAIN_PREFIXES
+            and is_select(statement)
+            and self.sample() < self.config.explain_sample_ratio
+        )
+
+    @staticmethod
+    def _explain(conn, statement: str, parameters) -> str | None:
+        # a separate cursor: the rows of the slow statement have not been fetched yet
+        explain_cursor = conn.connection.cursor()
+        # on PostgreSQL a failing EXPLAIN would abort the transaction of the request
+        savepoint = conn.dialect.name == "postgresql"
+        try:
+            if savepoint:
+                explain_cursor.execute("SAVEPOINT slow_query_explain")
+            explain_cursor.execute(EXPLAIN_PREFIXES[conn.dialect.name] + statement, parameters)
+            plan = "\n".join(" ".join(str(column) for column in row) for row in explain_cursor.fetchall())
+            if savepoint:
+                explain_cursor.execute("RELEASE SAVEPOINT slow_query_explain")
+            return plan
+        except Exception as e:
+            logger.error(f"Error while explaining a slow query: {e}")
+            if savepoint:
+                explain_cursor.execute("ROLLBACK TO SAVEPOINT slow_query_explain")
+            return None
+        finally:
+            explain_cursor.close()
+
+
+slow_query_log = SlowQueryLog()
@@ -0,0 +1,117 @@
+"""
+Spans for the SQL statements, pool checkouts and commits of the current trace.
+"""
+
+import time
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from api.services.tracing import tracer, current_span, SPAN_KIND_CLIENT
+
+
+class SqlTracing:
+    """
+    Engine and session listeners that add child spans to the current span.
+
+    Statements issued outside a sampled trace only cost the lookup of the current span. The SQLAlchemy
+    greenlets run in the context of the awaiting task, so the current span is the one of the CRUD step.
+    """
+
+    def __init__(self):
+        self.installed = False
+
+    def install(self) -> None:
+        """Listen to every engine and ORM session; safe to call more than once."""
+        if self.installed:
+            return
+
+        event.listen(Engine, "before_cursor_execute", self._before_execute)
+        event.listen(Engine, "after_cursor_execute", self._after_execute)
+        event.listen(Engine, "handle_error", self._execute_failed)
+        event.listen(Session, "do_orm_execute", self._orm_execute_started)
+        event.listen(Session, "after_begin", self._connection_acquired)
+        event.listen(Session, "before_commit", self._commit_started)
+        event.listen(Session, "after_transaction_end", self._transaction_ended)
+        self.installed = True
+
+    def uninstall(self) -> None:
+        if not self.installed:
+            return
+
+        event.remove(Engine, "before_cursor_execute", self._before_execute)
+        event.remove(Engine, "after_cursor_execute", self._after_execute)
+        event.remove(Engine, "handle_error", self._execute_failed)
+        event.remove(Session, "do_orm_execute", self._orm_execute_started)
+        event.remove(Session, "after_begin", self._connection_acquired)
+        event.remove(Session, "before_commit", self._commit_started)
+        event.remove(Session, "after_transaction_end", self._transaction_ended)
+        self.installed = False
+
+    @staticmethod
+    def _before_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+        if current_span.get() is None:
+            return
+
+        operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "SQL"
+        span = tracer.start_span(
+            f"db {operation}",
+            {
+                "db.system": conn.dialect.name,
+                "db.operation": operation,
+                "db.statement": statement[: tracer.config.max_statement_length],
+            },
+            kind=SPAN_KIND_CLIENT,
+        )
+        conn.info.setdefault("tracing_spans", []).append(span)
+
+    @staticmethod
+    def _after_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+        spans = conn.info.get("tracing_spans")
+        if spans:
+            span = spans.pop()
+            if cursor is not None and cursor.rowcount >= 0:
+                span.set_attribute("db.rows", cursor.rowcount)
+            tracer.end_span(span)
+
+    @staticmethod
+    def _execute_failed(exception_context) -> None:
+        conn = exception_context.connection
+        spans = conn.info.get("tracing_spans") if conn is not None else None
+        if spans:
+            span = spans.pop()
+            span.record_error(exception_context.original_exception)
+            tracer.end_span(span)
+
+    @staticmethod
+    def _orm_execute_started(orm_execute_state) -> None:
+        if current_span.get() is not None:
+            orm_execute_state.session.info["tracing_execute_started"] = time.time_ns()
+
+    @staticmethod
+    def _connection_acquired(session: Session, transaction, connection) -> None:
+        # the session checks a connection out of the pool on its first statement
+        started = session.info.pop("tracing_execute_started", None)
+        if started is None:
+            return
+        span = tracer.start_span("db.pool.checkout", start_ns=started)
+        if span is not None:
+            tracer.end_span(span)
+
+    @staticmethod
+    def _commit_started(session: Session) -> None:
+        span = tracer.start_span("db.commit")
+        if span is not None:
+            session.info["tracing_commit"] = span
+
+    @staticmethod
+    def _transaction_ended(session: Session, transaction) -> None:
+        if transaction.parent is not None:
+            return
+        span = session.info.pop("tracing_commit", None)
+        if span is not None:
+            tracer.end_span(span)
+
+
+sql_tracing = SqlTracing()
@@ -0,0 +1,58 @@
+"""
+SQLite tuning for single node deployments: pragmas, explicit transactions and a single writer.
+"""
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from api.config import SqliteConfig
+
+
+def is_sqlite(db_url: str) -> bool:
+    return make_url(db_url).get_backend_name() == "sqlite"
+
+
+def is_memory(db_url: str) -> bool:
+    # every connection to an in-memory database gets a database of its own
+    return make_url(db_url).database in (None, "", ":memory:")
+
+
+def sqlite_pragmas(config: SqliteConfig, query_only: bool = False) -> list[str]:
+    pragmas = [
+        f"PRAGMA journal_mode={config.journal_mode.upper()}",
+        f"PRAGMA synchronous={config.synchronous.upper()}",
+        f"PRAGMA mmap_size={config.mmap_size}",
+        # negative values are KiB rather than pages
+        f"PRAGMA cache_size=-{config.cache_size_kib}",
+        f"PRAGMA busy_timeout={config.busy_timeout_ms}",
+        "PRAGMA temp_store=MEMORY",
+        # PostgreSQL enforces the foreign keys, ON DELETE CASCADE included; SQLite only when asked to
+        "PRAGMA foreign_keys=ON",
+    ]
+    if query_only:
+        pragmas.append("PRAGMA query_only=ON")
+    return pragmas
+
+
+def configure_sqlite_engine(engine: AsyncEngine, config: SqliteConfig, immediate: bool, query_only: bool = False) -> None:
+    """
+    Apply the pragmas to every new connection and begin transactions explicitly.
+
+    The driver would only open a transaction before the first write, so the reads before it would not
+    share its snapshot. `BEGIN IMMEDIATE` takes the database write lock up front: a transaction that
+    reads and then writes can not fail with SQLITE_BUSY halfway, which is what `FOR UPDATE` row locks
+    (not supported by SQLite) protect against on PostgreSQL.
+    """
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record) -> None:
+        dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        for pragma in sqlite_pragmas(config, query_only):
+            cursor.execute(pragma)
+        cursor.close()
+
+    @event.listens_for(engine.sync_engine, "begin")
+    def begin(conn) -> None:
+        conn.exec_driver_sql("BEGIN IMMEDIATE" if immediate else "BEGIN")
@@ -1,31 +1,180 @@
 """Main FASTAPI app"""
 
+import asyncio
 from contextlib import asynccontextmanager
 
-import uvicorn
 from fastapi import FastAPI
 from fastapi.responses import ORJSONResponse
 
-from api.config import settings
-from api.database.db_helper import db_helper
-from views.users_views import router as users_router
-from views.coins_views import router as coins_router
+from api.config import get_settings
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    """Lifespan context manager."""
+    """
+    Lifespan context manager.
 
-    # startup
+    Optional subsystems are imported and started only when enabled in the settings, and their startup
+    loads run concurrently, so a worker answers its first request as early as possible.
+    """
+    from api.database.db_helper import db_helper
+    from api.database.shard_router import shard_router
+    from api.database.pool_wait import pool_wait_monitor
+    from api.database.sql_tracing import sql_tracing
+    from api.database.slow_queries import slow_query_log
+    from api.services.tracing import tracer
+    from api.crud.coin_catalog_crud import coin_catalog_cache
+    from api.services.portfolio_snapshots import portfolio_snapshotter
+    from api.services.portfolio_analytics import portfolio_analytics
+    from api.services.portfolio_simulator import portfolio_simulator
+    from api.services.transactions_coalescer import transactions_coalescer
+
+    # startup: every worker process creates its own engine and connection pool for every shard
+    shard_router.connect()
+    pool_wait_monitor.install()
+    slow_query_log.install()
+    settings = get_settings()
+    tracer.start()
+    if tracer.enabled:
+        sql_tracing.install()
+
+    async def warm_catalog() -> None:
+        async with db_helper.async_session_factory() as session:
+            await coin_catalog_cache.warm(session)
+
+    startup = [warm_catalog()]
+    # started background services, stopped in reverse order on shutdown
+    services = []
+    search_reloader = None
+    if settings.search.enabled:
+        from api.crud.coin_search_crud import coin_search_index, load_coin_search_index, reload_coin_search_index
+
+        # holders live on every shard, the catalog on the primary which comes first
+        shard_session_factories = [helper.async_session_factory for helper in shard_router.helpers or [shard_router.primary]]
+        coin_search_index.top_k = settings.search.top_k
+        startup.append(load_coin_search_index(shard_session_factories))
+    if settings.alerts.enabled:
+        from api.services.price_alerts import price_alert_engine
+
+        startup.append(price_alert_engine.start())
+        services.append(price_alert_engine)
+    if settings.leaderboard.enabled:
+        from api.services.leaderboard import leaderboard_maintainer
+
+        startup.append(leaderboard_maintainer.start())
+        services.append(leaderboard_maintainer)
+    await asyncio.gather(*startup)
+
+    if settings.search.enabled:
+        search_reloader = asyncio.create_task(
+            reload_coin_search_index(shard_session_factories, settings.search.reload_interval_s)
+        )
+    if settings.statistics.sharded_user_ids:
+        from api.services.statistics_shards import statistics_shards_merger
+
+        statistics_shards_merger.start()
+        services.append(statistics_shards_merger)
+    if settings.purge.enabled:
+        from api.services.purge_worker import purge_worker
+
+        purge_worker.start()
+        services.append(purge_worker)
+    if settings.snapshots.enabled:
+        portfolio_snapshotter.start()
     yield
-    # shutdown
-    await db_helper.dispose()
+    # shutdown: runs after uvicorn has drained in-flight requests
+    if search_reloader is not None:
+        search_reloader.cancel()
+    for service in reversed(services):
+        await service.stop()
+    await transactions_coalescer.close()
+    await portfolio_snapshotter.stop()
+    portfolio_analytics.shutdown()
+    portfolio_simulator.shutdown()
+    await shard_router.dispose()
+    await tracer.stop()
+
+
+def create_app() -> FastAPI:
+    """
+    Build the application.
+
+    Routers (and with them the CRUD and schema modules) are imported here rather than at module level,
+    so importing `api.main` stays cheap; settings and the engine are created in the lifespan. The price
+    alerts and admin routers are only imported and mounted when alerts are enabled and an admin token is set.
+    """
+    from api.views.users_views import router as users_router
+    from api.views.coins_views import router as coins_router
+    from api.views.transactions_views import router as transactions_router
+    from api.views.portfolio_views import router as portfolio_router
+    from api.views.export_views import router as export_router
+    from api.middlewares.rate_limit import RateLimitMiddleware
+    from api.middlewares.concurrency_limit import ConcurrencyLimitMiddleware
+    from api.middlewares.tracing import TracingMiddleware
+
+    settings = get_settings()
+    app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
+    # the last added middleware runs first: rate limited requests never take a concurrency slot
+    app.add_middleware(ConcurrencyLimitMiddleware)
+    app.add_middleware(RateLimitMiddleware)
+    app.add_middleware(TracingMiddleware)
+    app.include_router(users_router, prefix="/users", tags=["Users"])
+    app.include_router(coins_router, prefix="/coins", tags=["Coins"])
+    app.include_router(transactions_router, prefix="/transactions", tags=["Transactions"])
+    app.include_router(portfolio_router, prefix="/portfolio", tags=["Portfolio"])
+    app.include_router(export_router, prefix="/export", tags=["Export"])
+    if settings.alerts.enabled:
+        from api.views.price_alerts_views import router as price_alerts_router
+
+        app.include_router(price_alerts_router, prefix="/alerts", tags=["Price alerts"])
+    if settings.slow_queries.admin_token:
+        from api.views.admin_views import router as admin_router
+
+        app.include_router(admin_router, prefix="/admin", tags=["Admin"])
+    return app
+
+
+def __getattr__(name: str):
+    # `api.main:main_app` keeps working for existing deployments, the app is built on first access
+    if name == "main_app":
+        app = create_app()
+        globals()["main_app"] = app
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def run() -> None:
+    """
+    Start the server.
+
+    With `reload` enabled a single development process is started. Otherwise uvicorn supervises
+    `settings.run.workers` processes; on SIGTERM each worker stops accepting connections, waits up to
+    `timeout_graceful_shutdown` seconds for in-flight requests and then runs the lifespan shutdown.
+    """
+    import uvicorn
+
+    settings = get_settings()
 
+    if settings.run.reload:
+        uvicorn.run(
+            app="api.main:create_app",
+            factory=True,
+            host=settings.run.host,
+            port=settings.run.port,
+            reload=True,
+        )
+        return
 
-main_app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
-main_app.include_router(users_router, prefix="/users", tags=["Users"])
-main_app.include_router(coins_router, prefix="/coins", tags=["Coins"])
+    uvicorn.run(
+        app="api.main:create_app",
+        factory=True,
+        host=settings.run.host,
+        port=settings.run.port,
+        workers=settings.run.workers,
+        timeout_graceful_shutdown=settings.run.timeout_graceful_shutdown,
+        timeout_keep_alive=settings.run.timeout_keep_alive,
+    )
 
 
 if __name__ == "__main__":
-    uvicorn.run(app="main:main_app", host=settings.run.host, port=settings.run.port, reload=settings.run.reload)
+    run()
@@ -0,0 +1,117 @@
+"""
+Adaptive concurrency limit (AIMD) with load shedding.
+
+Requests beyond the current limit are rejected at once with 503 instead of queueing for a pool
+connection, so the latency of the admitted requests stays bounded under overload.
+"""
+
+import math
+import time
+from typing import Callable
+
+from loguru import logger
+from fastapi.responses import ORJSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from api.config import ConcurrencyConfig, get_settings
+from api.database.pool_wait import pool_wait_monitor
+
+WRITE_METHODS = frozenset({"POST", "PUT", "PATCH", "DELETE"})
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    Additive increase, multiplicative decrease of the number of requests in flight.
+
+    Every request that finishes under the latency and pool wait targets grows the limit by 1/limit
+    (one slot per limit's worth of requests); one over a target shrinks it by `backoff`, at most once per
+    `target_latency_ms` so a single burst is not punished repeatedly. Reads may only use the slots left
+    after `write_share` of the limit, so writes still get in when reads saturate the limit.
+    """
+
+    def __init__(self, config: ConcurrencyConfig, pool_wait: Callable[[], float], clock: Callable[[], float] = time.monotonic):
+        self.config = config
+        self.pool_wait = pool_wait
+        self.clock = clock
+        self.limit = float(config.initial_limit)
+        self.in_flight = 0
+        self._last_decrease = -math.inf
+
+    def capacity(self, is_write: bool) -> int:
+        limit = int(self.limit)
+        if is_write:
+            return limit
+        return max(limit - math.ceil(limit * self.config.write_share), 1)
+
+    def try_acquire(self, is_write: bool) -> bool:
+        if self.in_flight >= self.capacity(is_write):
+            return False
+        self.in_flight += 1
+        return True
+
+    def release(self) -> None:
+        self.in_flight -= 1
+
+    def record(self, latency_s: float) -> None:
+        """Adjust the limit with the latency of a finished request and the current pool wait."""
+        overloaded = (
+            latency_s * 1000 > self.config.target_latency_ms
+            or self.pool_wait() * 1000 > self.config.target_pool_wait_ms
+        )
+
+        if not overloaded:
+            self.limit = min(self.limit + 1 / self.limit, self.config.max_limit)
+            return
+
+        now = self.clock()
+        if now - self._last_decrease >= self.config.target_latency_ms / 1000:
+            self.limit = max(self.limit * self.config.backoff, self.config.min_limit)
+            self._last_decrease = now
+            logger.info(f"Concurrency limit lowered to {int(self.limit)}.")
+
+
+class ConcurrencyLimitMiddleware:
+    """Admit requests through the adaptive limiter; the rest get 503 with `Retry-After`."""
+
+    def __init__(self, app: ASGIApp, limiter: AdaptiveConcurrencyLimiter | None = None):
+        """Without a limiter one is built from the settings on the first request."""
+        self.app = app
+        self.limiter = limiter
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        if self.limiter is None:
+            self.limiter = AdaptiveConcurrencyLimiter(get_settings().concurrency, lambda: pool_wait_monitor.average_s)
+        config = self.limiter.config
+        if not config.enabled or scope["path"] in config.exempt_paths:
+            await self.app(scope, receive, send)
+            return
+
+        if not self.limiter.try_acquire(scope["method"] in WRITE_METHODS):
+            logger.warning(f"Shed {scope['method']} {scope['path']}: {self.limiter.in_flight} requests in flight.")
+            response = ORJSONResponse(
+                status_code=503,
+                content={"detail": "Server is overloaded, retry later."},
+                headers={"Retry-After": "1"},
+            )
+            await response(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        latency_recorded = False
+
+        async def send_and_measure(message: Message) -> None:
+            # latency is measured to the start of the response, a slow client downloading a long body is not load
+            nonlocal latency_recorded
+            if message["type"] == "http.response.start" and not latency_recorded:
+                latency_recorded = True
+                self.limiter.record(time.perf_counter() - started)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_and_measure)
+        finally:
+            self.limiter.release()
@@ -0,0 +1,177 @@
+"""
+Per-user token-bucket rate limiting.
+
+The middleware runs before routing, so a rejected request never reaches a dependency and never takes a
+connection from the database pool.
+"""
+
+import math
+import time
+import importlib
+from urllib.parse import parse_qs
+from collections import OrderedDict
+from typing import Callable, Protocol
+
+import orjson
+from loguru import logger
+from starlette.routing import Match
+from fastapi.responses import ORJSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from api.config import RateLimitConfig, get_settings
+
+MAX_INSPECTED_BODY = 64 * 1024
+
+
+class RateLimitBackend(Protocol):
+    """
+    Storage of the token buckets.
+
+    A shared backend for several nodes has to take a token atomically, e.g. with a Redis Lua script.
+    """
+
+    async def acquire(self, key: str, rate: float, burst: int) -> float:
+        """Take one token from the bucket `key`; return 0 on success or the seconds until a token is available."""
+        ...
+
+
+class InMemoryBackend:
+    """Token buckets of a single process; the least recently used buckets are dropped beyond `max_keys`."""
+
+    def __init__(self, max_keys: int = 100_000, clock: Callable[[], float] = time.monotonic):
+        self.max_keys = max_keys
+        self.clock = clock
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+
+    async def acquire(self, key: str, rate: float, burst: int) -> float:
+        now = self.clock()
+        tokens, updated_at = self._buckets.get(key, (burst, now))
+        tokens = min(burst, tokens + (now - updated_at) * rate)
+
+        retry_after = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            retry_after = (1 - tokens) / rate
+
+        self._buckets[key] = (tokens, now)
+        self._buckets.move_to_end(key)
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+
+        return retry_after
+
+
+def create_backend(config: RateLimitConfig) -> RateLimitBackend:
+    """Build the backend named in the settings."""
+
+    if config.backend == "memory":
+        return InMemoryBackend(max_keys=config.max_keys)
+
+    module_name, _, class_name = config.backend.partition(":")
+    return getattr(importlib.import_module(module_name), class_name)()
+
+
+class RateLimitMiddleware:
+    """
+    Reject requests over their user's limits with 429 and `Retry-After`.
+
+    The user is taken from the `username` path or query parameter, then from the `username` field of a
+    small JSON body, and falls back to the client address.
+    """
+
+    def __init__(self, app: ASGIApp, config: RateLimitConfig | None = None, backend: RateLimitBackend | None = None):
+        """Without arguments the limits and the backend are taken from the settings on the first request."""
+        self.app = app
+        self.config = config
+        self.backend = backend
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        if self.config is None:
+            self.config = get_settings().rate_limit
+        if not self.config.enabled:
+            await self.app(scope, receive, send)
+            return
+        if self.backend is None:
+            self.backend = create_backend(self.config)
+
+        route_path, path_params = self._match_route(scope)
+        username = path_params.get("username") or self._query_username(scope)
+        if username is None:
+            username, receive = await self._body_username(scope, receive)
+        # normalized like the shard router does, so "Alice" and " alice" share alice's bucket
+        username = username.strip().lower() if username else None
+        user_key = f"user:{username}" if username else f"client:{scope['client'][0] if scope.get('client') else '-'}"
+
+        retry_after = 0.0
+        route_rule = self.config.routes.get(f"{scope['method']} {route_path}")
+        if route_rule is not None:
+            retry_after = await self.backend.acquire(
+                f"{user_key}:{scope['method']} {route_path}", route_rule.rate, route_rule.burst
+            )
+        if not retry_after:
+            retry_after = await self.backend.acquire(user_key, self.config.user_rate, self.config.user_burst)
+
+        if retry_after:
+            logger.warning(f"Rate limit exceeded by {user_key} on {scope['method']} {scope['path']}.")
+            response = ORJSONResponse(
+                status_code=429,
+                content={"detail": "Too many requests."},
+                headers={"Retry-After": str(math.ceil(retry_after))},
+            )
+            await response(scope, receive, send)
+            return
+
+        await self.app(scope, receive, send)
+
+    @staticmethod
+    def _match_route(scope: Scope) -> tuple[str, dict]:
+        """Route template and path parameters of the request, before the router resolves them itself."""
+        partial = None
+        for route in getattr(scope.get("app"), "routes", ()):
+            match, child_scope = route.matches(scope)
+            if match == Match.FULL:
+                return route.path, child_scope.get("path_params", {})
+            if match == Match.PARTIAL and partial is None:
+                partial = (route.path, child_scope.get("path_params", {}))
+        return partial or (scope["path"], {})
+
+    @staticmethod
+    def _query_username(scope: Scope) -> str | None:
+        values = parse_qs(scope.get("query_string", b"").decode()).get("username")
+        return values[0] if values else None
+
+    @staticmethod
+    async def _body_username(scope: Scope, receive: Receive) -> tuple[str | None, Receive]:
+        """Read a small JSON body for its `username` and hand back a `receive` that replays it."""
+        headers = dict(scope["headers"])
+        content_length = headers.get(b"content-length")
+        if (
+            b"json" not in headers.get(b"content-type", b"")
+            or content_length is None
+            or not content_length.isdigit()
+            or int(content_length) > MAX_INSPECTED_BODY
+        ):
+            return None, receive
+
+        messages: list[Message] = []
+        while True:
+            message = await receive()
+            messages.append(message)
+            if message["type"] != "http.request" or not message.get("more_body", False):
+                break
+
+        try:
+            payload = orjson.loads(b"".join(message.get("body", b"") for message in messages))
+            username = payload.get("username") if isinstance(payload, dict) else None
+        except orjson.JSONDecodeError:
+            username = None
+
+        async def replay() -> Message:
+            return messages.pop(0) if messages else await receive()
+
+        return (str(username) if username else None), replay
@@ -0,0 +1,53 @@
+"""
+Root span of every sampled request.
+"""
+
+from urllib.parse import parse_qs
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from api.services.tracing import tracer
+
+
+class TracingMiddleware:
+    """
+    Open the root span of a request, named after its route once the router resolved it.
+
+    Added last, so rate limiting, load shedding and the view all run inside the span.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not tracer.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        traceparent = next((value.decode("latin-1") for key, value in scope["headers"] if key == b"traceparent"), None)
+        with tracer.root_span(
+            f"{scope['method']} {scope['path']}",
+            {"http.method": scope["method"], "url.path": scope["path"]},
+            traceparent,
+        ) as span:
+            if span is None:
+                await self.app(scope, receive, send)
+                return
+
+            async def send_with_status(message: Message) -> None:
+                if message["type"] == "http.response.start":
+                    span.set_attribute("http.status_code", message["status"])
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_with_status)
+            finally:
+                route = scope.get("route")
+                if route is not None:
+                    span.name = f"{scope['method']} {route.path}"
+                    span.set_attribute("http.route", route.path)
+                username = scope.get("path_params", {}).get("username") or next(
+                    iter(parse_qs(scope["query_string"].decode("latin-1")).get("username", [])), None
+                )
+                if username:
+                    span.set_attribute("enduser.id", username)
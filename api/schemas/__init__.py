@@ -1,2 +1,5 @@
 from .coins_crud_schemas import *
 from .users_crud_schemas import *
+from .portfolio_schemas import *
+from .price_alerts_schemas import *
+from .admin_schemas import *
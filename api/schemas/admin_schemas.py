@@ -0,0 +1,27 @@
+"""
+Schemas for the operational endpoints under /admin.
+"""
+
+__all__ = [
+    "SlowQuerySchema",
+    "SlowQueriesResponseSchema",
+]
+
+from typing import Sequence
+from datetime import datetime
+
+from pydantic import BaseModel
+
+
+class SlowQuerySchema(BaseModel):
+    statement: str
+    parameters: str
+    duration_ms: float
+    caller: str | None
+    recorded_at: datetime
+    plan: str | None
+
+
+class SlowQueriesResponseSchema(BaseModel):
+    threshold_ms: float
+    queries: list[SlowQuerySchema] | Sequence[SlowQuerySchema]
@@ -7,9 +7,18 @@ __all__ = [
     "OperationActionSchema",
     "CoinInfoResponseSchema",
     "UserCoinsResponseSchema",
+    "CoinStatisticsResponseSchema",
+    "BulkCoinActionSchema",
+    "BulkCoinResultSchema",
+    "BulkCoinsResponseSchema",
+    "CoinSearchResultSchema",
+    "CoinSearchResponseSchema",
+    "CoinLeaderboardEntrySchema",
+    "CoinLeaderboardResponseSchema",
 ]
 
-from typing import Sequence
+from typing import Sequence, Literal
+from datetime import datetime
 
 from pydantic import BaseModel, field_validator, model_validator, Field
 
@@ -111,5 +120,70 @@ class CoinInfoResponseSchema(
 ): ...
 
 
+class BulkCoinActionSchema(
+    UsernameFieldValidator,
+):
+    coins: list[CoinInfoFieldsValidator] = Field(min_length=1, max_length=1000)
+
+    @field_validator("coins", mode="after")
+    def unique_coins_validator(cls, value: list[CoinInfoFieldsValidator]) -> list[CoinInfoFieldsValidator]:
+        """Drop repeated coins, keeping the first occurrence."""
+        unique_coins = {}
+        for coin in value:
+            unique_coins.setdefault((coin.coin_name, coin.coin_symbol), coin)
+        return list(unique_coins.values())
+
+
+class BulkCoinResultSchema(
+    CoinInfoFieldsValidator,
+):
+    status: Literal["added", "exists", "deleted", "not_found"]
+
+
+class CoinSearchResultSchema(
+    CoinInfoFieldsValidator,
+):
+    holders: int
+
+
 class UserCoinsResponseSchema(BaseModel):
     coins: list[CoinInfoResponseSchema] | Sequence[CoinInfoResponseSchema]
+
+
+class BulkCoinsResponseSchema(BaseModel):
+    coins: list[BulkCoinResultSchema] | Sequence[BulkCoinResultSchema]
+
+
+class CoinSearchResponseSchema(BaseModel):
+    coins: list[CoinSearchResultSchema] | Sequence[CoinSearchResultSchema]
+
+
+class CoinLeaderboardEntrySchema(BaseModel):
+    username: str
+    holdings: float
+
+
+class CoinLeaderboardResponseSchema(BaseModel):
+    coin_name: str
+    coin_symbol: str
+    holders: int
+    top: list[CoinLeaderboardEntrySchema] | Sequence[CoinLeaderboardEntrySchema]
+
+
+class CoinStatisticsFields(BaseModel):
+    buy_total: float
+    invested_total: float
+    invested_avg: float
+    sell_total: float
+    realized_total: float
+    realized_avg: float
+    holdings: float
+    fee_total: float
+    transactions_count: int
+    updated_at: datetime
+
+
+class CoinStatisticsResponseSchema(
+    CoinInfoFieldsValidator,
+    CoinStatisticsFields,
+): ...
@@ -0,0 +1,57 @@
+"""
+Schemas for portfolio history charts built from the daily snapshots.
+"""
+
+__all__ = [
+    "PortfolioChartPointSchema",
+    "PortfolioChartResponseSchema",
+    "PortfolioAnalyticsResponseSchema",
+    "PortfolioSimulationPointSchema",
+    "PortfolioSimulationResponseSchema",
+]
+
+from typing import Sequence
+from datetime import date
+
+from pydantic import BaseModel
+
+
+class PortfolioChartPointSchema(BaseModel):
+    day: date
+    value: float
+    invested_total: float
+    realized_total: float
+
+
+class PortfolioChartResponseSchema(BaseModel):
+    username: str
+    points: list[PortfolioChartPointSchema] | Sequence[PortfolioChartPointSchema]
+
+
+class PortfolioAnalyticsResponseSchema(BaseModel):
+    username: str
+    start: date
+    end: date
+    start_value: float
+    end_value: float
+    total_return: float
+    annualized_volatility: float
+    max_drawdown: float
+    sharpe_ratio: float
+
+
+class PortfolioSimulationPointSchema(BaseModel):
+    day: int
+    p5: float
+    p25: float
+    p50: float
+    p75: float
+    p95: float
+
+
+class PortfolioSimulationResponseSchema(BaseModel):
+    username: str
+    days: int
+    paths: int
+    start_value: float
+    points: list[PortfolioSimulationPointSchema]
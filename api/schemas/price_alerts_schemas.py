@@ -0,0 +1,41 @@
+"""
+Schemas for price alerts on the coins of a user's portfolio.
+"""
+
+__all__ = [
+    "PriceAlertActionSchema",
+    "PriceAlertResponseSchema",
+    "UserPriceAlertsResponseSchema",
+]
+
+from typing import Sequence, Literal
+from datetime import datetime
+
+from pydantic import BaseModel, Field
+
+from api.schemas.coins_crud_schemas import UsernameFieldValidator, CoinInfoFieldsValidator
+
+
+class PriceAlertFields(BaseModel):
+    direction: Literal["above", "below"]
+    threshold: float = Field(gt=0)
+
+
+class PriceAlertActionSchema(
+    UsernameFieldValidator,
+    CoinInfoFieldsValidator,
+    PriceAlertFields,
+): ...
+
+
+class PriceAlertResponseSchema(
+    CoinInfoFieldsValidator,
+    PriceAlertFields,
+):
+    id: int
+    created_at: datetime
+    triggered_at: datetime | None
+
+
+class UserPriceAlertsResponseSchema(BaseModel):
+    alerts: list[PriceAlertResponseSchema] | Sequence[PriceAlertResponseSchema]
@@ -0,0 +1,124 @@
+"""
+Seeding, refilling and persisting the per-coin top holders leaderboards.
+"""
+
+import time
+import asyncio
+import contextlib
+from typing import Callable
+
+from loguru import logger
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api.config import get_settings
+from api.database.shard_router import shard_router
+from api.database.leader_lock import LeaderLock
+from api.crud.leaderboard_crud import coin_leaderboards, load_leaderboard_rows, persist_leaderboards
+
+
+class LeaderboardMaintainer:
+    """
+    Seed the leaderboards with one query per shard on start, then periodically refill the stale coins,
+    persist the changed ones on the primary and reseed everything to pick up other worker processes' trades.
+    Only the worker process holding the leader lock persists, so workers do not overwrite each other's rows.
+    """
+
+    def __init__(
+        self,
+        session_factories: list[Callable[[], AsyncSession]] | None = None,
+        persist_interval_s: float | None = None,
+        reseed_interval_s: float | None = None,
+    ):
+        """Without arguments the shards come from the shard router and the intervals from the settings on start."""
+        self.session_factories = session_factories
+        self.persist_interval_s = persist_interval_s
+        self.reseed_interval_s = reseed_interval_s
+        self._last_seed = 0.0
+        self.leader_lock = LeaderLock("leaderboards-persist")
+        self._task: asyncio.Task | None = None
+
+    def configure_from_settings(self) -> None:
+        """Take the shards from the shard router and the list sizes and intervals from the application settings."""
+        leaderboard_settings = get_settings().leaderboard
+        if self.session_factories is None:
+            self.session_factories = [
+                helper.async_session_factory for helper in shard_router.helpers or [shard_router.primary]
+            ]
+        if self.persist_interval_s is None:
+            self.persist_interval_s = leaderboard_settings.persist_interval_s
+        if self.reseed_interval_s is None:
+            self.reseed_interval_s = leaderboard_settings.reseed_interval_s
+        coin_leaderboards.configure(leaderboard_settings.top_k, leaderboard_settings.tracked)
+
+    async def _load(self, catalog_ids: list[int] | None = None) -> None:
+        shards = []
+        for session_factory in self.session_factories:
+            async with session_factory() as session:
+                shards.append(await load_leaderboard_rows(session, coin_leaderboards.tracked, catalog_ids))
+        coin_leaderboards.seed(shards, catalog_ids)
+
+    async def seed(self) -> None:
+        """Rebuild the leaderboards of every coin."""
+        if self.session_factories is None:
+            self.configure_from_settings()
+
+        await self._load()
+        self._last_seed = time.monotonic()
+        logger.info(f"Leaderboards seeded for {len(coin_leaderboards.coins)} coins.")
+
+    async def run_once(self) -> int:
+        """Refill the stale coins (or reseed when due) and persist the changed ones; return the coins persisted."""
+        if self.session_factories is None:
+            self.configure_from_settings()
+
+        if time.monotonic() - self._last_seed >= self.reseed_interval_s:
+            await self.seed()
+        elif coin_leaderboards.stale:
+            stale = sorted(coin_leaderboards.stale)
+            await self._load(stale)
+            logger.info(f"Leaderboards refilled for {len(stale)} coins.")
+
+        # the followers' changes reach the leader with its next reseed
+        dirty = coin_leaderboards.pop_dirty()
+        async with self.session_factories[0]() as session:
+            if not await self.leader_lock.acquire(session.bind):
+                return 0
+            return await persist_leaderboards(session, dirty)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.persist_interval_s)
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error(f"Error while maintaining the leaderboards: {e}")
+
+    async def start(self) -> None:
+        """Seed the leaderboards and start the background loop."""
+        if self._task is not None:
+            return
+
+        self.configure_from_settings()
+        await self.seed()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Cancel the background loop, persist what changed since its last run and let another worker process take over."""
+        if self._task is None:
+            return
+
+        self._task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self._task
+        self._task = None
+
+        try:
+            if self.leader_lock.held:
+                async with self.session_factories[0]() as session:
+                    await persist_leaderboards(session, coin_leaderboards.pop_dirty())
+        except Exception as e:
+            logger.error(f"Error while persisting the leaderboards: {e}")
+        await self.leader_lock.release()
+
+
+leaderboard_maintainer = LeaderboardMaintainer()
@@ -0,0 +1,153 @@
+"""
+Portfolio risk/return analytics computed with NumPy in a process pool.
+
+Prices come from the user's own trades: the price of a coin on a day is the average price of its
+latest transaction up to that day. Returns are time-weighted, so money added to or taken out of a
+position is not counted as performance.
+"""
+
+import asyncio
+from datetime import date
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api.config import get_settings
+from api.crud.portfolio_crud import get_analytics_version, get_transactions_until
+from api.schemas.portfolio_schemas import PortfolioAnalyticsResponseSchema
+
+PERIODS_PER_YEAR = 365
+
+
+def compute_portfolio_metrics(
+    first_day: int,
+    start_day: int,
+    end_day: int,
+    trade_days: np.ndarray,
+    trade_coins: np.ndarray,
+    trade_units: np.ndarray,
+    trade_prices: np.ndarray,
+    risk_free_rate: float = 0.0,
+) -> dict[str, float]:
+    """
+    Metrics of a portfolio between two day ordinals.
+
+    Trades are given as parallel arrays in execution order: day ordinal, coin column, signed units
+    (buys positive) and price per unit (0 when unknown).
+    """
+
+    days_count = end_day - first_day + 1
+    coins_count = int(trade_coins.max()) + 1 if len(trade_coins) else 0
+    day_index = trade_days - first_day
+
+    # holdings[day, coin] at the end of every day
+    holdings = np.zeros((days_count, coins_count))
+    np.add.at(holdings, (day_index, trade_coins), trade_units)
+    holdings = np.cumsum(holdings, axis=0)
+
+    # prices[day, coin]: the last known trade price, carried forward over days without trades
+    priced = trade_prices > 0
+    last_trade = np.zeros((days_count, coins_count), dtype=np.int64) - 1
+    np.maximum.at(last_trade, (day_index[priced], trade_coins[priced]), np.flatnonzero(priced))
+    last_trade = np.maximum.accumulate(last_trade, axis=0)
+    prices = np.where(last_trade >= 0, trade_prices[np.maximum(last_trade, 0)], 0.0)
+
+    # money put into (positive) or taken out of (negative) the portfolio every day
+    cash_flows = np.zeros(days_count)
+    np.add.at(cash_flows, day_index, trade_units * trade_prices)
+
+    values = (holdings * prices).sum(axis=1)
+
+    window = slice(start_day - first_day, days_count)
+    values, cash_flows = values[window], cash_flows[window]
+
+    previous_values = values[:-1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        returns = np.where(previous_values > 0, (values[1:] - cash_flows[1:]) / previous_values - 1, 0.0)
+
+    growth = np.cumprod(1 + returns)
+    drawdowns = 1 - growth / np.maximum.accumulate(growth) if len(growth) else np.zeros(1)
+    volatility = returns.std(ddof=1) if len(returns) > 1 else 0.0
+    excess_return = returns.mean() - risk_free_rate / PERIODS_PER_YEAR if len(returns) else 0.0
+
+    return {
+        "total_return": float(growth[-1] - 1) if len(growth) else 0.0,
+        "annualized_volatility": float(volatility * np.sqrt(PERIODS_PER_YEAR)),
+        "max_drawdown": float(drawdowns.max()),
+        "sharpe_ratio": float(excess_return / volatility * np.sqrt(PERIODS_PER_YEAR)) if volatility > 0 else 0.0,
+        "start_value": float(values[0]) if len(values) else 0.0,
+        "end_value": float(values[-1]) if len(values) else 0.0,
+    }
+
+
+class PortfolioAnalytics:
+    """Compute analytics off the event loop and cache them per (user, range, last transaction id)."""
+
+    def __init__(self, max_workers: int | None = None, cache_size: int | None = None):
+        """Without arguments the pool size and cache size are read from the settings on first use."""
+        self.max_workers = max_workers
+        self.cache_size = cache_size
+        self._executor: ProcessPoolExecutor | None = None
+        self._cache: OrderedDict[tuple, PortfolioAnalyticsResponseSchema] = OrderedDict()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            if self.max_workers is None:
+                self.max_workers = get_settings().analytics.max_workers
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._executor
+
+    def _remember(self, key: tuple, result: PortfolioAnalyticsResponseSchema) -> None:
+        if self.cache_size is None:
+            self.cache_size = get_settings().analytics.cache_size
+
+        self._cache[key] = result
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    async def get(self, session: AsyncSession, username: str, start: date, end: date) -> PortfolioAnalyticsResponseSchema:
+        """Analytics of a user's portfolio between `start` and `end`."""
+
+        user_id, last_transaction_id, last_deleted_at = await get_analytics_version(session, username)
+
+        key = (user_id, start, end, last_transaction_id, last_deleted_at)
+        if key in self._cache:
+            await session.commit()
+            self._cache.move_to_end(key)
+            return self._cache[key]
+
+        transactions = await get_transactions_until(session, user_id, end)
+        # end the read transaction so the connection goes back to the pool during the computation
+        await session.commit()
+        coin_columns = {coin_id: column for column, coin_id in enumerate(dict.fromkeys(t.coin_id for t in transactions))}
+        trade_days = np.array([t.date_added.date().toordinal() for t in transactions], dtype=np.int64)
+
+        first_day = min(int(trade_days.min()), start.toordinal()) if len(trade_days) else start.toordinal()
+        metrics = await asyncio.get_running_loop().run_in_executor(
+            self._get_executor(),
+            compute_portfolio_metrics,
+            first_day,
+            start.toordinal(),
+            end.toordinal(),
+            trade_days,
+            np.array([coin_columns[t.coin_id] for t in transactions], dtype=np.int64),
+            np.array([t.buy - t.sell for t in transactions], dtype=np.float64),
+            np.array([t.average_price for t in transactions], dtype=np.float64),
+            get_settings().analytics.risk_free_rate,
+        )
+
+        result = PortfolioAnalyticsResponseSchema(username=username, start=start, end=end, **metrics)
+        self._remember(key, result)
+        return result
+
+    def shutdown(self) -> None:
+        """Stop the worker processes."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+portfolio_analytics = PortfolioAnalytics()
@@ -0,0 +1,271 @@
+"""
+Monte Carlo projections of a user's current holdings, simulated in a process pool.
+
+Prices follow correlated geometric Brownian motions with one step per day. Path batches run in worker
+processes that write the simulated portfolio values straight into one shared-memory array, so only the
+segment name and a few parameters are pickled. The first bytes of the segment hold a cancel flag the
+workers check between chunks, which lets a cancelled or timed out job stop the batches already running.
+"""
+
+import asyncio
+import hashlib
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+from loguru import logger
+from fastapi import HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api.config import get_settings
+from api.crud.portfolio_crud import get_simulation_positions
+from api.schemas.portfolio_schemas import PortfolioSimulationPointSchema, PortfolioSimulationResponseSchema
+
+PERIODS_PER_YEAR = 365
+PERCENTILES = (5, 25, 50, 75, 95)
+# paths generated at once inside a batch, bounds the worker memory and the cancel latency
+CHUNK_PATHS = 256
+# the cancel flag is padded to keep the values array aligned
+HEADER_BYTES = 8
+
+
+def simulate_batch(
+    shm_name: str,
+    days: int,
+    total_paths: int,
+    first_path: int,
+    batch_paths: int,
+    start_values: np.ndarray,
+    cholesky: np.ndarray,
+    drift: float,
+    volatility: float,
+    seed: int,
+) -> bool:
+    """
+    Simulate the portfolio values of paths [first_path, first_path + batch_paths) into the shared
+    (days + 1, total_paths) array of segment `shm_name`. Return False when the job was cancelled.
+    """
+
+    shm = SharedMemory(name=shm_name)
+    try:
+        cancelled = np.ndarray((1,), dtype=np.int8, buffer=shm.buf)
+        values = np.ndarray((days + 1, total_paths), dtype=np.float64, buffer=shm.buf, offset=HEADER_BYTES)
+
+        rng = np.random.default_rng(seed)
+        dt = 1 / PERIODS_PER_YEAR
+        step_drift = (drift - 0.5 * volatility**2) * dt
+        step_volatility = volatility * np.sqrt(dt)
+
+        completed = True
+        for start in range(first_path, first_path + batch_paths, CHUNK_PATHS):
+            if cancelled[0]:
+                completed = False
+                break
+            count = min(CHUNK_PATHS, first_path + batch_paths - start)
+
+            # shocks[day, path, coin], correlated across coins
+            shocks = rng.standard_normal((days, count, len(start_values))) @ cholesky.T
+            growth = np.exp(np.cumsum(step_drift + step_volatility * shocks, axis=0))
+
+            values[0, start : start + count] = start_values.sum()
+            values[1:, start : start + count] = growth @ start_values
+
+        # the views must be gone before the segment can be closed
+        del cancelled, values
+        return completed
+    finally:
+        shm.close()
+
+
+def correlation_cholesky(coins_count: int, correlation: float) -> np.ndarray:
+    """Cholesky factor of a matrix with the same correlation between every pair of coins."""
+    matrix = np.full((coins_count, coins_count), correlation)
+    np.fill_diagonal(matrix, 1.0)
+    return np.linalg.cholesky(matrix)
+
+
+class PortfolioSimulator:
+    """
+    Run simulations off the event loop, time-boxed, and cache the bands per input hash.
+
+    Identical concurrent requests share one job; a job is cancelled once every request waiting on it is.
+    """
+
+    def __init__(
+        self,
+        max_workers: int | None = None,
+        batch_paths: int | None = None,
+        timeout_s: float | None = None,
+        cache_size: int | None = None,
+    ):
+        """Without arguments the pool size, batch size, timeout and cache size are read from the settings on first use."""
+        self.max_workers = max_workers
+        self.batch_paths = batch_paths
+        self.timeout_s = timeout_s
+        self.cache_size = cache_size
+        self._executor: ProcessPoolExecutor | None = None
+        self._cache: OrderedDict[str, tuple[float, list[PortfolioSimulationPointSchema]]] = OrderedDict()
+        self._jobs: dict[str, asyncio.Task] = {}
+        self._waiters: dict[str, int] = {}
+
+    def configure_from_settings(self) -> None:
+        settings = get_settings().simulation
+        if self.max_workers is None:
+            self.max_workers = settings.max_workers
+        if self.batch_paths is None:
+            self.batch_paths = settings.batch_paths
+        if self.timeout_s is None:
+            self.timeout_s = settings.timeout_s
+        if self.cache_size is None:
+            self.cache_size = settings.cache_size
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self.configure_from_settings()
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._executor
+
+    def _remember(self, key: str, result: tuple[float, list[PortfolioSimulationPointSchema]]) -> None:
+        self._cache[key] = result
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    @staticmethod
+    def input_hash(
+        positions: list[tuple[int, float, float]],
+        days: int,
+        paths: int,
+        volatility: float,
+        correlation: float,
+        drift: float,
+    ) -> str:
+        """Hash of everything that determines a simulation; the seeds derive from it, so equal inputs give equal bands."""
+        payload = repr((positions, days, paths, volatility, correlation, drift)).encode()
+        return hashlib.sha256(payload).hexdigest()
+
+    async def simulate(
+        self,
+        session: AsyncSession,
+        username: str,
+        days: int,
+        paths: int,
+        volatility: float,
+        correlation: float,
+        drift: float = 0.0,
+    ) -> PortfolioSimulationResponseSchema:
+        """Percentile bands of the projected value of a user's current holdings over the next `days` days."""
+
+        self.configure_from_settings()
+        positions = await get_simulation_positions(session, username)
+        # end the read transaction so the connection goes back to the pool during the simulation
+        await session.commit()
+
+        key = self.input_hash(positions, days, paths, volatility, correlation, drift)
+        if key in self._cache:
+            self._cache.move_to_end(key)
+        else:
+            self._remember(key, await self._join(key, positions, days, paths, volatility, correlation, drift))
+
+        start_value, points = self._cache[key]
+        return PortfolioSimulationResponseSchema(
+            username=username, days=days, paths=paths, start_value=start_value, points=points
+        )
+
+    async def _join(self, key: str, *job_args) -> tuple[float, list[PortfolioSimulationPointSchema]]:
+        """Wait for the job of `key`, starting it if needed; cancel it when its last waiter goes away."""
+
+        job = self._jobs.get(key)
+        if job is None:
+            job = self._jobs[key] = asyncio.create_task(self._run(key, *job_args))
+            job.add_done_callback(lambda _: (self._jobs.pop(key, None), self._waiters.pop(key, None)))
+
+        self._waiters[key] = self._waiters.get(key, 0) + 1
+        try:
+            return await asyncio.shield(job)
+        except asyncio.CancelledError:
+            if not job.done():
+                self._waiters[key] -= 1
+                if self._waiters[key] == 0:
+                    job.cancel()
+            raise
+
+    async def _run(
+        self,
+        key: str,
+        positions: list[tuple[int, float, float]],
+        days: int,
+        paths: int,
+        volatility: float,
+        correlation: float,
+        drift: float,
+    ) -> tuple[float, list[PortfolioSimulationPointSchema]]:
+        start_values = np.array([holdings * price for _, holdings, price in positions], dtype=np.float64)
+        if not len(start_values):
+            return 0.0, [
+                PortfolioSimulationPointSchema(day=day, **{f"p{p}": 0.0 for p in PERCENTILES})
+                for day in range(days + 1)
+            ]
+
+        cholesky = correlation_cholesky(len(start_values), correlation)
+        base_seed = int(key[:16], 16)
+        executor = self._get_executor()
+        loop = asyncio.get_running_loop()
+
+        shm = SharedMemory(create=True, size=HEADER_BYTES + (days + 1) * paths * 8)
+        cancelled = np.ndarray((1,), dtype=np.int8, buffer=shm.buf)
+        cancelled[0] = 0
+        try:
+            batches = [
+                loop.run_in_executor(
+                    executor,
+                    simulate_batch,
+                    shm.name,
+                    days,
+                    paths,
+                    first_path,
+                    min(self.batch_paths, paths - first_path),
+                    start_values,
+                    cholesky,
+                    drift,
+                    volatility,
+                    base_seed + batch,
+                )
+                for batch, first_path in enumerate(range(0, paths, self.batch_paths))
+            ]
+            try:
+                await asyncio.wait_for(asyncio.gather(*batches), self.timeout_s)
+            except TimeoutError:
+                logger.warning(f"Portfolio simulation of {paths} paths over {days} days timed out after {self.timeout_s}s.")
+                raise HTTPException(
+                    status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+                    detail=f"The simulation did not finish within {self.timeout_s}s; use fewer paths or days.",
+                )
+            finally:
+                # stops the batches already running; the pending ones were cancelled with the gather
+                cancelled[0] = 1
+
+            # copied out so the segment can be released while the percentiles are computed in a thread
+            values = np.ndarray((days + 1, paths), dtype=np.float64, buffer=shm.buf, offset=HEADER_BYTES).copy()
+        finally:
+            del cancelled
+            shm.close()
+            shm.unlink()
+
+        bands = await asyncio.to_thread(np.percentile, values, PERCENTILES, axis=1, overwrite_input=True)
+        return float(start_values.sum()), [
+            PortfolioSimulationPointSchema(day=day, **{f"p{p}": float(band) for p, band in zip(PERCENTILES, bands[:, day])})
+            for day in range(days + 1)
+        ]
+
+    def shutdown(self) -> None:
+        """Cancel the running jobs and stop the worker processes."""
+        for job in self._jobs.values():
+            job.cancel()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+portfolio_simulator = PortfolioSimulator()
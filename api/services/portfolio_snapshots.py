@@ -0,0 +1,127 @@
+"""
+Keeping the daily portfolio snapshots up to date: on-write marking plus a nightly pass.
+"""
+
+import asyncio
+import contextlib
+from typing import Callable
+
+from loguru import logger
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api.config import get_settings
+from api.database.shard_router import shard_router
+from api.database.leader_lock import LeaderLock
+from api.crud.portfolio_crud import utc_today, refresh_portfolio_snapshots, refresh_daily_portfolio_snapshots
+
+
+class PortfolioSnapshotter:
+    """
+    Refresh today's snapshot of every position written since the last flush, and once the day is over
+    snapshot every position that had activity during it (including writes made by other workers). Every
+    worker process flushes its own marks; only the one holding the leader lock runs the nightly pass.
+
+    Every shard keeps the snapshots of its own users; user and coin ids are only unique within a shard.
+    """
+
+    def __init__(
+        self,
+        session_factories: list[Callable[[], AsyncSession]] | None = None,
+        flush_interval_s: float | None = None,
+    ):
+        """Without arguments the shards come from the shard router and the flush interval from the settings on start."""
+        self.session_factories = session_factories
+        self.flush_interval_s = flush_interval_s
+        self.enabled: bool | None = None
+
+        self.leader_lock = LeaderLock("daily-portfolio-snapshots")
+
+        self._dirty: set[tuple[int, int, int]] = set()
+        self._current_day = utc_today()
+        self._task: asyncio.Task | None = None
+
+    def configure_from_settings(self) -> None:
+        """Take the shards from the shard router, the switch and the flush interval from the application settings."""
+        snapshots_settings = get_settings().snapshots
+        if self.enabled is None:
+            self.enabled = snapshots_settings.enabled
+        if self.session_factories is None:
+            self.session_factories = [
+                helper.async_session_factory for helper in shard_router.helpers or [shard_router.primary]
+            ]
+        if self.flush_interval_s is None:
+            self.flush_interval_s = snapshots_settings.flush_interval_s
+
+    def mark_dirty(self, user_id: int, coin_id: int, shard: int = 0) -> None:
+        """On-write hook: the snapshot of today of the position on `shard` has to be refreshed."""
+        if self.enabled is None:
+            self.enabled = get_settings().snapshots.enabled
+        # nothing would ever flush the marks of a disabled snapshotter
+        if self.enabled:
+            self._dirty.add((shard, user_id, coin_id))
+
+    async def flush(self) -> int:
+        """Refresh the marked positions; after midnight finish yesterday for every active position first."""
+        if self.session_factories is None:
+            self.configure_from_settings()
+
+        today = utc_today()
+        finish_day = today != self._current_day
+        written = 0
+
+        dirty, self._dirty = self._dirty, set()
+        try:
+            for shard, session_factory in enumerate(self.session_factories):
+                async with session_factory() as session:
+                    if finish_day and shard == 0:
+                        # the lock lives on the primary and elects one process for the pass of every shard
+                        finish_day = await self.leader_lock.acquire(session.bind)
+                    if finish_day:
+                        written += await refresh_daily_portfolio_snapshots(session, self._current_day)
+
+                    positions = {(user_id, coin_id) for dirty_shard, user_id, coin_id in dirty if dirty_shard == shard}
+                    if positions:
+                        written += await refresh_portfolio_snapshots(session, today, positions=positions)
+        except Exception:
+            # the snapshots are upserted, refreshing a shard twice on the next flush is harmless
+            self._dirty |= dirty
+            raise
+
+        self._current_day = today
+        return written
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval_s)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Error while refreshing portfolio snapshots: {e}")
+
+    def start(self) -> None:
+        """Start the background loop."""
+        if self._task is not None:
+            return
+
+        self.configure_from_settings()
+        self._current_day = utc_today()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Cancel the loop and write what is still marked."""
+        if self._task is None:
+            return
+
+        self._task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self._task
+        self._task = None
+
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.error(f"Error while refreshing portfolio snapshots on shutdown: {e}")
+        await self.leader_lock.release()
+
+
+portfolio_snapshotter = PortfolioSnapshotter()
@@ -0,0 +1,288 @@
+"""
+Matching price ticks against the active price alerts.
+
+Every coin keeps the thresholds of its "above" and of its "below" alerts in two sorted arrays. A tick
+from the last price to a new one crosses a contiguous range of one of them, found with two binary
+searches, so a tick costs O(log n + k) for k fired alerts however many alerts there are. Alerts fire
+once: they leave the index when they fire and go through a bounded queue to the delivery loop, which
+marks them triggered in the database.
+
+Ticks are the trade prices recorded by this worker process, and every process matches its own ticks;
+the `triggered_at IS NULL` condition of the delivery update keeps an alert from firing twice.
+"""
+
+import asyncio
+import bisect
+import contextlib
+from typing import Callable, Iterable
+from dataclasses import dataclass, field
+
+from loguru import logger
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api.config import get_settings
+from api.database.shard_router import shard_router
+from api.crud.price_alerts_crud import load_active_price_alerts, mark_price_alerts_triggered
+
+
+class ThresholdBook:
+    """Thresholds in ascending order with the alert ids in a parallel array."""
+
+    __slots__ = ("thresholds", "alert_ids")
+
+    def __init__(self, alerts: Iterable[tuple[float, int]] = ()):
+        alerts = sorted(alerts)
+        self.thresholds = [threshold for threshold, _ in alerts]
+        self.alert_ids = [alert_id for _, alert_id in alerts]
+
+    def __len__(self) -> int:
+        return len(self.alert_ids)
+
+    def add(self, threshold: float, alert_id: int) -> None:
+        index = bisect.bisect_right(self.thresholds, threshold)
+        self.thresholds.insert(index, threshold)
+        self.alert_ids.insert(index, alert_id)
+
+    def remove(self, threshold: float, alert_id: int) -> bool:
+        start = bisect.bisect_left(self.thresholds, threshold)
+        end = bisect.bisect_right(self.thresholds, threshold, lo=start)
+        for index in range(start, end):
+            if self.alert_ids[index] == alert_id:
+                del self.thresholds[index], self.alert_ids[index]
+                return True
+        return False
+
+    def pop_range(self, start: int, end: int) -> list[tuple[int, float]]:
+        """Remove and return the (alert_id, threshold) pairs at positions [start, end)."""
+        fired = list(zip(self.alert_ids[start:end], self.thresholds[start:end]))
+        del self.thresholds[start:end], self.alert_ids[start:end]
+        return fired
+
+
+@dataclass
+class CoinAlerts:
+    above: ThresholdBook = field(default_factory=ThresholdBook)
+    below: ThresholdBook = field(default_factory=ThresholdBook)
+
+    def book(self, direction: str) -> ThresholdBook:
+        return self.above if direction == "above" else self.below
+
+
+class PriceAlertIndex:
+    """The alerts of every coin of one shard, keyed by catalog id."""
+
+    def __init__(self):
+        self.coins: dict[int, CoinAlerts] = {}
+
+    def __len__(self) -> int:
+        return sum(len(alerts.above) + len(alerts.below) for alerts in self.coins.values())
+
+    # thresholds read back from the database are Decimal; a float never equals the Decimal of its own
+    # text, so every threshold is kept as a float for remove() to find it again
+    def add(self, alert_id: int, catalog_id: int, direction: str, threshold: float) -> None:
+        self.coins.setdefault(catalog_id, CoinAlerts()).book(direction).add(float(threshold), alert_id)
+
+    def remove(self, alert_id: int, catalog_id: int, direction: str, threshold: float) -> bool:
+        alerts = self.coins.get(catalog_id)
+        return alerts is not None and alerts.book(direction).remove(float(threshold), alert_id)
+
+    def load(self, alerts: Iterable[tuple[int, int, str, float]]) -> None:
+        """Replace the index with the given (id, catalog_id, direction, threshold) alerts, sorting each book once."""
+        grouped: dict[tuple[int, str], list[tuple[float, int]]] = {}
+        for alert_id, catalog_id, direction, threshold in alerts:
+            grouped.setdefault((catalog_id, direction), []).append((float(threshold), alert_id))
+
+        self.coins = {}
+        for (catalog_id, direction), book_alerts in grouped.items():
+            coin_alerts = self.coins.setdefault(catalog_id, CoinAlerts())
+            if direction == "above":
+                coin_alerts.above = ThresholdBook(book_alerts)
+            else:
+                coin_alerts.below = ThresholdBook(book_alerts)
+
+    def match(self, catalog_id: int, last_price: float, price: float) -> tuple[str, list[tuple[int, float]]]:
+        """
+        Remove and return the alerts crossed by a move from `last_price` to `price`: "above" alerts with
+        last_price < threshold <= price on the way up, "below" alerts with price <= threshold < last_price on the way down.
+        """
+        alerts = self.coins.get(catalog_id)
+        if alerts is None or price == last_price:
+            return "above", []
+
+        if price > last_price:
+            book = alerts.above
+            start = bisect.bisect_right(book.thresholds, last_price)
+            end = bisect.bisect_right(book.thresholds, price, lo=start)
+            return "above", book.pop_range(start, end)
+
+        book = alerts.below
+        start = bisect.bisect_left(book.thresholds, price)
+        end = bisect.bisect_left(book.thresholds, last_price, lo=start)
+        return "below", book.pop_range(start, end)
+
+
+@dataclass(slots=True)
+class FiredAlert:
+    shard: int
+    alert_id: int
+    catalog_id: int
+    direction: str
+    threshold: float
+    price: float
+
+
+class PriceAlertEngine:
+    """One alert index per shard, the last price of every coin and the delivery of fired alerts."""
+
+    def __init__(
+        self,
+        session_factories: list[Callable[[], AsyncSession]] | None = None,
+        queue_size: int | None = None,
+        delivery_batch: int | None = None,
+        reload_interval_s: float | None = None,
+    ):
+        """Without arguments the shards come from the shard router and the rest from the settings on start."""
+        self.session_factories = session_factories
+        self.queue_size = queue_size
+        self.delivery_batch = delivery_batch
+        self.reload_interval_s = reload_interval_s
+
+        self.indexes: list[PriceAlertIndex] = [PriceAlertIndex() for _ in session_factories or [None]]
+        self.last_prices: dict[int, float] = {}
+        self.dropped = 0
+        self._queue: asyncio.Queue[FiredAlert] | None = None
+        self._tasks: list[asyncio.Task] = []
+
+    def configure_from_settings(self) -> None:
+        """Take the shards from the shard router and the queue and reload settings from the application settings."""
+        alerts_settings = get_settings().alerts
+        if self.session_factories is None:
+            self.session_factories = [
+                helper.async_session_factory for helper in shard_router.helpers or [shard_router.primary]
+            ]
+            self.indexes = [PriceAlertIndex() for _ in self.session_factories]
+        if self.queue_size is None:
+            self.queue_size = alerts_settings.queue_size
+        if self.delivery_batch is None:
+            self.delivery_batch = alerts_settings.delivery_batch
+        if self.reload_interval_s is None:
+            self.reload_interval_s = alerts_settings.reload_interval_s
+
+    @property
+    def queue(self) -> asyncio.Queue[FiredAlert]:
+        if self._queue is None:
+            if self.queue_size is None:
+                self.configure_from_settings()
+            self._queue = asyncio.Queue(maxsize=self.queue_size)
+        return self._queue
+
+    def __len__(self) -> int:
+        return sum(len(index) for index in self.indexes)
+
+    async def load(self) -> None:
+        """Rebuild the index of every shard from the alerts that have not fired yet."""
+        if self.session_factories is None:
+            self.configure_from_settings()
+
+        for shard, session_factory in enumerate(self.session_factories):
+            async with session_factory() as session:
+                alerts = await load_active_price_alerts(session)
+            index = PriceAlertIndex()
+            index.load(alerts)
+            self.indexes[shard] = index
+
+        logger.info(f"Price alert index loaded with {len(self)} alerts.")
+
+    def add(self, shard: int, alert_id: int, catalog_id: int, direction: str, threshold: float) -> None:
+        self.indexes[shard].add(alert_id, catalog_id, direction, threshold)
+
+    def remove(self, shard: int, alert_id: int, catalog_id: int, direction: str, threshold: float) -> None:
+        self.indexes[shard].remove(alert_id, catalog_id, direction, threshold)
+
+    def tick(self, catalog_id: int, price: float) -> int:
+        """
+        Record a new price of a coin and queue the alerts it crossed; return how many were queued.
+
+        The first price of a coin only sets the baseline. Never blocks: when the queue is full the alert
+        is dropped here and comes back, still untriggered, with the next reload.
+        """
+        last_price = self.last_prices.get(catalog_id)
+        self.last_prices[catalog_id] = price
+        if last_price is None or price <= 0:
+            return 0
+
+        queued = dropped = 0
+        for shard, index in enumerate(self.indexes):
+            direction, fired = index.match(catalog_id, last_price, price)
+            for alert_id, threshold in fired:
+                try:
+                    self.queue.put_nowait(FiredAlert(shard, alert_id, catalog_id, direction, threshold, price))
+                    queued += 1
+                except asyncio.QueueFull:
+                    dropped += 1
+
+        if dropped:
+            self.dropped += dropped
+            logger.warning(f"Price alert queue is full, {dropped} fired alerts of coin {catalog_id} dropped until the next reload.")
+        return queued
+
+    async def deliver_once(self) -> int:
+        """Wait for fired alerts and mark a batch of them triggered; return how many were marked."""
+        first = await self.queue.get()
+        batch = [first]
+        while len(batch) < self.delivery_batch and not self.queue.empty():
+            batch.append(self.queue.get_nowait())
+
+        by_shard: dict[int, list[FiredAlert]] = {}
+        for alert in batch:
+            by_shard.setdefault(alert.shard, []).append(alert)
+
+        delivered = 0
+        for shard, alerts in by_shard.items():
+            async with self.session_factories[shard]() as session:
+                triggered_ids = set(await mark_price_alerts_triggered(session, [alert.alert_id for alert in alerts]))
+            for alert in alerts:
+                if alert.alert_id in triggered_ids:
+                    logger.info(
+                        f"Price alert {alert.alert_id} fired: coin {alert.catalog_id} {alert.direction} {alert.threshold} at {alert.price}."
+                    )
+            delivered += len(triggered_ids)
+        return delivered
+
+    async def _deliver(self) -> None:
+        while True:
+            try:
+                await self.deliver_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error while delivering price alerts: {e}")
+
+    async def _reload(self) -> None:
+        while True:
+            await asyncio.sleep(self.reload_interval_s)
+            try:
+                await self.load()
+            except Exception as e:
+                logger.error(f"Error while reloading price alerts: {e}")
+
+    async def start(self) -> None:
+        """Load the alerts and start the delivery and reload loops."""
+        if self._tasks:
+            return
+
+        self.configure_from_settings()
+        await self.load()
+        self._tasks = [asyncio.create_task(self._deliver()), asyncio.create_task(self._reload())]
+
+    async def stop(self) -> None:
+        """Cancel the background loops; alerts still queued are delivered again after the next start."""
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+        self._tasks = []
+
+
+price_alert_engine = PriceAlertEngine()
@@ -0,0 +1,97 @@
+"""
+Background removal of soft deleted users and coins.
+"""
+
+import asyncio
+import contextlib
+from typing import Callable
+
+from loguru import logger
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api.config import get_settings
+from api.database.shard_router import shard_router
+from api.database.leader_lock import LeaderLock
+from api.crud.purge_crud import purge_deleted
+
+
+class PurgeWorker:
+    """Periodically purge soft deleted rows of every shard in bounded batches."""
+
+    def __init__(
+        self,
+        session_factories: list[Callable[[], AsyncSession]] | None = None,
+        batch_size: int | None = None,
+        pause_s: float | None = None,
+        interval_s: float | None = None,
+    ):
+        """Without arguments the shards come from the shard router and the batch size, pause and interval from the settings on start."""
+        self.session_factories = session_factories
+        self.batch_size = batch_size
+        self.pause_s = pause_s
+        self.interval_s = interval_s
+        # every worker process starts the loop, one of them does the work
+        self.leader_lock = LeaderLock("purge")
+        self._task: asyncio.Task | None = None
+
+    def configure_from_settings(self) -> None:
+        """Take the shards from the shard router and the batch size, pause and interval from the application settings."""
+        purge_settings = get_settings().purge
+        if self.session_factories is None:
+            self.session_factories = [
+                helper.async_session_factory for helper in shard_router.helpers or [shard_router.primary]
+            ]
+        if self.batch_size is None:
+            self.batch_size = purge_settings.batch_size
+        if self.pause_s is None:
+            self.pause_s = purge_settings.pause_s
+        if self.interval_s is None:
+            self.interval_s = purge_settings.interval_s
+
+    async def run_once(self) -> tuple[int, int]:
+        """
+        Purge everything that is soft deleted right now on every shard; return the purged coins and users.
+        Only the worker process holding the leader lock, taken on the primary, purges; the others return (0, 0).
+        """
+        if self.session_factories is None or self.batch_size is None:
+            self.configure_from_settings()
+
+        coins = users = 0
+        for shard, session_factory in enumerate(self.session_factories):
+            async with session_factory() as session:
+                if shard == 0 and not await self.leader_lock.acquire(session.bind):
+                    return 0, 0
+                shard_coins, shard_users = await purge_deleted(session, self.batch_size, self.pause_s)
+            coins += shard_coins
+            users += shard_users
+        return coins, users
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval_s)
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error(f"Error while purging deleted rows: {e}")
+
+    def start(self) -> None:
+        """Start the background loop."""
+        if self._task is not None:
+            return
+
+        self.configure_from_settings()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Cancel the background loop and let another worker process take over."""
+        if self._task is None:
+            return
+
+        self._task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self._task
+        self._task = None
+        await self.leader_lock.release()
+
+
+purge_worker = PurgeWorker()
@@ -0,0 +1,91 @@
+"""
+Background merging of statistics shards once a sharded position has cooled down.
+"""
+
+import asyncio
+import contextlib
+from typing import Callable
+
+from loguru import logger
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api.config import get_settings
+from api.database.shard_router import shard_router
+from api.database.leader_lock import LeaderLock
+from api.crud.statistics_crud import merge_idle_statistics_shards
+
+
+class StatisticsShardsMerger:
+    """Periodically fold the shard rows of idle positions of every database shard back into a single row."""
+
+    def __init__(
+        self,
+        session_factories: list[Callable[[], AsyncSession]] | None = None,
+        idle_s: float | None = None,
+        interval_s: float | None = None,
+    ):
+        """Without arguments the shards come from the shard router and the idle time and interval from the settings on start."""
+        self.session_factories = session_factories
+        self.idle_s = idle_s
+        self.interval_s = interval_s
+        # every worker process starts the loop, one of them does the work
+        self.leader_lock = LeaderLock("statistics-shards-merge")
+        self._task: asyncio.Task | None = None
+
+    def configure_from_settings(self) -> None:
+        """Take the shards from the shard router and the idle time and interval from the application settings."""
+        statistics_settings = get_settings().statistics
+        if self.session_factories is None:
+            self.session_factories = [
+                helper.async_session_factory for helper in shard_router.helpers or [shard_router.primary]
+            ]
+        if self.idle_s is None:
+            self.idle_s = statistics_settings.merge_idle_s
+        if self.interval_s is None:
+            self.interval_s = statistics_settings.merge_interval_s
+
+    async def run_once(self) -> int:
+        """Merge every idle sharded position once; return how many were merged, 0 outside the leader worker process."""
+        if self.session_factories is None or self.idle_s is None:
+            self.configure_from_settings()
+
+        merged = 0
+        for shard, session_factory in enumerate(self.session_factories):
+            async with session_factory() as session:
+                # the leader lock lives on the primary
+                if shard == 0 and not await self.leader_lock.acquire(session.bind):
+                    return 0
+                merged += await merge_idle_statistics_shards(session, self.idle_s)
+        return merged
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval_s)
+            try:
+                merged = await self.run_once()
+                if merged:
+                    logger.info(f"Merged statistics shards of {merged} idle positions.")
+            except Exception as e:
+                logger.error(f"Error while merging statistics shards: {e}")
+
+    def start(self) -> None:
+        """Start the background loop."""
+        if self._task is not None:
+            return
+
+        self.configure_from_settings()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Cancel the background loop and let another worker process take over."""
+        if self._task is None:
+            return
+
+        self._task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self._task
+        self._task = None
+        await self.leader_lock.release()
+
+
+statistics_shards_merger = StatisticsShardsMerger()
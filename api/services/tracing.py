@@ -0,0 +1,383 @@
+"""
+Request tracing: spans for views, CRUD steps, SQL statements and pool checkouts.
+
+Spans follow the OpenTelemetry data model and are exported as OTLP/JSON, so any OpenTelemetry collector
+can receive them. Sampling is decided once per request at the root span: an unsampled request creates no
+span at all and every instrumented function below it costs one context variable lookup.
+"""
+
+import time
+import random
+import asyncio
+import inspect
+import functools
+import importlib
+import contextlib
+from collections import deque
+from contextvars import ContextVar
+from typing import Any, Callable, Iterator, Protocol
+
+import httpx
+import orjson
+from loguru import logger
+
+from api.config import TracingConfig, get_settings
+
+SPAN_KIND_INTERNAL, SPAN_KIND_SERVER, SPAN_KIND_CLIENT = 1, 2, 3
+STATUS_UNSET, STATUS_OK, STATUS_ERROR = 0, 1, 2
+
+
+class Span:
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "kind", "start_ns", "end_ns", "attributes", "status", "message")
+
+    def __init__(self, name: str, trace_id: str, parent_id: str | None = None, kind: int = SPAN_KIND_INTERNAL, start_ns: int | None = None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.kind = kind
+        self.start_ns = start_ns or time.time_ns()
+        self.end_ns: int | None = None
+        self.attributes: dict[str, Any] = {}
+        self.status = STATUS_UNSET
+        self.message = ""
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def record_error(self, error: BaseException) -> None:
+        self.status = STATUS_ERROR
+        self.message = f"{type(error).__name__}: {error}"
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1_000_000
+
+    @property
+    def traceparent(self) -> str:
+        """W3C `traceparent` header value that continues this trace in another service."""
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+
+current_span: ContextVar[Span | None] = ContextVar("current_span", default=None)
+
+
+def parse_traceparent(header: str | None) -> tuple[str, str, bool] | None:
+    """(trace_id, parent span_id, sampled) of a W3C `traceparent` header, None when missing or malformed."""
+    if not header:
+        return None
+    parts = header.strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        int(parts[1], 16), int(parts[2], 16)
+        flags = int(parts[3], 16)
+    except ValueError:
+        return None
+    return parts[1], parts[2], bool(flags & 1)
+
+
+def otlp_value(value: Any) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def to_otlp(spans: list[Span], service_name: str) -> dict:
+    """Encode finished spans as an OTLP/JSON `ExportTraceServiceRequest`."""
+    return {
+        "resourceSpans": [
+            {
+                "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": service_name}}]},
+                "scopeSpans": [
+                    {
+                        "scope": {"name": "api"},
+                        "spans": [
+                            {
+                                "traceId": span.trace_id,
+                                "spanId": span.span_id,
+                                "parentSpanId": span.parent_id or "",
+                                "name": span.name,
+                                "kind": span.kind,
+                                "startTimeUnixNano": str(span.start_ns),
+                                "endTimeUnixNano": str(span.end_ns),
+                                "attributes": [{"key": key, "value": otlp_value(value)} for key, value in span.attributes.items()],
+                                "status": {"code": span.status, "message": span.message},
+                            }
+                            for span in spans
+                        ],
+                    }
+                ],
+            }
+        ]
+    }
+
+
+class SpanExporter(Protocol):
+    """Destination of finished spans; called from the export loop with batches of spans."""
+
+    async def export(self, spans: list[Span]) -> None: ...
+
+    async def shutdown(self) -> None: ...
+
+
+class LoggingSpanExporter:
+    """Log every span with its duration, for development."""
+
+    async def export(self, spans: list[Span]) -> None:
+        for span in spans:
+            logger.debug(f"span {span.name} {span.duration_ms:.2f}ms trace={span.trace_id} {span.attributes}")
+
+    async def shutdown(self) -> None:
+        pass
+
+
+class InMemorySpanExporter:
+    """Keep the exported spans in a list, for tests."""
+
+    def __init__(self):
+        self.spans: list[Span] = []
+
+    async def export(self, spans: list[Span]) -> None:
+        self.spans.extend(spans)
+
+    async def shutdown(self) -> None:
+        pass
+
+
+class FileSpanExporter:
+    """Append one OTLP/JSON document per batch to a file, the format of the collector's file exporter."""
+
+    def __init__(self, path: str, service_name: str):
+        self.path = path
+        self.service_name = service_name
+
+    def _write(self, line: bytes) -> None:
+        with open(self.path, "ab") as file:
+            file.write(line + b"\n")
+
+    async def export(self, spans: list[Span]) -> None:
+        await asyncio.to_thread(self._write, orjson.dumps(to_otlp(spans, self.service_name)))
+
+    async def shutdown(self) -> None:
+        pass
+
+
+class OtlpHttpSpanExporter:
+    """POST OTLP/JSON to a collector's `/v1/traces` endpoint."""
+
+    def __init__(self, endpoint: str, service_name: str, timeout_s: float = 5):
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self.client = httpx.AsyncClient(timeout=timeout_s)
+
+    async def export(self, spans: list[Span]) -> None:
+        response = await self.client.post(
+            self.endpoint,
+            content=orjson.dumps(to_otlp(spans, self.service_name)),
+            headers={"Content-Type": "application/json"},
+        )
+        response.raise_for_status()
+
+    async def shutdown(self) -> None:
+        await self.client.aclose()
+
+
+def create_exporter(config: TracingConfig) -> SpanExporter:
+    """Build the exporter named in the settings."""
+
+    if config.exporter == "log":
+        return LoggingSpanExporter()
+    if config.exporter == "memory":
+        return InMemorySpanExporter()
+    if config.exporter == "file":
+        return FileSpanExporter(config.file_path, config.service_name)
+    if config.exporter == "otlp":
+        return OtlpHttpSpanExporter(config.otlp_endpoint, config.service_name)
+
+    module_name, _, class_name = config.exporter.partition(":")
+    return getattr(importlib.import_module(module_name), class_name)()
+
+
+class Tracer:
+    """Create spans, sample requests and hand finished spans to the exporter in batches."""
+
+    def __init__(
+        self,
+        config: TracingConfig | None = None,
+        exporter: SpanExporter | None = None,
+        sample: Callable[[], float] = random.random,
+    ):
+        """Without arguments the settings and the exporter they name are taken on start."""
+        self.config = config
+        self.exporter = exporter
+        self.sample = sample
+        self.finished: deque[Span] = deque()
+        self.dropped = 0
+        self._task: asyncio.Task | None = None
+
+    def configure_from_settings(self) -> None:
+        """Take the sampling and export settings and build the configured exporter."""
+        if self.config is None:
+            self.config = get_settings().tracing
+        if self.exporter is None:
+            self.exporter = create_exporter(self.config)
+
+    @property
+    def enabled(self) -> bool:
+        return self.config is not None and self.config.enabled
+
+    def start_span(
+        self,
+        name: str,
+        attributes: dict[str, Any] | None = None,
+        parent: Span | None = None,
+        kind: int = SPAN_KIND_INTERNAL,
+        start_ns: int | None = None,
+    ) -> Span | None:
+        """A child span of `parent` (the current span by default); None outside a sampled trace."""
+        parent = parent or current_span.get()
+        if parent is None:
+            return None
+        span = Span(name, parent.trace_id, parent.span_id, kind, start_ns)
+        if attributes:
+            span.attributes.update(attributes)
+        return span
+
+    def end_span(self, span: Span, end_ns: int | None = None) -> None:
+        span.end_ns = end_ns or time.time_ns()
+        if len(self.finished) >= self.config.queue_size:
+            self.dropped += 1
+            return
+        self.finished.append(span)
+
+    @contextlib.contextmanager
+    def span(self, name: str, attributes: dict[str, Any] | None = None, kind: int = SPAN_KIND_INTERNAL) -> Iterator[Span | None]:
+        """Run a block in a child span of the current one; does nothing outside a sampled trace."""
+        span = self.start_span(name, attributes, kind=kind)
+        if span is None:
+            yield None
+            return
+
+        token = current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.record_error(e)
+            raise
+        finally:
+            current_span.reset(token)
+            self.end_span(span)
+
+    @contextlib.contextmanager
+    def root_span(self, name: str, attributes: dict[str, Any] | None = None, traceparent: str | None = None) -> Iterator[Span | None]:
+        """
+        Start a trace, or continue the one of an incoming `traceparent` header and keep its sampling
+        decision; a new trace is sampled with `sample_ratio`.
+        """
+        if not self.enabled:
+            yield None
+            return
+
+        parent = parse_traceparent(traceparent)
+        if parent is not None:
+            trace_id, parent_id, sampled = parent
+        else:
+            trace_id, parent_id, sampled = f"{random.getrandbits(128):032x}", None, self.sample() < self.config.sample_ratio
+        if not sampled:
+            yield None
+            return
+
+        span = Span(name, trace_id, parent_id, SPAN_KIND_SERVER)
+        if attributes:
+            span.attributes.update(attributes)
+        token = current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.record_error(e)
+            raise
+        finally:
+            current_span.reset(token)
+            self.end_span(span)
+
+    async def export_once(self) -> int:
+        """Export the spans finished so far in batches; return how many were exported."""
+        exported = 0
+        while self.finished:
+            batch = [self.finished.popleft() for _ in range(min(self.config.export_batch, len(self.finished)))]
+            try:
+                await self.exporter.export(batch)
+                exported += len(batch)
+            except Exception as e:
+                # the collector may be down, tracing must never hold the spans of a busy process
+                logger.error(f"Error while exporting {len(batch)} spans: {e}")
+        return exported
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.config.export_interval_s)
+            await self.export_once()
+
+    def start(self) -> None:
+        """Start the export loop when tracing is enabled."""
+        self.configure_from_settings()
+        if not self.enabled or self._task is not None:
+            return
+
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Cancel the export loop, export the remaining spans and close the exporter."""
+        if self._task is None:
+            return
+
+        self._task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self._task
+        self._task = None
+        await self.export_once()
+        await self.exporter.shutdown()
+
+
+tracer = Tracer()
+
+
+def traced(name: str | None = None, attributes: dict[str, str] | None = None):
+    """
+    Run an async function in a span of the current trace.
+
+    `attributes` maps span attributes to argument names, optionally followed by attribute names,
+    e.g. {"enduser.id": "transaction_data.username"}.
+    """
+
+    def decorator(function):
+        span_name = name or f"{function.__module__.rsplit('.', 1)[-1]}.{function.__name__}"
+        signature = inspect.signature(function)
+        paths = {attribute: path.split(".") for attribute, path in (attributes or {}).items()}
+
+        @functools.wraps(function)
+        async def wrapper(*args, **kwargs):
+            if current_span.get() is None:
+                return await function(*args, **kwargs)
+
+            span_attributes = {}
+            if paths:
+                arguments = signature.bind_partial(*args, **kwargs).arguments
+                for attribute, (argument, *fields) in paths.items():
+                    value = arguments.get(argument)
+                    for field in fields:
+                        value = getattr(value, field, None)
+                    if value is not None:
+                        span_attributes[attribute] = value
+
+            with tracer.span(span_name, span_attributes):
+                return await function(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,162 @@
+"""
+Group commit of concurrent transactions that target the same user's coin.
+
+Requests for one position that arrive within a short window are written together: one database
+transaction, one `coin_statistics` row lock and one statistics update for the whole batch.
+"""
+
+import asyncio
+from typing import Callable
+from dataclasses import dataclass, field
+
+from loguru import logger
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api.config import get_settings
+from api.database.shard_router import shard_router
+from api.crud.transactions_crud import process_coin_transaction, process_coin_transactions_batch
+from api.services.portfolio_snapshots import portfolio_snapshotter
+from api.schemas.coins_crud_schemas import OperationActionSchema
+
+PositionKey = tuple[str, str, str]
+
+
+@dataclass
+class PendingBatch:
+    items: list[tuple[OperationActionSchema, asyncio.Future]] = field(default_factory=list)
+    full: asyncio.Event = field(default_factory=asyncio.Event)
+
+
+class TransactionsCoalescer:
+    """Collect transactions per (user, coin) within a window and write each batch in one database transaction."""
+
+    def __init__(
+        self,
+        session_factory: Callable[[], AsyncSession] | None = None,
+        window_ms: float | None = None,
+        max_batch: int | None = None,
+    ):
+        """
+        Without arguments the window and batch size are read from the settings on first use, and every
+        batch is written on the shard of its user.
+        """
+        self.session_factory = session_factory
+        self.window_ms = window_ms
+        self.max_batch = max_batch
+
+        self._pending: dict[PositionKey, PendingBatch] = {}
+        self._flushes: set[asyncio.Task] = set()
+
+    def configure_from_settings(self) -> None:
+        """Take the window and batch size from the application settings."""
+        transactions_settings = get_settings().transactions
+        if self.window_ms is None:
+            self.window_ms = transactions_settings.coalesce_window_ms
+        if self.max_batch is None:
+            self.max_batch = transactions_settings.coalesce_max_batch
+
+    @property
+    def enabled(self) -> bool:
+        """Coalescing is switched on by a non-zero window."""
+        if self.window_ms is None or self.max_batch is None:
+            self.configure_from_settings()
+        return self.window_ms > 0
+
+    async def submit(self, transaction_data: OperationActionSchema) -> None:
+        """Queue a transaction and wait until the batch it joined has been committed."""
+
+        if self.window_ms is None or self.max_batch is None:
+            self.configure_from_settings()
+
+        key = (transaction_data.username, transaction_data.coin_name, transaction_data.coin_symbol)
+
+        batch = self._pending.get(key)
+        if batch is None:
+            batch = PendingBatch()
+            self._pending[key] = batch
+            flush = asyncio.create_task(self._flush_after_window(key, batch))
+            self._flushes.add(flush)
+            flush.add_done_callback(self._flushes.discard)
+
+        future = asyncio.get_running_loop().create_future()
+        batch.items.append((transaction_data, future))
+
+        if len(batch.items) >= self.max_batch:
+            self._close_batch(key, batch)
+
+        await future
+
+    def _close_batch(self, key: PositionKey, batch: PendingBatch) -> None:
+        """Stop accepting transactions into the batch; new ones start the next batch."""
+        if self._pending.get(key) is batch:
+            del self._pending[key]
+        batch.full.set()
+
+    async def _flush_after_window(self, key: PositionKey, batch: PendingBatch) -> None:
+        try:
+            await asyncio.wait_for(batch.full.wait(), timeout=self.window_ms / 1000)
+        except asyncio.TimeoutError:
+            pass
+
+        self._close_batch(key, batch)
+        await self._write(key, batch)
+
+    async def _write(self, key: PositionKey, batch: PendingBatch) -> None:
+        """Write the batch and resolve every waiting request with its outcome."""
+
+        session_factory = self.session_factory or shard_router.session_factory_for(key[0])
+        try:
+            async with session_factory() as session:
+                transaction_records = await process_coin_transactions_batch(session, [data for data, _ in batch.items])
+
+        except Exception as e:
+            if len(batch.items) > 1:
+                logger.warning(f"Coalesced batch of {len(batch.items)} transactions failed ({e}), writing them one by one.")
+                await self._write_each(key, batch, session_factory)
+                return
+            for _, future in batch.items:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        logger.debug(f"Coalesced {len(batch.items)} transactions into one commit.")
+        portfolio_snapshotter.mark_dirty(
+            transaction_records[0].user_id, transaction_records[0].coin_id, shard_router.shard_for(key[0])
+        )
+        for _, future in batch.items:
+            if not future.done():
+                future.set_result(None)
+
+    async def _write_each(
+        self,
+        key: PositionKey,
+        batch: PendingBatch,
+        session_factory: Callable[[], AsyncSession],
+    ) -> None:
+        """Write the transactions of a failed batch one by one, so only the failing ones get the error."""
+
+        for data, future in batch.items:
+            try:
+                async with session_factory() as session:
+                    transaction_record = await process_coin_transaction(session, data)
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+                continue
+
+            portfolio_snapshotter.mark_dirty(
+                transaction_record.user_id, transaction_record.coin_id, shard_router.shard_for(key[0])
+            )
+            if not future.done():
+                future.set_result(None)
+
+    async def close(self) -> None:
+        """Flush every pending batch; called on shutdown before the engine is disposed."""
+        for key, batch in list(self._pending.items()):
+            self._close_batch(key, batch)
+
+        if self._flushes:
+            await asyncio.gather(*self._flushes, return_exceptions=True)
+
+
+transactions_coalescer = TransactionsCoalescer()
@@ -0,0 +1,54 @@
+"""Implementation of operational endpoints, guarded by the admin token of the settings"""
+
+import secrets
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, status
+
+from api.config import get_settings
+from api.views.responses import trusted_response
+from api.database.slow_queries import slow_query_log
+from api.schemas.admin_schemas import SlowQuerySchema, SlowQueriesResponseSchema
+
+router = APIRouter()
+
+
+def require_admin_token(x_admin_token: str | None = Header(default=None)) -> None:
+    """The endpoints do not exist without a configured token and are forbidden without the right one."""
+    admin_token = get_settings().slow_queries.admin_token
+    if admin_token is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if x_admin_token is None or not secrets.compare_digest(x_admin_token, admin_token):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid admin token.")
+
+
+@router.get(
+    "/slow-queries",
+    status_code=status.HTTP_200_OK,
+    response_model=SlowQueriesResponseSchema,
+    dependencies=[Depends(require_admin_token)],
+)
+async def read_slow_queries_endpoint(limit: int = Query(default=50, ge=1, le=1000)):
+    """Endpoint for the slowest recent statements of this worker process, newest first"""
+    slow_query_log.configure_from_settings()
+    return trusted_response(
+        SlowQueriesResponseSchema(
+            threshold_ms=slow_query_log.config.threshold_ms,
+            queries=[
+                SlowQuerySchema(
+                    statement=record.statement,
+                    parameters=record.parameters,
+                    duration_ms=record.duration_ms,
+                    caller=record.caller,
+                    recorded_at=record.recorded_at,
+                    plan=record.plan,
+                )
+                for record in slow_query_log.recent(limit)
+            ],
+        )
+    )
+
+
+@router.delete("/slow-queries", status_code=status.HTTP_204_NO_CONTENT, dependencies=[Depends(require_admin_token)])
+async def clear_slow_queries_endpoint():
+    """Endpoint for emptying the slow query buffer of this worker process"""
+    slow_query_log.clear()
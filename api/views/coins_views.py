@@ -1,19 +1,40 @@
 """Implementation of endpoints for working with coins in the user's portfolio"""
 
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from api.database.db_helper import db_helper
-from api.crud.coins_crud import add_coin_for_user, get_all_coins_for_user, delete_coin_for_user
-from api.schemas.coins_crud_schemas import UserCoinsResponseSchema, CoinInfoResponseSchema, CoinActionSchema
+from api.config import get_settings
+from api.database.shard_router import shard_router
+from api.views.responses import trusted_response, CacheValidators
+from api.views.encodings import Layout, Representation
+from api.database.lazy_session import SessionReleasingRoute
+from api.crud.coins_crud import (
+    add_coin_for_user,
+    get_all_coins_for_user,
+    delete_coin_for_user,
+    add_coins_for_user,
+    delete_coins_for_user,
+    read_coins_version,
+)
+from api.crud.coin_search_crud import search_coins
+from api.crud.leaderboard_crud import read_coin_leaderboard
+from api.schemas.coins_crud_schemas import (
+    UserCoinsResponseSchema,
+    CoinInfoResponseSchema,
+    CoinActionSchema,
+    BulkCoinActionSchema,
+    BulkCoinsResponseSchema,
+    CoinSearchResponseSchema,
+    CoinLeaderboardResponseSchema,
+)
 
-router = APIRouter()
+router = APIRouter(route_class=SessionReleasingRoute)
 
 
 @router.post("/", status_code=status.HTTP_201_CREATED, response_model=CoinInfoResponseSchema)
 async def add_coin_for_user_endpoint(
     coin_data: CoinActionSchema,
-    session: AsyncSession = Depends(db_helper.session_getter),
+    session: AsyncSession = Depends(shard_router.session_getter),
 ):
     """Endpoint for adding a new user's coin"""
     return await add_coin_for_user(coin_data=coin_data, session=session)
@@ -22,16 +43,94 @@ async def add_coin_for_user_endpoint(
 @router.get("/", status_code=status.HTTP_200_OK, response_model=UserCoinsResponseSchema)
 async def get_all_coins_for_user_endpoint(
     username: str,
-    session: AsyncSession = Depends(db_helper.session_getter),
+    request: Request,
+    layout: Layout = Query(default="rows"),
+    session: AsyncSession = Depends(shard_router.session_getter),
 ):
-    """Endpoint for getting all user's coins"""
-    return await get_all_coins_for_user(username=username, session=session)
+    """Endpoint for getting all user's coins; JSON or MessagePack, rows or columns"""
+    representation = Representation.negotiate(request, layout)
+    version = await read_coins_version(username=username, session=session)
+    if version is None:
+        return representation.render(await get_all_coins_for_user(username=username, session=session))
+
+    *_, date_added, deleted_at = version
+    validators = CacheValidators.from_version(
+        *version, last_modified=max(filter(None, (date_added, deleted_at)), default=None)
+    ).variant(representation.tag, weak=representation.encoding is not None)
+    if validators.matches(request):
+        return validators.not_modified()
+    return validators.apply(representation.render(await get_all_coins_for_user(username=username, session=session)))
 
 
 @router.delete("/", status_code=status.HTTP_200_OK, response_model=CoinInfoResponseSchema)
 async def delete_coin_for_user_endpoint(
     coin_data: CoinActionSchema,
-    session: AsyncSession = Depends(db_helper.session_getter),
+    session: AsyncSession = Depends(shard_router.session_getter),
 ):
     """Endpoint for deleting a user's coin"""
     return await delete_coin_for_user(coin_data=coin_data, session=session)
+
+
+@router.post("/bulk", status_code=status.HTTP_200_OK, response_model=BulkCoinsResponseSchema)
+async def add_coins_for_user_endpoint(
+    coins_data: BulkCoinActionSchema,
+    session: AsyncSession = Depends(shard_router.session_getter),
+):
+    """Endpoint for adding several user's coins at once"""
+    return await add_coins_for_user(coins_data=coins_data, session=session)
+
+
+@router.delete("/bulk", status_code=status.HTTP_200_OK, response_model=BulkCoinsResponseSchema)
+async def delete_coins_for_user_endpoint(
+    coins_data: BulkCoinActionSchema,
+    session: AsyncSession = Depends(shard_router.session_getter),
+):
+    """Endpoint for deleting several user's coins at once"""
+    return await delete_coins_for_user(coins_data=coins_data, session=session)
+
+
+@router.get("/search", status_code=status.HTTP_200_OK, response_model=CoinSearchResponseSchema)
+async def search_coins_endpoint(
+    request: Request,
+    q: str = Query(min_length=1, max_length=100),
+    limit: int | None = Query(default=None, ge=1),
+    session: AsyncSession = Depends(shard_router.session_getter),
+):
+    """Endpoint for coin type-ahead over names and symbols, most held coins first"""
+    search_settings = get_settings().search
+    if not search_settings.enabled:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Coin search is disabled.")
+    # every prefix keeps only its top K coins
+    if limit is not None and limit > search_settings.top_k:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {search_settings.top_k} coins can be listed.",
+        )
+    # the index lives in memory and differs between worker processes, so the tag comes from the body
+    response = trusted_response(await search_coins(session=session, query=q, limit=limit))
+    validators = CacheValidators.from_body(response.body)
+    if validators.matches(request):
+        return validators.not_modified()
+    return validators.apply(response)
+
+
+@router.get("/leaderboard", status_code=status.HTTP_200_OK, response_model=CoinLeaderboardResponseSchema)
+async def read_coin_leaderboard_endpoint(
+    coin_name: str,
+    coin_symbol: str,
+    limit: int | None = Query(default=None, ge=1),
+    session: AsyncSession = Depends(shard_router.session_getter),
+):
+    """Endpoint for the largest holders of a coin and its number of holders"""
+    leaderboard_settings = get_settings().leaderboard
+    if not leaderboard_settings.enabled:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Leaderboards are disabled.")
+    # only the top K holders of every coin are ranked exactly
+    if limit is not None and limit > leaderboard_settings.top_k:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {leaderboard_settings.top_k} holders can be listed.",
+        )
+    return trusted_response(
+        await read_coin_leaderboard(session=session, coin_name=coin_name, coin_symbol=coin_symbol, limit=limit)
+    )
@@ -0,0 +1,115 @@
+"""Content negotiation for large list responses: JSON or MessagePack, row or column layout, zstd or gzip"""
+
+import gzip
+from typing import Any, Literal
+from datetime import datetime
+from dataclasses import dataclass
+
+import msgpack
+import orjson
+import zstandard
+from fastapi import Request, Response
+from pydantic import BaseModel
+
+from api.config import get_settings
+
+Layout = Literal["rows", "columns"]
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+MSGPACK_ALIASES = (MSGPACK, "application/x-msgpack", "application/vnd.msgpack")
+# preferred first when the client weighs several equally
+ENCODINGS = ("zstd", "gzip")
+
+
+def parse_qualities(header: str) -> dict[str, float]:
+    """Map the values of an `Accept`-style header to their `q` weights."""
+    qualities = {}
+    for item in header.split(","):
+        value, *params = (part.strip() for part in item.split(";"))
+        if not value:
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, weight = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    quality = float(weight)
+                except ValueError:
+                    quality = 0.0
+        qualities[value.lower()] = quality
+    return qualities
+
+
+def to_columns(content: dict[str, Any]) -> dict[str, Any]:
+    """Turn every list of objects in a dumped model into an object of equally long lists."""
+    columnar = {}
+    for key, value in content.items():
+        if isinstance(value, list) and value and all(isinstance(row, dict) for row in value):
+            columnar[key] = {column: [row[column] for row in value] for column in value[0]}
+        elif isinstance(value, list) and not value:
+            columnar[key] = {}
+        else:
+            columnar[key] = value
+    return columnar
+
+
+def msgpack_default(value: Any) -> Any:
+    # the same ISO strings as the JSON responses, naive SQLite timestamps included
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not MessagePack serializable")
+
+
+@dataclass(frozen=True)
+class Representation:
+    """How a list response is sent, negotiated from the request before anything is read from the database."""
+
+    media_type: str = JSON
+    layout: Layout = "rows"
+    encoding: str | None = None
+
+    @classmethod
+    def negotiate(cls, request: Request, layout: Layout = "rows") -> "Representation":
+        """
+        MessagePack only when the client names it with a weight at least that of JSON, so `*/*` keeps
+        getting JSON; zstd or gzip when `Accept-Encoding` allows one of them.
+        """
+        accept = parse_qualities(request.headers.get("accept", ""))
+        json_quality = max(accept.get(JSON, 0.0), accept.get("application/*", 0.0), accept.get("*/*", 0.0))
+        msgpack_quality = max(accept.get(alias, 0.0) for alias in MSGPACK_ALIASES)
+        media_type = MSGPACK if msgpack_quality > 0 and msgpack_quality >= json_quality else JSON
+
+        accept_encoding = parse_qualities(request.headers.get("accept-encoding", ""))
+        weights = {encoding: accept_encoding.get(encoding, accept_encoding.get("*", 0.0)) for encoding in ENCODINGS}
+        encoding = max(ENCODINGS, key=lambda name: weights[name])
+
+        return cls(media_type=media_type, layout=layout, encoding=encoding if weights[encoding] > 0 else None)
+
+    @property
+    def tag(self) -> str:
+        """Distinguishes the entity tags of the representations of one resource version."""
+        return f"{'msgpack' if self.media_type == MSGPACK else 'json'}-{self.layout}"
+
+    def serialize(self, model: BaseModel) -> bytes:
+        content = model.model_dump()
+        if self.layout == "columns":
+            content = to_columns(content)
+        if self.media_type == MSGPACK:
+            return msgpack.packb(content, default=msgpack_default)
+        return orjson.dumps(content)
+
+    def render(self, model: BaseModel, status_code: int = 200) -> Response:
+        """Serialize a trusted model and compress it when the body is large enough."""
+        body = self.serialize(model)
+        headers = {"Vary": "Accept, Accept-Encoding"}
+
+        encoding_settings = get_settings().encoding
+        if self.encoding is not None and len(body) >= encoding_settings.min_compress_size:
+            if self.encoding == "zstd":
+                body = zstandard.ZstdCompressor(level=encoding_settings.zstd_level).compress(body)
+            else:
+                body = gzip.compress(body, compresslevel=encoding_settings.gzip_level, mtime=0)
+            headers["Content-Encoding"] = self.encoding
+
+        return Response(content=body, status_code=status_code, media_type=self.media_type, headers=headers)
@@ -0,0 +1,42 @@
+"""Implementation of endpoints for exporting a user's data"""
+
+from fastapi import APIRouter, Depends, Query, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api.config import get_settings
+from api.database.shard_router import shard_router
+from api.database.lazy_session import SessionReleasingRoute
+from api.crud.export_crud import MEDIA_TYPES, ExportTable, ExportFormat, get_export_user_id, stream_export
+
+router = APIRouter(route_class=SessionReleasingRoute)
+
+
+@router.get("/{username}", status_code=status.HTTP_200_OK, response_class=StreamingResponse)
+async def export_user_data_endpoint(
+    username: str,
+    table: ExportTable = "transactions",
+    export_format: ExportFormat = Query(default="csv", alias="format"),
+    gzip: bool = False,
+    session: AsyncSession = Depends(shard_router.session_getter),
+):
+    """Endpoint to download all transactions or statistics of a user as CSV or NDJSON"""
+    user_id = await get_export_user_id(session=session, username=username)
+
+    export_settings = get_settings().export
+    headers = {"Content-Disposition": f'attachment; filename="{username}-{table}.{export_format}"'}
+    if gzip:
+        headers["Content-Encoding"] = "gzip"
+
+    return StreamingResponse(
+        stream_export(
+            session_factory=shard_router.session_factory_for(username, read_only=True),
+            user_id=user_id,
+            table=table,
+            export_format=export_format,
+            batch_size=export_settings.batch_size,
+            gzip_level=export_settings.gzip_level if gzip else None,
+        ),
+        media_type=MEDIA_TYPES[export_format],
+        headers=headers,
+    )
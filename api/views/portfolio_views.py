@@ -0,0 +1,83 @@
+"""Implementation of endpoints for the portfolio history"""
+
+from datetime import date, timedelta
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api.config import get_settings
+from api.database.shard_router import shard_router
+from api.database.lazy_session import SessionReleasingRoute
+from api.crud.portfolio_crud import utc_today, get_portfolio_chart
+from api.services.portfolio_analytics import portfolio_analytics
+from api.services.portfolio_simulator import portfolio_simulator
+from api.schemas.portfolio_schemas import (
+    PortfolioChartResponseSchema,
+    PortfolioAnalyticsResponseSchema,
+    PortfolioSimulationResponseSchema,
+)
+
+router = APIRouter(route_class=SessionReleasingRoute)
+
+
+@router.get("/{username}/chart", status_code=status.HTTP_200_OK, response_model=PortfolioChartResponseSchema)
+async def get_portfolio_chart_endpoint(
+    username: str,
+    start: date | None = None,
+    end: date | None = None,
+    points: int | None = Query(default=None, ge=3, le=5000),
+    session: AsyncSession = Depends(shard_router.session_getter),
+):
+    """Endpoint for the daily value of a user's portfolio, one year back by default"""
+    end = end or utc_today()
+    start = start or end - timedelta(days=365)
+    return await get_portfolio_chart(
+        session=session,
+        username=username,
+        start=start,
+        end=end,
+        max_points=points or get_settings().snapshots.chart_max_points,
+    )
+
+
+@router.get("/{username}/analytics", status_code=status.HTTP_200_OK, response_model=PortfolioAnalyticsResponseSchema)
+async def get_portfolio_analytics_endpoint(
+    username: str,
+    start: date | None = None,
+    end: date | None = None,
+    session: AsyncSession = Depends(shard_router.session_getter),
+):
+    """Endpoint for return, volatility, max drawdown and Sharpe ratio of a user's portfolio, one year back by default"""
+    end = end or utc_today()
+    start = start or end - timedelta(days=365)
+    if start > end:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="'start' must not be after 'end'.")
+    return await portfolio_analytics.get(session=session, username=username, start=start, end=end)
+
+
+@router.get("/{username}/simulation", status_code=status.HTTP_200_OK, response_model=PortfolioSimulationResponseSchema)
+async def get_portfolio_simulation_endpoint(
+    username: str,
+    days: int = Query(default=365, ge=1),
+    paths: int = Query(default=5000, ge=100),
+    volatility: float | None = Query(default=None, ge=0, le=10),
+    correlation: float | None = Query(default=None, ge=0, lt=1),
+    drift: float = Query(default=0.0, ge=-1, le=1),
+    session: AsyncSession = Depends(shard_router.session_getter),
+):
+    """Endpoint for Monte Carlo percentile bands of the value of a user's current holdings over the next days"""
+    settings = get_settings().simulation
+    if days > settings.max_days or paths > settings.max_paths:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {settings.max_days} days and {settings.max_paths} paths can be simulated.",
+        )
+    return await portfolio_simulator.simulate(
+        session=session,
+        username=username,
+        days=days,
+        paths=paths,
+        volatility=settings.default_volatility if volatility is None else volatility,
+        correlation=settings.default_correlation if correlation is None else correlation,
+        drift=drift,
+    )
@@ -0,0 +1,61 @@
+"""Implementation of endpoints for price alerts on the user's coins"""
+
+from fastapi import APIRouter, Depends, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api.database.shard_router import shard_router
+from api.database.lazy_session import SessionReleasingRoute
+from api.crud.price_alerts_crud import create_price_alert, get_price_alerts_for_user, delete_price_alert
+from api.services.price_alerts import price_alert_engine
+from api.schemas.price_alerts_schemas import (
+    PriceAlertActionSchema,
+    PriceAlertResponseSchema,
+    UserPriceAlertsResponseSchema,
+)
+
+router = APIRouter(route_class=SessionReleasingRoute)
+
+
+@router.post("/", status_code=status.HTTP_201_CREATED, response_model=PriceAlertResponseSchema)
+async def create_price_alert_endpoint(
+    alert_data: PriceAlertActionSchema,
+    session: AsyncSession = Depends(shard_router.session_getter),
+):
+    """Endpoint for creating an alert on a price level of a user's coin"""
+    alert_record = await create_price_alert(session=session, alert_data=alert_data)
+    price_alert_engine.add(
+        shard_router.shard_for(alert_data.username),
+        alert_record.id,
+        alert_record.catalog_id,
+        alert_record.direction,
+        alert_record.threshold,
+    )
+    return PriceAlertResponseSchema(
+        id=alert_record.id,
+        coin_name=alert_data.coin_name,
+        coin_symbol=alert_data.coin_symbol,
+        direction=alert_record.direction,
+        threshold=alert_record.threshold,
+        created_at=alert_record.created_at,
+        triggered_at=alert_record.triggered_at,
+    )
+
+
+@router.get("/", status_code=status.HTTP_200_OK, response_model=UserPriceAlertsResponseSchema)
+async def get_price_alerts_endpoint(
+    username: str,
+    session: AsyncSession = Depends(shard_router.session_getter),
+):
+    """Endpoint for getting all price alerts of a user, triggered ones included"""
+    return await get_price_alerts_for_user(session=session, username=username)
+
+
+@router.delete("/{alert_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_price_alert_endpoint(
+    alert_id: int,
+    username: str,
+    session: AsyncSession = Depends(shard_router.session_getter),
+):
+    """Endpoint for deleting a price alert of a user"""
+    deleted_alert = await delete_price_alert(session=session, username=username, alert_id=alert_id)
+    price_alert_engine.remove(shard_router.shard_for(username), *deleted_alert)
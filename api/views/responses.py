@@ -0,0 +1,92 @@
+"""Responses for output models built from trusted data, and conditional GET support"""
+
+import hashlib
+from datetime import datetime, timezone
+from dataclasses import dataclass, replace
+from email.utils import format_datetime, parsedate_to_datetime
+
+from fastapi import Request, Response, status
+from pydantic import BaseModel
+from fastapi.responses import ORJSONResponse
+
+
+def trusted_response(model: BaseModel, status_code: int = status.HTTP_200_OK) -> ORJSONResponse:
+    """
+    Serialize a model straight to ORJSON.
+
+    FastAPI validates whatever an endpoint returns against its `response_model` once more, unless it is a
+    `Response`; the `response_model` of the route is then only used for the documentation.
+    """
+    return ORJSONResponse(content=model.model_dump(), status_code=status_code)
+
+
+def as_utc(moment: datetime) -> datetime:
+    # SQLite returns naive timestamps, they are stored in UTC
+    return moment.replace(tzinfo=timezone.utc) if moment.tzinfo is None else moment.astimezone(timezone.utc)
+
+
+@dataclass(frozen=True)
+class CacheValidators:
+    """
+    `ETag` and `Last-Modified` of a resource, derived from a cheap version lookup instead of the body.
+
+    Check `matches()` before running the full query; a match is answered with `not_modified()`.
+    """
+
+    etag: str
+    last_modified: datetime | None = None
+
+    @classmethod
+    def from_version(cls, *version, last_modified: datetime | None = None) -> "CacheValidators":
+        """Validators of a resource whose content is fully determined by `version`."""
+        digest = hashlib.blake2b(repr(version).encode(), digest_size=16).hexdigest()
+        return cls(etag=f'"{digest}"', last_modified=last_modified)
+
+    @classmethod
+    def from_body(cls, body: bytes) -> "CacheValidators":
+        """Validators of an already serialized response without a version marker."""
+        return cls(etag=f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"')
+
+    def matches(self, request: Request) -> bool:
+        """
+        Whether the client's copy is current: `If-None-Match` (weak comparison) decides when present,
+        otherwise `If-Modified-Since`.
+        """
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match is not None:
+            tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+            return "*" in tags or self.etag.removeprefix("W/") in tags
+
+        if_modified_since = request.headers.get("if-modified-since")
+        if if_modified_since is None or self.last_modified is None:
+            return False
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        # HTTP dates have a one second resolution
+        return as_utc(self.last_modified).replace(microsecond=0) <= as_utc(since)
+
+    def variant(self, tag: str, weak: bool = False) -> "CacheValidators":
+        """
+        Validators of one representation of the resource, e.g. another format or layout; weak when the
+        bytes also depend on a content coding negotiated per request.
+        """
+        opaque = self.etag.removeprefix("W/")[1:-1]
+        etag = f'"{opaque}-{tag}"'
+        return replace(self, etag=f"W/{etag}" if weak else etag)
+
+    @property
+    def headers(self) -> dict[str, str]:
+        # clients may keep the response but have to revalidate it before every use
+        headers = {"ETag": self.etag, "Cache-Control": "private, no-cache"}
+        if self.last_modified is not None:
+            headers["Last-Modified"] = format_datetime(as_utc(self.last_modified), usegmt=True)
+        return headers
+
+    def not_modified(self) -> Response:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=self.headers)
+
+    def apply(self, response: Response) -> Response:
+        response.headers.update(self.headers)
+        return response
@@ -1,17 +1,55 @@
+"""Implementation of endpoints for recording coin transactions"""
+
 from fastapi import APIRouter, status, Depends
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from api.database.db_helper import db_helper
-from api.crud.transactions_crud import create_coin_transaction
-from api.schemas.coins_crud_schemas import OperationActionSchema
+from api.config import get_settings
+from api.database.shard_router import shard_router
+from api.database.lazy_session import SessionReleasingRoute
+from api.crud.statistics_crud import read_coin_statistics
+from api.crud.coin_catalog_crud import coin_catalog_cache
+from api.crud.transactions_crud import process_coin_transaction
+from api.schemas.coins_crud_schemas import OperationActionSchema, CoinStatisticsResponseSchema
+from api.services.portfolio_snapshots import portfolio_snapshotter
+from api.services.price_alerts import price_alert_engine
+from api.services.transactions_coalescer import transactions_coalescer
 
-router = APIRouter()
+router = APIRouter(route_class=SessionReleasingRoute)
 
 
 @router.post("/", status_code=status.HTTP_201_CREATED, response_model=OperationActionSchema)
 async def create_coin_transaction_endpoint(
     operation: OperationActionSchema,
-    session: AsyncSession = Depends(db_helper.session_getter),
+    session: AsyncSession = Depends(shard_router.session_getter),
 ):
     """Create a new coin transaction."""
-    return await create_coin_transaction(operation=operation, session=session)
+    if transactions_coalescer.enabled:
+        await transactions_coalescer.submit(operation)
+    else:
+        transaction_record = await process_coin_transaction(session=session, transaction_data=operation)
+        portfolio_snapshotter.mark_dirty(
+            transaction_record.user_id, transaction_record.coin_id, shard_router.shard_for(operation.username)
+        )
+
+    if get_settings().alerts.enabled:
+        # the trade price is the latest known price of the coin; the catalog id was cached while processing
+        catalog_id = coin_catalog_cache.get(operation.coin_name, operation.coin_symbol)
+        if catalog_id is not None and operation.average_price > 0:
+            price_alert_engine.tick(catalog_id, operation.average_price)
+    return operation
+
+
+@router.get("/statistics", status_code=status.HTTP_200_OK, response_model=CoinStatisticsResponseSchema)
+async def read_coin_statistics_endpoint(
+    username: str,
+    coin_name: str,
+    coin_symbol: str,
+    session: AsyncSession = Depends(shard_router.session_getter),
+):
+    """Endpoint for getting the statistics of a user's coin"""
+    return await read_coin_statistics(
+        session=session,
+        username=username,
+        coin_name=coin_name,
+        coin_symbol=coin_symbol,
+    )
@@ -1,45 +1,73 @@
 """Implementing endpoints for working with user profiles"""
 
-from fastapi import APIRouter, status, Depends
+from fastapi import APIRouter, Request, Query, status, Depends
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from api.database.db_helper import db_helper
-from api.crud.users_crud import create_user, read_all_users, delete_user_by_username, read_user_by_username
+from api.database.shard_router import shard_router
+from api.views.responses import trusted_response, CacheValidators
+from api.views.encodings import Layout, Representation
+from api.database.lazy_session import SessionReleasingRoute
+from api.crud.users_crud import (
+    create_user,
+    read_all_users,
+    merge_user_lists,
+    delete_user_by_username,
+    read_user_by_username,
+    read_users_version,
+    read_user_version,
+)
 from api.schemas.users_crud_schemas import AllUsersResponseSchema, UserActionSchema, UserInfoResponseSchema
 
-router = APIRouter()
+router = APIRouter(route_class=SessionReleasingRoute)
 
 
 @router.post("/", status_code=status.HTTP_201_CREATED, response_model=UserInfoResponseSchema)
 async def create_user_endpoint(
     user_data: UserActionSchema,
-    session: AsyncSession = Depends(db_helper.session_getter),
+    session: AsyncSession = Depends(shard_router.session_getter),
 ):
     """Endpoint to add a new user to the database."""
-    return await create_user(user_data=user_data, session=session)
+    return trusted_response(await create_user(user_data=user_data, session=session), status_code=status.HTTP_201_CREATED)
 
 
 @router.get("/", status_code=status.HTTP_200_OK, response_model=AllUsersResponseSchema)
-async def read_all_users_endpoint(
-    session: AsyncSession = Depends(db_helper.session_getter),
-):
-    """Endpoint to retrieve a list of usernames."""
-    return await read_all_users(session=session)
+async def read_all_users_endpoint(request: Request, layout: Layout = Query(default="rows")):
+    """Endpoint to retrieve a list of usernames, read from all shards at once; JSON or MessagePack, rows or columns."""
+    representation = Representation.negotiate(request, layout)
+    versions = await shard_router.fan_out(lambda session: read_users_version(session=session))
+    changes = [moment for *_, registered_at, deleted_at in versions for moment in (registered_at, deleted_at) if moment]
+    validators = CacheValidators.from_version(*versions, last_modified=max(changes, default=None)).variant(
+        representation.tag, weak=representation.encoding is not None
+    )
+    if validators.matches(request):
+        return validators.not_modified()
+
+    user_lists = await shard_router.fan_out(lambda session: read_all_users(session=session))
+    return validators.apply(representation.render(merge_user_lists(user_lists)))
 
 
 @router.get("/{username}", status_code=status.HTTP_200_OK, response_model=UserInfoResponseSchema)
 async def read_user_by_username_endpoint(
     username: str,
-    session: AsyncSession = Depends(db_helper.session_getter),
+    request: Request,
+    session: AsyncSession = Depends(shard_router.session_getter),
 ):
     """Endpoint to retrieve user information by a username."""
-    return await read_user_by_username(username=username, session=session)
+    version = await read_user_version(username=username, session=session)
+    if version is None:
+        # unknown user, the full read answers with 404
+        return trusted_response(await read_user_by_username(username=username, session=session))
+
+    validators = CacheValidators.from_version(*version, last_modified=version[1])
+    if validators.matches(request):
+        return validators.not_modified()
+    return validators.apply(trusted_response(await read_user_by_username(username=username, session=session)))
 
 
 @router.delete("/", status_code=status.HTTP_200_OK, response_model=UserInfoResponseSchema)
 async def delete_user_by_username_endpoint(
     user_data: UserActionSchema,
-    session: AsyncSession = Depends(db_helper.session_getter),
+    session: AsyncSession = Depends(shard_router.session_getter),
 ):
     """Endpoint to remove a user from the database."""
-    return await delete_user_by_username(user_data=user_data, session=session)
+    return trusted_response(await delete_user_by_username(user_data=user_data, session=session))
@@ -0,0 +1,63 @@
+"""
+Response bytes and serialization CPU of the list endpoints for every format, layout and content coding.
+
+Renders an in-memory `AllUsersResponseSchema` the way `GET /users/` does, without the database, so only
+serialization and compression are measured. Run from the repository root:
+
+    python -m benchmarks.list_encodings_benchmark --users 50000 --runs 5
+"""
+
+import time
+import argparse
+import statistics
+import itertools
+from datetime import datetime, timezone
+
+from api.views.encodings import JSON, MSGPACK, Representation
+from api.schemas.users_crud_schemas import AllUsersResponseSchema, UserInfoResponseSchema
+
+
+def build_users(users: int) -> AllUsersResponseSchema:
+    registered_at = datetime.now(timezone.utc)
+    return AllUsersResponseSchema.model_construct(
+        users=[
+            UserInfoResponseSchema.model_construct(
+                id=index, username=f"user{index}", email=f"user{index}@example.com", registered_at=registered_at
+            )
+            for index in range(users)
+        ]
+    )
+
+
+def cpu_time_s(representation: Representation, model: AllUsersResponseSchema, runs: int) -> tuple[float, int]:
+    timings = []
+    for _ in range(runs):
+        started = time.process_time()
+        response = representation.render(model)
+        timings.append(time.process_time() - started)
+    return statistics.median(timings), len(response.body)
+
+
+def main(users: int, runs: int) -> None:
+    model = build_users(users)
+
+    baseline_s, baseline_bytes = cpu_time_s(Representation(), model, runs)
+    print(f"GET /users/ with {users} users, median CPU time of {runs} runs")
+    print(f"{'format':10} {'layout':8} {'coding':8} {'bytes':>12} {'vs json':>8} {'cpu ms':>9}")
+    for media_type, layout, encoding in itertools.product((JSON, MSGPACK), ("rows", "columns"), (None, "gzip", "zstd")):
+        representation = Representation(media_type=media_type, layout=layout, encoding=encoding)
+        cpu_s, size = cpu_time_s(representation, model, runs)
+        print(
+            f"{representation.tag.split('-')[0]:10} {layout:8} {encoding or 'identity':8} "
+            f"{size:12d} {size / baseline_bytes:8.2f} {cpu_s * 1000:9.1f}"
+        )
+    print(f"plain JSON rows: {baseline_bytes} bytes, {baseline_s * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=50_000)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    main(args.users, args.runs)
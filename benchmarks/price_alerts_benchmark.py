@@ -0,0 +1,106 @@
+"""
+Tick matching throughput of the price alert index against scanning every alert of the coin.
+
+Alerts get thresholds spread around a starting price of 100, ticks are a random walk of small moves
+per coin. Both matchers see the same ticks; the scan uses NumPy masks over all alerts of the ticked coin
+and, like the index, only fires each alert once. Run from the repository root:
+
+    python -m benchmarks.price_alerts_benchmark --alerts 2000000 --coins 50 --ticks 100000
+"""
+
+import time
+import argparse
+
+import numpy as np
+
+from api.services.price_alerts import PriceAlertIndex
+
+
+def generate_alerts(alerts: int, coins: int, rng: np.random.Generator) -> tuple[np.ndarray, ...]:
+    catalog_ids = rng.integers(0, coins, alerts)
+    thresholds = np.round(100 * np.exp(rng.normal(0, 0.3, alerts)), 2)
+    above = rng.random(alerts) < 0.5
+    return catalog_ids, thresholds, above
+
+
+def generate_ticks(ticks: int, coins: int, rng: np.random.Generator) -> list[tuple[int, float]]:
+    catalog_ids = rng.integers(0, coins, ticks)
+    prices = np.full(coins, 100.0)
+    sequence = []
+    for catalog_id, move in zip(catalog_ids, np.exp(rng.normal(0, 0.002, ticks))):
+        prices[catalog_id] *= move
+        sequence.append((int(catalog_id), float(prices[catalog_id])))
+    return sequence
+
+
+def run_index(alerts: tuple[np.ndarray, ...], ticks: list[tuple[int, float]]) -> tuple[float, float, int]:
+    catalog_ids, thresholds, above = alerts
+
+    started = time.perf_counter()
+    index = PriceAlertIndex()
+    index.load(
+        zip(range(len(thresholds)), catalog_ids.tolist(), np.where(above, "above", "below").tolist(), thresholds.tolist())
+    )
+    load_s = time.perf_counter() - started
+
+    last_prices: dict[int, float] = {}
+    fired = 0
+    started = time.perf_counter()
+    for catalog_id, price in ticks:
+        last_price = last_prices.get(catalog_id, 100.0)
+        last_prices[catalog_id] = price
+        fired += len(index.match(catalog_id, last_price, price)[1])
+    return load_s, time.perf_counter() - started, fired
+
+
+def run_scan(alerts: tuple[np.ndarray, ...], ticks: list[tuple[int, float]]) -> tuple[float, int]:
+    catalog_ids, thresholds, above = alerts
+    per_coin = {
+        int(catalog_id): (thresholds[catalog_ids == catalog_id], above[catalog_ids == catalog_id])
+        for catalog_id in np.unique(catalog_ids)
+    }
+    active = {catalog_id: np.ones(len(coin_thresholds), dtype=bool) for catalog_id, (coin_thresholds, _) in per_coin.items()}
+
+    last_prices: dict[int, float] = {}
+    fired = 0
+    started = time.perf_counter()
+    for catalog_id, price in ticks:
+        last_price = last_prices.get(catalog_id, 100.0)
+        last_prices[catalog_id] = price
+        coin_thresholds, coin_above = per_coin[catalog_id]
+        if price > last_price:
+            crossed = coin_above & (coin_thresholds > last_price) & (coin_thresholds <= price)
+        else:
+            crossed = ~coin_above & (coin_thresholds >= price) & (coin_thresholds < last_price)
+        crossed &= active[catalog_id]
+        active[catalog_id] &= ~crossed
+        fired += int(crossed.sum())
+    return time.perf_counter() - started, fired
+
+
+def main(alerts_count: int, coins: int, ticks_count: int, scan_ticks: int) -> None:
+    rng = np.random.default_rng(0)
+    alerts = generate_alerts(alerts_count, coins, rng)
+    ticks = generate_ticks(ticks_count, coins, rng)
+
+    load_s, index_s, index_fired = run_index(alerts, ticks)
+    # the scan is slow, it is timed on a prefix of the ticks and extrapolated
+    scan_s, _ = run_scan(alerts, ticks[:scan_ticks])
+    _, prefix_s, _ = run_index(alerts, ticks[:scan_ticks])
+
+    print(f"{alerts_count} alerts over {coins} coins, {ticks_count} ticks, {index_fired} alerts fired")
+    print(f"index load            {load_s * 1000:10.1f} ms")
+    print(f"index matching        {ticks_count / index_s:10.0f} ticks/s")
+    print(f"first {scan_ticks} ticks, index  {scan_ticks / prefix_s:10.0f} ticks/s")
+    print(f"first {scan_ticks} ticks, scan   {scan_ticks / scan_s:10.0f} ticks/s  ({scan_s / prefix_s:.1f}x slower)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--alerts", type=int, default=2_000_000)
+    parser.add_argument("--coins", type=int, default=50)
+    parser.add_argument("--ticks", type=int, default=100_000)
+    parser.add_argument("--scan-ticks", type=int, default=2_000)
+    args = parser.parse_args()
+
+    main(args.alerts, args.coins, args.ticks, args.scan_ticks)
@@ -0,0 +1,100 @@
+"""
+Cold start benchmark: `python -X importtime` for `api.main` and time to the first served request.
+
+Without `APP__DB__URL` the application runs against a fresh SQLite file. `--minimal` switches the
+optional subsystems off, to compare against the default start.
+
+Run from the repository root:
+
+    python -m benchmarks.startup_benchmark --runs 5 [--minimal]
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+FIRST_RESPONSE_SNIPPET = """
+from fastapi.testclient import TestClient
+from api.main import create_app
+
+with TestClient(create_app()) as client:
+    assert client.get("/openapi.json").status_code == 200
+"""
+
+
+CREATE_TABLES_SNIPPET = """
+import sys
+from sqlalchemy import create_engine
+from api.database.models import Base
+
+Base.metadata.create_all(create_engine("sqlite:///" + sys.argv[1]))
+"""
+
+MINIMAL_ENV = {
+    "APP__SEARCH__ENABLED": "false",
+    "APP__SNAPSHOTS__ENABLED": "false",
+    "APP__ALERTS__ENABLED": "false",
+    "APP__LEADERBOARD__ENABLED": "false",
+    "APP__PURGE__ENABLED": "false",
+}
+
+
+def benchmark_env() -> dict[str, str]:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [os.getcwd(), env.get("PYTHONPATH")]))
+    return env
+
+
+def create_sqlite_database() -> str:
+    """Create the tables in a fresh SQLite file and return its URL."""
+    path = os.path.join(tempfile.mkdtemp(), "startup_benchmark.db")
+    subprocess.run([sys.executable, "-c", CREATE_TABLES_SNIPPET, path], env=benchmark_env(), check=True)
+    return f"sqlite+aiosqlite:///{path}"
+
+
+def import_time_us(module: str) -> int:
+    """Cumulative import time of `module` in microseconds, as reported by `-X importtime`."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        env=benchmark_env(),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    for line in result.stderr.splitlines():
+        parts = [part.strip() for part in line.removeprefix("import time:").split("|")]
+        if len(parts) == 3 and parts[2] == module:
+            return int(parts[1])
+    raise RuntimeError(f"Module '{module}' not found in the import time report")
+
+
+def first_response_s() -> float:
+    """Wall time from starting the interpreter to the first served request."""
+    started = time.perf_counter()
+    subprocess.run([sys.executable, "-c", FIRST_RESPONSE_SNIPPET], env=benchmark_env(), check=True)
+    return time.perf_counter() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--minimal", action="store_true", help="switch the optional subsystems off")
+    args = parser.parse_args()
+    if "APP__DB__URL" not in os.environ:
+        os.environ["APP__DB__URL"] = create_sqlite_database()
+    if args.minimal:
+        os.environ.update(MINIMAL_ENV)
+
+    imports = [import_time_us("api.main") for _ in range(args.runs)]
+    responses = [first_response_s() for _ in range(args.runs)]
+
+    print(f"import api.main         median {statistics.median(imports) / 1000:8.1f} ms  min {min(imports) / 1000:8.1f} ms")
+    print(f"first served request    median {statistics.median(responses) * 1000:8.1f} ms  min {min(responses) * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
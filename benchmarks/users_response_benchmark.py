@@ -0,0 +1,89 @@
+"""
+CPU time of `GET /users/` with the trusted response path against full response validation.
+
+The baseline route does what `GET /users/` did before: it builds validated `UserInfoResponseSchema`
+objects and lets FastAPI validate them again against the `response_model`. Run from the repository root:
+
+    python -m benchmarks.users_response_benchmark --users 50000 --runs 3
+"""
+
+import time
+import asyncio
+import argparse
+import statistics
+from datetime import datetime, timezone
+
+import httpx
+from sqlalchemy import insert, select
+from fastapi import Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api.main import create_app
+from api.database.db_helper import db_helper
+from api.database.models import Base, UsersORM
+from api.schemas.users_crud_schemas import AllUsersResponseSchema, UserInfoResponseSchema
+
+
+async def read_all_users_validated(session: AsyncSession = Depends(db_helper.session_getter)):
+    users_query = await session.execute(select(UsersORM))
+    return AllUsersResponseSchema(
+        users=[
+            UserInfoResponseSchema(id=user.id, username=user.username, email=user.email, registered_at=user.registered_at)
+            for user in users_query.scalars().all()
+        ]
+    )
+
+
+async def seed(users: int) -> None:
+    async with db_helper.engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+        registered_at = datetime.now(timezone.utc)
+        await connection.execute(
+            insert(UsersORM),
+            [
+                {"username": f"user{index}", "email": f"user{index}@example.com", "password": "x" * 64, "registered_at": registered_at}
+                for index in range(users)
+            ],
+        )
+
+
+async def cpu_time_s(client: httpx.AsyncClient, path: str, runs: int) -> list[float]:
+    timings = []
+    for _ in range(runs):
+        started = time.process_time()
+        response = await client.get(path)
+        response.raise_for_status()
+        timings.append(time.process_time() - started)
+    return timings
+
+
+async def main(users: int, runs: int) -> None:
+    db_helper.db_url = "sqlite+aiosqlite:///:memory:"
+    db_helper.pool_size = db_helper.max_overflow = None
+    db_helper.echo_pool = False
+
+    app = create_app()
+    app.add_api_route("/baseline/users/", read_all_users_validated, response_model=AllUsersResponseSchema)
+
+    db_helper.connect()
+    await seed(users)
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+            trusted = await cpu_time_s(client, "/users/", runs)
+            validated = await cpu_time_s(client, "/baseline/users/", runs)
+
+    trusted_s, validated_s = statistics.median(trusted), statistics.median(validated)
+    print(f"GET /users/ with {users} users, median CPU time of {runs} runs")
+    print(f"validated response    {validated_s * 1000:10.1f} ms")
+    print(f"trusted response      {trusted_s * 1000:10.1f} ms  ({validated_s / trusted_s:.1f}x less CPU)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=50_000)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    asyncio.run(main(args.users, args.runs))
@@ -4,12 +4,38 @@ import pytest_asyncio
 DATABASE_URL = "sqlite+aiosqlite:///:memory:"
 
 
+def operation(username: str = "testuser", **kwargs):
+    """A Bitcoin transaction of the test user, or of `username`."""
+
+    from api.schemas.coins_crud_schemas import OperationActionSchema
+
+    return OperationActionSchema(username=username, coin_name="Bitcoin", coin_symbol="BTC", **kwargs)
+
+
+def request_with(**headers):
+    """A bare HTTP request carrying `headers`; underscores in the names become dashes."""
+
+    from starlette.requests import Request
+
+    return Request(
+        {"type": "http", "headers": [(name.replace("_", "-").encode(), value.encode()) for name, value in headers.items()]}
+    )
+
+
 @pytest_asyncio.fixture
 async def session():
     """Create an in-memory database for testing."""
 
     from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
     from api.database.models import Base
+    from api.crud.coin_search_crud import coin_search_index
+    from api.crud.coin_catalog_crud import coin_catalog_cache
+    from api.crud.leaderboard_crud import coin_leaderboards
+
+    # every test starts with an empty database, so ids cached by a previous test are meaningless
+    coin_catalog_cache.clear()
+    coin_search_index.clear()
+    coin_leaderboards.clear()
 
     engine = create_async_engine(DATABASE_URL, future=True)
     async_session = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
@@ -35,3 +61,49 @@ async def new_test_user(session):
 
     user_data = UserActionSchema(username="testuser", email="test@example.com", password="StrongPassword12!")
     return await create_user(user_data, session)
+
+
+@pytest_asyncio.fixture
+async def session_factory(session):
+    """Give a session factory bound to the test database."""
+
+    from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+    return async_sessionmaker(session.bind, expire_on_commit=False, class_=AsyncSession)
+
+
+@pytest_asyncio.fixture
+async def new_test_coin(new_test_user, session):
+    """Add a test coin for the test user."""
+
+    from api.crud.coins_crud import add_coin_for_user
+    from api.schemas.coins_crud_schemas import CoinActionSchema
+
+    coin_data = CoinActionSchema(username=new_test_user.username, coin_name="Bitcoin", coin_symbol="BTC")
+    return await add_coin_for_user(coin_data, session)
+
+
+@pytest_asyncio.fixture
+async def router():
+    """Two in-memory databases behind the application's shard router."""
+
+    from api.database.models import Base
+    from api.database.db_helper import DatabaseHelper
+    from api.database.shard_router import shard_router
+    from api.crud.coin_catalog_crud import coin_catalog_cache
+
+    helpers = [DatabaseHelper(DATABASE_URL, echo_pool=False, pool_size=None, max_overflow=None) for _ in range(2)]
+    previous_helpers = shard_router.helpers
+    shard_router.helpers = helpers
+    shard_router.connect()
+    coin_catalog_cache.clear()
+
+    for helper in helpers:
+        async with helper.engine.begin() as connection:
+            await connection.run_sync(Base.metadata.create_all)
+
+    yield shard_router
+
+    await shard_router.dispose()
+    shard_router.helpers = previous_helpers
+    coin_catalog_cache.clear()
@@ -0,0 +1,47 @@
+"""
+Counting the SQL statements a block of code sends to the database.
+"""
+
+from contextlib import contextmanager
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+class QueryCounter:
+    """The statements recorded inside a `count_queries` block."""
+
+    def __init__(self):
+        self.statements: list[str] = []
+
+    def __len__(self) -> int:
+        return len(self.statements)
+
+    def record(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        self.statements.append(statement)
+
+    def report(self) -> str:
+        return "\n".join(f"{number}. {statement}" for number, statement in enumerate(self.statements, start=1))
+
+
+@contextmanager
+def count_queries(session: AsyncSession):
+    """Record every statement executed on the session's engine inside the block."""
+
+    counter = QueryCounter()
+    engine = session.bind.sync_engine
+    event.listen(engine, "before_cursor_execute", counter.record)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, "before_cursor_execute", counter.record)
+
+
+@contextmanager
+def assert_max_queries(session: AsyncSession, budget: int):
+    """Fail with the executed SQL when the block issues more than `budget` statements."""
+
+    with count_queries(session) as counter:
+        yield counter
+
+    assert len(counter) <= budget, f"Expected at most {budget} queries, {len(counter)} were executed:\n{counter.report()}"
@@ -0,0 +1,70 @@
+import pytest
+from sqlalchemy import select, func
+
+from tests.fixtures import session
+from api.crud.users_crud import create_user
+from api.crud.coins_crud import add_coin_for_user
+from api.database.models import CoinCatalogORM
+from api.schemas import CoinActionSchema, UserActionSchema
+from api.crud.coin_catalog_crud import CoinCatalogCache, coin_catalog_cache, get_catalog_id, get_or_create_catalog_ids
+
+
+async def catalog_size(session) -> int:
+    return (await session.execute(select(func.count()).select_from(CoinCatalogORM))).scalar_one()
+
+
+class TestCoinCatalog:
+
+    @pytest.mark.asyncio
+    async def test_get_or_create_catalog_ids(self, session):
+        created = await get_or_create_catalog_ids(session, [("Bitcoin", "BTC"), ("Ethereum", "ETH")])
+        again = await get_or_create_catalog_ids(session, [("Ethereum", "ETH"), ("Solana", "SOL")])
+
+        assert again[("Ethereum", "ETH")] == created[("Ethereum", "ETH")]
+        assert len({*created.values(), *again.values()}) == 3
+        assert await catalog_size(session) == 3
+
+    @pytest.mark.asyncio
+    async def test_caller_owns_the_commit(self, session):
+        await get_or_create_catalog_ids(session, [("Bitcoin", "BTC")])
+        await session.rollback()
+
+        assert coin_catalog_cache.get("Bitcoin", "BTC") is None
+        assert await catalog_size(session) == 0
+
+    @pytest.mark.asyncio
+    async def test_get_catalog_id_unknown_coin(self, session):
+        assert await get_catalog_id(session, "Bitcoin", "BTC") is None
+
+    @pytest.mark.asyncio
+    async def test_holdings_share_catalog_entry(self, session):
+        for username in ("user1", "user2"):
+            await create_user(
+                UserActionSchema(username=username, email=f"{username}@example.com", password="StrongPassword1!"),
+                session,
+            )
+            await add_coin_for_user(CoinActionSchema(username=username, coin_name="Bitcoin", coin_symbol="BTC"), session)
+
+        assert await catalog_size(session) == 1
+
+    def test_cache_evicts_least_recently_used(self):
+        cache = CoinCatalogCache(max_size=2)
+        cache.put("Bitcoin", "BTC", 1)
+        cache.put("Ethereum", "ETH", 2)
+        cache.get("Bitcoin", "BTC")
+
+        cache.put("Solana", "SOL", 3)
+
+        assert len(cache) == 2
+        assert cache.get("Ethereum", "ETH") is None
+        assert cache.get("Bitcoin", "BTC") == 1
+
+    @pytest.mark.asyncio
+    async def test_warm(self, session):
+        created = await get_or_create_catalog_ids(session, [("Bitcoin", "BTC")])
+        coin_catalog_cache.clear()
+
+        await coin_catalog_cache.warm(session)
+
+        assert len(coin_catalog_cache) == 1
+        assert coin_catalog_cache.get("Bitcoin", "BTC") == created[("Bitcoin", "BTC")]
@@ -0,0 +1,93 @@
+import pytest
+
+from tests.fixtures import session, new_test_user, router
+from api.schemas import BulkCoinActionSchema, CoinActionSchema, UserActionSchema
+from api.crud.users_crud import create_user
+from api.crud.coins_crud import add_coin_for_user, add_coins_for_user, delete_coin_for_user
+from api.crud.coin_search_crud import CoinSearchIndex, coin_search_index, search_coins, load_coin_search_index
+
+
+@pytest.fixture
+def index():
+    index = CoinSearchIndex(top_k=3)
+    index.add_coin(1, "Bitcoin", "BTC", holders=50)
+    index.add_coin(2, "Bitcoin Cash", "BCH", holders=5)
+    index.add_coin(3, "Binance Coin", "BNB", holders=30)
+    index.add_coin(4, "Bittensor", "TAO", holders=10)
+    index.add_coin(5, "Ethereum", "ETH", holders=40)
+    return index
+
+
+class TestCoinSearchIndex:
+
+    def test_prefix_ranked_by_holders(self, index):
+        assert [coin.symbol for coin in index.search("bi")] == ["BTC", "BNB", "TAO"]
+
+    def test_symbol_and_name_word_prefix(self, index):
+        assert [coin.symbol for coin in index.search("ET")] == ["ETH"]
+        assert [coin.symbol for coin in index.search("cash")] == ["BCH"]
+        assert [coin.symbol for coin in index.search("ta")] == ["TAO"]
+
+    def test_no_match(self, index):
+        assert index.search("xyz") == []
+        assert index.search("  ") == []
+
+    def test_holders_increase_promotes_coin(self, index):
+        index.change_holders(2, 100)
+
+        assert [coin.symbol for coin in index.search("bi")] == ["BCH", "BTC", "BNB"]
+
+    def test_holders_decrease_brings_in_next_coin(self, index):
+        index.change_holders(1, -50)
+
+        assert [coin.symbol for coin in index.search("bi")] == ["BNB", "TAO", "BCH"]
+
+    def test_decrease_re_ranks_only_stale_nodes(self, index):
+        index.change_holders(1, -50)
+        # "bin" is off the paths of Bitcoin and keeps its cached ranking, however wrong
+        index.root.children["b"].children["i"].children["n"].top = []
+
+        assert [coin.symbol for coin in index.search("bi")] == ["TAO", "BCH", "BTC"]
+        assert [coin.symbol for coin in index.search("bitc")] == ["BCH", "BTC"]
+
+
+class TestSearchCoins:
+
+    @pytest.mark.asyncio
+    async def test_index_follows_portfolio_changes(self, new_test_user, session):
+        coin_search_index.clear()
+        coins = [{"coin_name": "Bitcoin", "coin_symbol": "BTC"}, {"coin_name": "Binance Coin", "coin_symbol": "BNB"}]
+        await add_coins_for_user(BulkCoinActionSchema(username=new_test_user.username, coins=coins), session)
+
+        result = await search_coins(session, "bi")
+        assert [(coin.coin_symbol, coin.holders) for coin in result.coins] == [("BNB", 1), ("BTC", 1)]
+
+        await delete_coin_for_user(
+            CoinActionSchema(username=new_test_user.username, coin_name="Bitcoin", coin_symbol="BTC"), session
+        )
+
+        result = await search_coins(session, "bi")
+        assert [(coin.coin_symbol, coin.holders) for coin in result.coins] == [("BNB", 1), ("BTC", 0)]
+
+    @pytest.mark.asyncio
+    async def test_load(self, new_test_user, session):
+        coins = [{"coin_name": "Bitcoin", "coin_symbol": "BTC"}]
+        await add_coins_for_user(BulkCoinActionSchema(username=new_test_user.username, coins=coins), session)
+        coin_search_index.clear()
+
+        await coin_search_index.load(session)
+
+        assert [(coin.symbol, coin.holders) for coin in coin_search_index.search("btc")] == [("BTC", 1)]
+
+    @pytest.mark.asyncio
+    async def test_load_sums_holders_of_every_shard(self, router):
+        for shard in (0, 1):
+            username = next(f"user{index}" for index in range(1000) if router.shard_for(f"user{index}") == shard)
+            async with router.session_factory_for(username)() as session:
+                await create_user(UserActionSchema(username=username, email=f"{username}@example.com", password="StrongPassword12!"), session)
+                await add_coin_for_user(CoinActionSchema(username=username, coin_name="Bitcoin", coin_symbol="BTC"), session)
+        coin_search_index.clear()
+
+        await load_coin_search_index([helper.async_session_factory for helper in router.helpers])
+
+        assert [(coin.symbol, coin.holders) for coin in coin_search_index.search("btc")] == [("BTC", 2)]
@@ -2,8 +2,14 @@ import pytest
 from fastapi import HTTPException, status
 
 from tests.fixtures import session, new_test_user
-from api.schemas import CoinActionSchema, UserCoinsResponseSchema
-from api.crud.coins_crud import add_coin_for_user, get_all_coins_for_user, delete_coin_for_user
+from api.schemas import CoinActionSchema, UserCoinsResponseSchema, BulkCoinActionSchema
+from api.crud.coins_crud import (
+    add_coin_for_user,
+    get_all_coins_for_user,
+    delete_coin_for_user,
+    add_coins_for_user,
+    delete_coins_for_user,
+)
 
 
 class TestAddCoinForUser:
@@ -107,3 +113,83 @@ class TestDeleteCoinForUser:
 
         assert exc_info.value.status_code == status.HTTP_404_NOT_FOUND
         assert "Coin 'Bitcoin' (BTC) not found for user 'nonexistentuser'." in str(exc_info.value.detail)
+
+
+class TestAddCoinsForUser:
+
+    @pytest.mark.asyncio
+    async def test_add_coins_for_user_success(self, new_test_user, session):
+        await add_coin_for_user(
+            CoinActionSchema(username=new_test_user.username, coin_name="Bitcoin", coin_symbol="BTC"), session
+        )
+        coins_data = BulkCoinActionSchema(
+            username=new_test_user.username,
+            coins=[
+                {"coin_name": "bitcoin", "coin_symbol": "btc"},
+                {"coin_name": "Ethereum", "coin_symbol": "ETH"},
+                {"coin_name": "Solana", "coin_symbol": "SOL"},
+            ],
+        )
+
+        result = await add_coins_for_user(coins_data, session)
+
+        assert [(coin.coin_name, coin.status) for coin in result.coins] == [
+            ("Bitcoin", "exists"),
+            ("Ethereum", "added"),
+            ("Solana", "added"),
+        ]
+        all_coins = await get_all_coins_for_user(username=new_test_user.username, session=session)
+        assert len(all_coins.coins) == 3
+
+    @pytest.mark.asyncio
+    async def test_add_coins_for_user_user_not_found(self, session):
+        coins_data = BulkCoinActionSchema(
+            username="nonexistentuser", coins=[{"coin_name": "Bitcoin", "coin_symbol": "BTC"}]
+        )
+
+        with pytest.raises(HTTPException) as exc_info:
+            await add_coins_for_user(coins_data, session)
+
+        assert exc_info.value.status_code == status.HTTP_404_NOT_FOUND
+
+
+class TestDeleteCoinsForUser:
+
+    @pytest.mark.asyncio
+    async def test_delete_coins_for_user_success(self, new_test_user, session):
+        coins = [{"coin_name": "Bitcoin", "coin_symbol": "BTC"}, {"coin_name": "Ethereum", "coin_symbol": "ETH"}]
+        await add_coins_for_user(BulkCoinActionSchema(username=new_test_user.username, coins=coins), session)
+
+        coins_data = BulkCoinActionSchema(
+            username=new_test_user.username,
+            coins=[{"coin_name": "Bitcoin", "coin_symbol": "BTC"}, {"coin_name": "Solana", "coin_symbol": "SOL"}],
+        )
+        result = await delete_coins_for_user(coins_data, session)
+
+        assert [(coin.coin_name, coin.status) for coin in result.coins] == [
+            ("Bitcoin", "deleted"),
+            ("Solana", "not_found"),
+        ]
+        all_coins = await get_all_coins_for_user(username=new_test_user.username, session=session)
+        assert [coin.coin_name for coin in all_coins.coins] == ["Ethereum"]
+
+    @pytest.mark.asyncio
+    async def test_delete_coins_for_user_user_not_found(self, new_test_user, session):
+        coins_data = BulkCoinActionSchema(
+            username="nonexistentuser", coins=[{"coin_name": "Bitcoin", "coin_symbol": "BTC"}]
+        )
+
+        with pytest.raises(HTTPException) as exc_info:
+            await delete_coins_for_user(coins_data, session)
+
+        assert exc_info.value.status_code == status.HTTP_404_NOT_FOUND
+
+    @pytest.mark.asyncio
+    async def test_delete_coins_for_user_nothing_to_delete(self, new_test_user, session):
+        coins_data = BulkCoinActionSchema(
+            username=new_test_user.username, coins=[{"coin_name": "Bitcoin", "coin_symbol": "BTC"}]
+        )
+
+        result = await delete_coins_for_user(coins_data, session)
+
+        assert [coin.status for coin in result.coins] == ["not_found"]
@@ -0,0 +1,107 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from sqlalchemy import select
+
+from tests.fixtures import session
+from api.config import ConcurrencyConfig
+from api.database.pool_wait import PoolWaitMonitor
+from api.middlewares.concurrency_limit import AdaptiveConcurrencyLimiter, ConcurrencyLimitMiddleware
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def make_limiter(pool_wait_s: float = 0.0, **config) -> AdaptiveConcurrencyLimiter:
+    return AdaptiveConcurrencyLimiter(ConcurrencyConfig(**config), lambda: pool_wait_s, clock=FakeClock())
+
+
+class TestAdaptiveConcurrencyLimiter:
+
+    def test_additive_increase(self):
+        limiter = make_limiter(initial_limit=10)
+
+        for _ in range(10):
+            limiter.record(0.01)
+
+        assert 10.9 < limiter.limit < 11
+
+    def test_multiplicative_decrease_once_per_window(self):
+        limiter = make_limiter(initial_limit=10, target_latency_ms=100)
+
+        limiter.record(1.0)
+        limiter.record(1.0)
+        assert limiter.limit == pytest.approx(9)
+
+        limiter.clock.now = 0.1
+        limiter.record(1.0)
+        assert limiter.limit == pytest.approx(8.1)
+
+    def test_pool_wait_lowers_limit(self):
+        limiter = make_limiter(pool_wait_s=0.5, initial_limit=10, min_limit=9)
+
+        limiter.record(0.01)
+        limiter.clock.now = 10
+        limiter.record(0.01)
+
+        assert limiter.limit == 9
+
+    def test_writes_have_reserved_slots(self):
+        limiter = make_limiter(initial_limit=5, write_share=0.2)
+
+        assert [limiter.try_acquire(is_write=False) for _ in range(5)] == [True] * 4 + [False]
+        assert limiter.try_acquire(is_write=True)
+        assert not limiter.try_acquire(is_write=True)
+
+        limiter.release()
+        assert limiter.in_flight == 4
+
+
+class TestConcurrencyLimitMiddleware:
+
+    @pytest.mark.asyncio
+    async def test_excess_requests_are_shed(self):
+        release = asyncio.Event()
+        app = FastAPI()
+        limiter = make_limiter(initial_limit=2, write_share=0.5)
+        app.add_middleware(ConcurrencyLimitMiddleware, limiter=limiter)
+
+        @app.get("/slow")
+        async def slow():
+            await release.wait()
+            return {}
+
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            first = asyncio.create_task(client.get("/slow"))
+            await asyncio.sleep(0.05)
+            shed = await client.get("/slow")
+            release.set()
+            admitted = await first
+
+        assert admitted.status_code == 200
+        assert shed.status_code == 503
+        assert shed.headers["Retry-After"] == "1"
+        assert limiter.in_flight == 0
+
+
+class TestPoolWaitMonitor:
+
+    @pytest.mark.asyncio
+    async def test_checkout_observed(self, session):
+        monitor = PoolWaitMonitor(alpha=1.0)
+        monitor.average_s = -1.0
+        monitor.install()
+        try:
+            await session.execute(select(1))
+        finally:
+            monitor.uninstall()
+
+        assert monitor.average_s >= 0
@@ -0,0 +1,115 @@
+from datetime import datetime, timezone
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from tests.fixtures import session, new_test_user, new_test_coin, request_with
+from tests.query_counter import count_queries
+from api.schemas import CoinActionSchema
+from api.crud.coins_crud import add_coin_for_user, delete_coin_for_user
+from api.views.responses import CacheValidators
+from api.views.coins_views import router as coins_router
+from api.views.users_views import router as users_router
+from api.database.shard_router import shard_router
+
+
+def client_for(session) -> httpx.AsyncClient:
+    async def override_session():
+        yield session
+
+    app = FastAPI()
+    app.include_router(users_router, prefix="/users")
+    app.include_router(coins_router, prefix="/coins")
+    app.dependency_overrides[shard_router.session_getter] = override_session
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+
+
+class TestCacheValidators:
+
+    def test_etag_follows_the_version(self):
+        assert CacheValidators.from_version(1, 2).etag == CacheValidators.from_version(1, 2).etag
+        assert CacheValidators.from_version(1, 2).etag != CacheValidators.from_version(1, 3).etag
+
+    def test_if_none_match(self):
+        validators = CacheValidators.from_version(1)
+
+        assert validators.matches(request_with(if_none_match=validators.etag))
+        assert validators.matches(request_with(if_none_match=f'"other", W/{validators.etag}'))
+        assert validators.matches(request_with(if_none_match="*"))
+        assert not validators.matches(request_with(if_none_match='"other"'))
+        assert not validators.matches(request_with())
+
+    def test_if_modified_since(self):
+        validators = CacheValidators.from_version(1, last_modified=datetime(2026, 10, 19, 12, 0, 0, 500000))
+
+        assert validators.headers["Last-Modified"] == "Mon, 19 Oct 2026 12:00:00 GMT"
+        assert validators.matches(request_with(if_modified_since="Mon, 19 Oct 2026 12:00:00 GMT"))
+        assert not validators.matches(request_with(if_modified_since="Mon, 19 Oct 2026 11:59:59 GMT"))
+        assert not validators.matches(request_with(if_modified_since="yesterday"))
+        # If-None-Match takes precedence
+        assert not validators.matches(
+            request_with(if_none_match='"other"', if_modified_since="Mon, 19 Oct 2026 12:00:00 GMT")
+        )
+
+    def test_aware_last_modified(self):
+        validators = CacheValidators.from_version(1, last_modified=datetime(2026, 10, 19, 12, tzinfo=timezone.utc))
+
+        assert validators.headers["Last-Modified"] == "Mon, 19 Oct 2026 12:00:00 GMT"
+
+
+class TestConditionalGet:
+
+    @pytest.mark.asyncio
+    async def test_coins_not_modified_skips_the_full_read(self, new_test_coin, session):
+        async with client_for(session) as client:
+            first = await client.get("/coins/", params={"username": "testuser"})
+            assert first.status_code == 200
+            assert first.json() == {"coins": [{"coin_name": "Bitcoin", "coin_symbol": "BTC"}]}
+            etag = first.headers["ETag"]
+            assert "Last-Modified" in first.headers
+
+            with count_queries(session) as counter:
+                cached = await client.get("/coins/", params={"username": "testuser"}, headers={"If-None-Match": etag})
+            assert cached.status_code == 304
+            assert cached.content == b""
+            assert cached.headers["ETag"] == etag
+            # the version lookup only
+            assert len(counter) == 1
+
+    @pytest.mark.asyncio
+    async def test_coins_etag_changes_with_the_list(self, new_test_coin, session):
+        async with client_for(session) as client:
+            etag = (await client.get("/coins/", params={"username": "testuser"})).headers["ETag"]
+
+            await add_coin_for_user(CoinActionSchema(username="testuser", coin_name="Ethereum", coin_symbol="ETH"), session)
+            added = await client.get("/coins/", params={"username": "testuser"}, headers={"If-None-Match": etag})
+            assert added.status_code == 200
+            assert len(added.json()["coins"]) == 2
+
+            await delete_coin_for_user(CoinActionSchema(username="testuser", coin_name="Ethereum", coin_symbol="ETH"), session)
+            deleted = await client.get("/coins/", params={"username": "testuser"}, headers={"If-None-Match": added.headers["ETag"]})
+            assert deleted.status_code == 200
+            assert deleted.headers["ETag"] not in (etag, added.headers["ETag"])
+
+    @pytest.mark.asyncio
+    async def test_user(self, new_test_user, session):
+        async with client_for(session) as client:
+            first = await client.get("/users/testuser")
+            assert first.status_code == 200
+            assert first.json()["username"] == "testuser"
+
+            cached = await client.get("/users/testuser", headers={"If-None-Match": first.headers["ETag"]})
+            assert cached.status_code == 304
+
+            missing = await client.get("/users/nobody", headers={"If-None-Match": first.headers["ETag"]})
+            assert missing.status_code == 404
+
+    @pytest.mark.asyncio
+    async def test_search_tag_from_body(self, new_test_coin, session):
+        async with client_for(session) as client:
+            first = await client.get("/coins/search", params={"q": "bit"})
+            assert first.json()["coins"][0]["coin_symbol"] == "BTC"
+
+            cached = await client.get("/coins/search", params={"q": "bit"}, headers={"If-None-Match": first.headers["ETag"]})
+            assert cached.status_code == 304
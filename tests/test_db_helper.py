@@ -0,0 +1,97 @@
+import httpx
+import pytest
+from fastapi import APIRouter, Depends, FastAPI
+from pydantic import BaseModel, field_validator
+from sqlalchemy import text
+
+from api.database.db_helper import DatabaseHelper
+from api.database.lazy_session import LazySession, SessionReleasingRoute
+
+DATABASE_URL = "sqlite+aiosqlite:///:memory:"
+
+
+class TestDatabaseHelper:
+
+    def test_engine_is_not_created_on_init(self):
+        helper = DatabaseHelper(DATABASE_URL)
+
+        assert helper.engine is None
+        assert helper.async_session_factory is None
+
+    @pytest.mark.asyncio
+    async def test_session_getter_before_connect(self):
+        helper = DatabaseHelper(DATABASE_URL)
+
+        with pytest.raises(RuntimeError):
+            await anext(helper.session_getter())
+
+    @pytest.mark.asyncio
+    async def test_connect_and_dispose(self):
+        helper = DatabaseHelper(DATABASE_URL, echo_pool=False, pool_size=None, max_overflow=None)
+        helper.connect()
+        engine = helper.engine
+
+        helper.connect()
+        assert helper.engine is engine
+
+        async for session in helper.session_getter():
+            result = await session.execute(text("SELECT 1"))
+            assert result.scalar_one() == 1
+
+        await helper.dispose()
+        assert helper.engine is None
+        assert helper.async_session_factory is None
+
+
+class TestLazySession:
+
+    @pytest.mark.asyncio
+    async def test_session_opened_on_first_use(self):
+        helper = DatabaseHelper(DATABASE_URL, echo_pool=False, pool_size=None, max_overflow=None)
+        helper.connect()
+
+        try:
+            async for session in helper.session_getter():
+                assert isinstance(session, LazySession)
+                assert not session.opened
+
+                await session.execute(text("SELECT 1"))
+                assert session.opened
+
+            assert not session.opened
+        finally:
+            await helper.dispose()
+
+    @pytest.mark.asyncio
+    async def test_released_before_serialization(self):
+        helper = DatabaseHelper(DATABASE_URL, echo_pool=False, pool_size=None, max_overflow=None)
+        helper.connect()
+        observed = {}
+
+        class ValueSchema(BaseModel):
+            value: int
+
+            @field_validator("value")
+            @classmethod
+            def record_session_state(cls, value: int) -> int:
+                observed["opened_during_serialization"] = observed["session"].opened
+                return value
+
+        router = APIRouter(route_class=SessionReleasingRoute)
+
+        @router.get("/value", response_model=ValueSchema)
+        async def read_value(session=Depends(helper.session_getter)):
+            observed["session"] = session
+            return {"value": (await session.execute(text("SELECT 1"))).scalar_one()}
+
+        app = FastAPI()
+        app.include_router(router)
+
+        try:
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+                response = await client.get("/value")
+        finally:
+            await helper.dispose()
+
+        assert response.json() == {"value": 1}
+        assert observed["opened_during_serialization"] is False
@@ -0,0 +1,138 @@
+import gzip
+from datetime import datetime
+
+import httpx
+import msgpack
+import orjson
+import pytest
+import zstandard
+from fastapi import FastAPI
+
+from tests.fixtures import session, new_test_user, new_test_coin, request_with
+from api.schemas import AllUsersResponseSchema, UserInfoResponseSchema
+from api.views.encodings import Representation, parse_qualities, to_columns
+from api.views.coins_views import router as coins_router
+from api.database.shard_router import shard_router
+
+REGISTERED_AT = datetime(2026, 10, 19, 12, 30)
+
+
+def users(count: int) -> AllUsersResponseSchema:
+    return AllUsersResponseSchema.model_construct(
+        users=[
+            UserInfoResponseSchema.model_construct(
+                id=index, username=f"user{index}", email=f"user{index}@example.com", registered_at=REGISTERED_AT
+            )
+            for index in range(count)
+        ]
+    )
+
+
+class TestNegotiation:
+
+    def test_parse_qualities(self):
+        assert parse_qualities("gzip;q=0.5, zstd, br;q=x") == {"gzip": 0.5, "zstd": 1.0, "br": 0.0}
+
+    @pytest.mark.parametrize(
+        "accept, media_type",
+        [
+            ("", "application/json"),
+            ("*/*", "application/json"),
+            ("application/msgpack", "application/msgpack"),
+            ("application/x-msgpack, application/json", "application/msgpack"),
+            ("application/msgpack;q=0.5, application/json", "application/json"),
+            ("application/msgpack;q=0", "application/json"),
+        ],
+    )
+    def test_media_type(self, accept, media_type):
+        assert Representation.negotiate(request_with(accept=accept)).media_type == media_type
+
+    @pytest.mark.parametrize(
+        "accept_encoding, encoding",
+        [
+            ("", None),
+            ("gzip, deflate", "gzip"),
+            ("gzip, zstd", "zstd"),
+            ("zstd;q=0.5, gzip", "gzip"),
+            ("*", "zstd"),
+            ("*, zstd;q=0, gzip;q=0", None),
+        ],
+    )
+    def test_encoding(self, accept_encoding, encoding):
+        assert Representation.negotiate(request_with(accept_encoding=accept_encoding)).encoding == encoding
+
+
+class TestRender:
+
+    def test_columns(self):
+        assert to_columns({"users": [{"id": 1, "name": "a"}, {"id": 2, "name": "b"}], "total": 2}) == {
+            "users": {"id": [1, 2], "name": ["a", "b"]},
+            "total": 2,
+        }
+        assert to_columns({"users": []}) == {"users": {}}
+
+    def test_msgpack_columns(self):
+        response = Representation(media_type="application/msgpack", layout="columns").render(users(2))
+
+        assert response.headers["content-type"] == "application/msgpack"
+        assert msgpack.unpackb(response.body) == {
+            "users": {
+                "id": [0, 1],
+                "username": ["user0", "user1"],
+                "email": ["user0@example.com", "user1@example.com"],
+                "registered_at": ["2026-10-19T12:30:00"] * 2,
+            }
+        }
+
+    def test_json_rows_match_trusted_response(self):
+        response = Representation().render(users(2))
+
+        assert orjson.loads(response.body) == orjson.loads(orjson.dumps(users(2).model_dump()))
+
+    @pytest.mark.parametrize("encoding, decompress", [("zstd", zstandard.ZstdDecompressor().decompress), ("gzip", gzip.decompress)])
+    def test_compressed(self, encoding, decompress):
+        response = Representation(encoding=encoding).render(users(200))
+
+        assert response.headers["content-encoding"] == encoding
+        assert orjson.loads(decompress(response.body))["users"][199]["username"] == "user199"
+        assert len(response.body) < len(orjson.dumps(users(200).model_dump())) / 4
+
+    def test_small_bodies_stay_uncompressed(self):
+        response = Representation(encoding="zstd").render(users(1))
+
+        assert "content-encoding" not in response.headers
+        assert response.headers["vary"] == "Accept, Accept-Encoding"
+
+
+class TestListEndpoint:
+
+    @pytest.mark.asyncio
+    async def test_coins_as_msgpack_columns(self, new_test_coin, session):
+        async def override_session():
+            yield session
+
+        app = FastAPI()
+        app.include_router(coins_router, prefix="/coins")
+        app.dependency_overrides[shard_router.session_getter] = override_session
+
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            packed = await client.get(
+                "/coins/", params={"username": "testuser", "layout": "columns"}, headers={"Accept": "application/msgpack"}
+            )
+            plain = await client.get("/coins/", params={"username": "testuser"}, headers={"Accept": "application/json"})
+
+            assert msgpack.unpackb(packed.content) == {"coins": {"coin_name": ["Bitcoin"], "coin_symbol": ["BTC"]}}
+            assert plain.json() == {"coins": [{"coin_name": "Bitcoin", "coin_symbol": "BTC"}]}
+            # every representation has its own entity tag
+            assert packed.headers["ETag"] != plain.headers["ETag"]
+
+            cached = await client.get(
+                "/coins/",
+                params={"username": "testuser", "layout": "columns"},
+                headers={"Accept": "application/msgpack", "If-None-Match": packed.headers["ETag"]},
+            )
+            assert cached.status_code == 304
+            mismatched = await client.get(
+                "/coins/", params={"username": "testuser"}, headers={"If-None-Match": packed.headers["ETag"]}
+            )
+            assert mismatched.status_code == 200
@@ -0,0 +1,76 @@
+import csv
+import gzip
+import orjson
+
+import pytest
+from fastapi import HTTPException, status
+
+from tests.fixtures import session, new_test_user, new_test_coin, session_factory, operation
+from api.crud.transactions_crud import process_coin_transaction
+from api.crud.export_crud import get_export_user_id, stream_export
+
+
+async def collect(chunks) -> bytes:
+    return b"".join([chunk async for chunk in chunks])
+
+
+async def add_transactions(session, count: int) -> int:
+    for index in range(count):
+        transaction = await process_coin_transaction(session, operation(buy=1, average_price=100 + index))
+    return transaction.user_id
+
+
+class TestStreamExport:
+
+    @pytest.mark.asyncio
+    async def test_csv_transactions_in_batches(self, new_test_coin, session, session_factory):
+        user_id = await add_transactions(session, 5)
+
+        chunks = [
+            chunk async for chunk in stream_export(session_factory, user_id, "transactions", "csv", batch_size=2)
+        ]
+        rows = list(csv.DictReader(b"".join(chunks).decode().splitlines()))
+
+        # header + 3 batches
+        assert len(chunks) == 4
+        assert len(rows) == 5
+        assert rows[0]["coin_name"] == "Bitcoin"
+        assert [float(row["average_price"]) for row in rows] == [100, 101, 102, 103, 104]
+
+    @pytest.mark.asyncio
+    async def test_ndjson_statistics(self, new_test_coin, session, session_factory):
+        user_id = await add_transactions(session, 2)
+
+        body = await collect(stream_export(session_factory, user_id, "statistics", "ndjson", batch_size=10))
+        lines = [orjson.loads(line) for line in body.splitlines()]
+
+        assert len(lines) == 1
+        assert lines[0]["coin_symbol"] == "BTC"
+        assert lines[0]["holdings"] == 2
+        assert lines[0]["transactions_count"] == 2
+
+    @pytest.mark.asyncio
+    async def test_gzip(self, new_test_coin, session, session_factory):
+        user_id = await add_transactions(session, 3)
+
+        plain = await collect(stream_export(session_factory, user_id, "transactions", "ndjson", batch_size=2))
+        compressed = await collect(
+            stream_export(session_factory, user_id, "transactions", "ndjson", batch_size=2, gzip_level=6)
+        )
+
+        assert gzip.decompress(compressed) == plain
+
+    @pytest.mark.asyncio
+    async def test_empty_export(self, new_test_user, session, session_factory):
+        body = await collect(stream_export(session_factory, new_test_user.id, "transactions", "ndjson", batch_size=2))
+        assert body == b""
+
+
+class TestGetExportUserId:
+
+    @pytest.mark.asyncio
+    async def test_user_not_found(self, session):
+        with pytest.raises(HTTPException) as exc_info:
+            await get_export_user_id(session, "nobody")
+
+        assert exc_info.value.status_code == status.HTTP_404_NOT_FOUND
@@ -0,0 +1,67 @@
+import pytest
+import pytest_asyncio
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from tests.fixtures import session
+from api.schemas import UserActionSchema
+from api.database.models import Base, UsersORM
+from api.database.leader_lock import LeaderLock
+from api.crud.users_crud import create_user, delete_user_by_username
+from api.services.purge_worker import PurgeWorker
+
+TEST_USER = UserActionSchema(username="testuser", email="test@example.com", password="StrongPassword12!")
+
+
+@pytest_asyncio.fixture
+async def file_engine(tmp_path):
+    """A SQLite file database, shared by every engine like between worker processes."""
+
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'app.db'}")
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+    yield engine
+    await engine.dispose()
+
+
+class TestLeaderLock:
+
+    @pytest.mark.asyncio
+    async def test_memory_database_has_a_single_process(self, session):
+        assert await LeaderLock("purge").acquire(session.bind)
+        assert await LeaderLock("purge").acquire(session.bind)
+
+    @pytest.mark.asyncio
+    async def test_one_holder_per_database_file(self, file_engine):
+        leader, follower, other = LeaderLock("purge"), LeaderLock("purge"), LeaderLock("statistics-shards-merge")
+
+        assert await leader.acquire(file_engine)
+        assert await leader.acquire(file_engine)
+        assert not await follower.acquire(file_engine)
+        assert await other.acquire(file_engine)
+
+        await leader.release()
+        assert await follower.acquire(file_engine)
+
+        await follower.release()
+        await other.release()
+
+    @pytest.mark.asyncio
+    async def test_only_the_leader_purges(self, file_engine):
+        session_factory = async_sessionmaker(file_engine, expire_on_commit=False, class_=AsyncSession)
+        async with session_factory() as session:
+            await create_user(TEST_USER, session)
+            await delete_user_by_username(TEST_USER, session)
+        leader = LeaderLock("purge")
+        await leader.acquire(file_engine)
+        worker = PurgeWorker(session_factories=[session_factory], batch_size=100, pause_s=0, interval_s=60)
+
+        try:
+            assert await worker.run_once() == (0, 0)
+            await leader.release()
+            assert await worker.run_once() == (0, 1)
+        finally:
+            await worker.leader_lock.release()
+
+        async with session_factory() as session:
+            assert (await session.execute(select(func.count()).select_from(UsersORM))).scalar_one() == 0
@@ -0,0 +1,177 @@
+import pytest
+from sqlalchemy import select
+from fastapi import HTTPException, status
+
+from tests.fixtures import session, new_test_user, new_test_coin, session_factory, operation
+from tests.query_counter import count_queries
+from api.schemas import UserActionSchema, CoinActionSchema
+from api.database.models import CoinLeaderboardsORM
+from api.crud.users_crud import create_user
+from api.crud.coins_crud import add_coin_for_user, delete_coin_for_user
+from api.crud.transactions_crud import process_coin_transaction, process_coin_transactions_batch
+from api.crud.leaderboard_crud import CoinLeaderboards, coin_leaderboards, load_leaderboard_rows, read_coin_leaderboard
+from api.services.leaderboard import LeaderboardMaintainer
+
+BTC = 1
+
+
+async def new_holder(session, username: str, buy: float) -> None:
+    await create_user(UserActionSchema(username=username, email=f"{username}@example.com", password="StrongPassword12!"), session)
+    await add_coin_for_user(CoinActionSchema(username=username, coin_name="Bitcoin", coin_symbol="BTC"), session)
+    await process_coin_transaction(session, operation(username, buy=buy, paid=buy * 100))
+
+
+class TestCoinLeaderboards:
+
+    def test_record_ranks_holders(self):
+        leaderboards = CoinLeaderboards(top_k=2, tracked=3)
+        leaderboards.record(BTC, "alice", 0, 5)
+        leaderboards.record(BTC, "bob", 0, 7)
+        leaderboards.record(BTC, "carol", 0, 6)
+
+        assert leaderboards.top(BTC) == (3, [("bob", 7), ("carol", 6)])
+        assert leaderboards.top(BTC, limit=1) == (3, [("bob", 7)])
+
+    def test_selling_everything_drops_the_holder(self):
+        leaderboards = CoinLeaderboards(top_k=2, tracked=3)
+        leaderboards.record(BTC, "alice", 0, 5)
+        leaderboards.record(BTC, "alice", 5, 0)
+
+        assert leaderboards.top(BTC) == (0, [])
+        assert not leaderboards.stale
+
+    def test_eviction_raises_the_floor(self):
+        leaderboards = CoinLeaderboards(top_k=1, tracked=2)
+        for user_id, holdings in ((1, 5), (2, 7), (3, 6)):
+            leaderboards.record(BTC, f"user{user_id}", 0, holdings)
+
+        board = leaderboards.coins[BTC]
+        assert set(board.entries) == {"user2", "user3"}
+        assert board.floor == 5
+
+        # an untracked holder only joins once above every holder left out
+        leaderboards.record(BTC, "user4", 0, 4)
+        assert 4 not in board.entries
+        assert leaderboards.top(BTC) == (4, [("user2", 7)])
+
+    def test_falling_below_the_floor_marks_the_coin_stale(self):
+        leaderboards = CoinLeaderboards(top_k=2, tracked=2)
+        for user_id, holdings in ((1, 5), (2, 7), (3, 6)):
+            leaderboards.record(BTC, f"user{user_id}", 0, holdings)
+
+        leaderboards.record(BTC, "user2", 7, 1)
+
+        assert leaderboards.top(BTC) == (3, [("user3", 6)])
+        assert BTC in leaderboards.stale
+
+    def test_seed_merges_shards(self):
+        leaderboards = CoinLeaderboards(top_k=2, tracked=2)
+        leaderboards.seed(
+            [
+                [(BTC, 1, "alice", 9, 3), (BTC, 2, "bob", 4, 3)],
+                [(BTC, 3, "carol", 6, 1)],
+            ]
+        )
+
+        board = leaderboards.coins[BTC]
+        assert leaderboards.top(BTC) == (4, [("alice", 9), ("carol", 6)])
+        # the first shard left a holder with at most 4 out, and bob was evicted at 4
+        assert board.floor == 4
+
+    def test_user_ids_repeat_across_shards(self):
+        leaderboards = CoinLeaderboards(top_k=2, tracked=2)
+        leaderboards.seed([[(BTC, 1, "alice", 9, 1)], [(BTC, 1, "bob", 6, 1)]])
+        assert leaderboards.top(BTC) == (2, [("alice", 9), ("bob", 6)])
+
+        leaderboards.record(BTC, "bob", 6, 8)
+        assert leaderboards.top(BTC) == (2, [("alice", 9), ("bob", 8)])
+
+
+class TestLeaderboardCrud:
+
+    @pytest.mark.asyncio
+    async def test_transactions_update_the_leaderboard(self, new_test_coin, session):
+        await process_coin_transaction(session, operation("testuser", buy=2, paid=100))
+        await new_holder(session, "seconduser", 3)
+
+        leaderboard = await read_coin_leaderboard(session, "Bitcoin", "BTC")
+        assert leaderboard.holders == 2
+        assert [(entry.username, entry.holdings) for entry in leaderboard.top] == [("seconduser", 3), ("testuser", 2)]
+
+        await process_coin_transactions_batch(
+            session, [operation("testuser", buy=1, paid=100), operation("testuser", buy=3, paid=300)]
+        )
+        await process_coin_transaction(session, operation("seconduser", sell=3, paid=300))
+
+        leaderboard = await read_coin_leaderboard(session, "Bitcoin", "BTC")
+        assert leaderboard.holders == 1
+        assert [(entry.username, entry.holdings) for entry in leaderboard.top] == [("testuser", 6)]
+
+    @pytest.mark.asyncio
+    async def test_read_is_served_from_memory(self, new_test_coin, session):
+        await process_coin_transaction(session, operation("testuser", buy=2, paid=100))
+
+        with count_queries(session) as counter:
+            await read_coin_leaderboard(session, "Bitcoin", "BTC")
+
+        assert len(counter) == 0
+
+    @pytest.mark.asyncio
+    async def test_unknown_coin(self, session):
+        with pytest.raises(HTTPException) as exc_info:
+            await read_coin_leaderboard(session, "Dogecoin", "DOGE")
+
+        assert exc_info.value.status_code == status.HTTP_404_NOT_FOUND
+
+    @pytest.mark.asyncio
+    async def test_seed_query_matches_incremental_updates(self, new_test_coin, session):
+        await process_coin_transaction(session, operation("testuser", buy=2, paid=100))
+        for number, holdings in enumerate((5, 1, 4), start=1):
+            await new_holder(session, f"holder{number}", holdings)
+        incremental = coin_leaderboards.top(BTC)
+
+        rows = await load_leaderboard_rows(session, tracked=2)
+
+        assert [(username, holdings, holders) for _, _, username, holdings, holders in rows] == [
+            ("holder1", 5, 4),
+            ("holder3", 4, 4),
+        ]
+        seeded = CoinLeaderboards(top_k=2, tracked=2)
+        seeded.seed([rows])
+        assert seeded.top(BTC) == (4, incremental[1][:2])
+
+
+class TestLeaderboardMaintainer:
+
+    @pytest.mark.asyncio
+    async def test_refills_deleted_positions_and_persists(self, new_test_coin, session, session_factory):
+        await process_coin_transaction(session, operation("testuser", buy=2, paid=100))
+        await new_holder(session, "seconduser", 3)
+        maintainer = LeaderboardMaintainer([session_factory], persist_interval_s=60, reseed_interval_s=600)
+        await maintainer.seed()
+
+        await delete_coin_for_user(CoinActionSchema(username="seconduser", coin_name="Bitcoin", coin_symbol="BTC"), session)
+        assert coin_leaderboards.stale == {BTC}
+
+        assert await maintainer.run_once() == 1
+        assert coin_leaderboards.top(BTC) == (1, [("testuser", 2)])
+
+        persisted = (await session.execute(select(CoinLeaderboardsORM))).scalar_one()
+        assert persisted.catalog_id == BTC
+        assert persisted.holders == 1
+        assert persisted.top == [["testuser", 2]]
+
+    @pytest.mark.asyncio
+    async def test_only_the_leader_persists(self, new_test_coin, session, session_factory, monkeypatch):
+        await process_coin_transaction(session, operation("testuser", buy=2, paid=100))
+        maintainer = LeaderboardMaintainer([session_factory], persist_interval_s=60, reseed_interval_s=600)
+        await maintainer.seed()
+
+        async def follower(engine):
+            return False
+
+        monkeypatch.setattr(maintainer.leader_lock, "acquire", follower)
+
+        assert await maintainer.run_once() == 0
+        assert coin_leaderboards.dirty == set()
+        assert (await session.execute(select(CoinLeaderboardsORM))).scalars().all() == []
@@ -0,0 +1,55 @@
+import sys
+import subprocess
+
+import uvicorn
+
+from api.config import RunConfig, get_settings
+from api.main import create_app, run
+
+
+class TestCreateApp:
+
+    def test_create_app_registers_routers(self):
+        app = create_app()
+        paths = {route.path for route in app.routes}
+
+        assert "/users/" in paths
+        assert "/users/{username}" in paths
+        assert "/coins/" in paths
+
+    def test_optional_routers_follow_the_settings(self, monkeypatch):
+        monkeypatch.setattr(get_settings().alerts, "enabled", False)
+        monkeypatch.setattr(get_settings().slow_queries, "admin_token", None)
+        paths = {route.path for route in create_app().routes}
+        assert not any(path.startswith(("/alerts", "/admin")) for path in paths)
+
+        monkeypatch.setattr(get_settings().alerts, "enabled", True)
+        monkeypatch.setattr(get_settings().slow_queries, "admin_token", "secret")
+        paths = {route.path for route in create_app().routes}
+        assert "/alerts/" in paths
+        assert "/admin/slow-queries" in paths
+
+    def test_create_app_returns_new_instance(self):
+        assert create_app() is not create_app()
+
+    def test_import_is_lazy(self):
+        code = (
+            "import sys, api.main; "
+            "lazy = ('api.views.users_views', 'api.database.db_helper', 'sqlalchemy'); "
+            "assert not any(module in sys.modules for module in lazy)"
+        )
+        result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+
+        assert result.returncode == 0, result.stderr
+
+
+class TestRun:
+
+    def test_default_runs_the_workers(self, monkeypatch):
+        calls = []
+        monkeypatch.setattr(uvicorn, "run", lambda **kwargs: calls.append(kwargs))
+        monkeypatch.setattr(get_settings(), "run", RunConfig(workers=4))
+
+        run()
+
+        assert [(call.get("reload", False), call["workers"]) for call in calls] == [(False, 4)]
@@ -0,0 +1,89 @@
+from datetime import date, timedelta
+
+import numpy as np
+import pytest
+from fastapi import HTTPException, status
+
+from tests.fixtures import session, new_test_user, new_test_coin, operation
+from api.crud.transactions_crud import process_coin_transaction
+from api.services.portfolio_analytics import PortfolioAnalytics, compute_portfolio_metrics
+
+
+def trades(*rows) -> tuple[np.ndarray, ...]:
+    days, coins, units, prices = zip(*rows)
+    return (
+        np.array(days, dtype=np.int64),
+        np.array(coins, dtype=np.int64),
+        np.array(units, dtype=np.float64),
+        np.array(prices, dtype=np.float64),
+    )
+
+
+class TestComputePortfolioMetrics:
+
+    def test_price_moves(self):
+        metrics = compute_portfolio_metrics(0, 0, 2, *trades((0, 0, 1, 100), (1, 0, 0, 110), (2, 0, 0, 99)))
+
+        assert metrics["start_value"] == pytest.approx(100)
+        assert metrics["end_value"] == pytest.approx(99)
+        assert metrics["total_return"] == pytest.approx(-0.01)
+        assert metrics["max_drawdown"] == pytest.approx(0.1)
+        assert metrics["annualized_volatility"] == pytest.approx(np.std([0.1, -0.1], ddof=1) * np.sqrt(365))
+
+    def test_deposits_are_not_returns(self):
+        metrics = compute_portfolio_metrics(0, 0, 3, *trades((0, 0, 1, 100), (2, 0, 1, 100)))
+
+        assert metrics["end_value"] == pytest.approx(200)
+        assert metrics["total_return"] == pytest.approx(0)
+        assert metrics["max_drawdown"] == pytest.approx(0)
+
+    def test_prices_carried_forward_per_coin(self):
+        metrics = compute_portfolio_metrics(
+            0, 1, 3, *trades((0, 0, 1, 100), (0, 1, 2, 50), (2, 1, 0, 75))
+        )
+
+        assert metrics["start_value"] == pytest.approx(200)
+        assert metrics["end_value"] == pytest.approx(250)
+        assert metrics["total_return"] == pytest.approx(0.25)
+
+    def test_empty_portfolio(self):
+        metrics = compute_portfolio_metrics(0, 0, 10, *(np.array([], dtype=np.int64),) * 2, *(np.array([]),) * 2)
+
+        assert metrics == {
+            "total_return": 0.0,
+            "annualized_volatility": 0.0,
+            "max_drawdown": 0.0,
+            "sharpe_ratio": 0.0,
+            "start_value": 0.0,
+            "end_value": 0.0,
+        }
+
+
+class TestPortfolioAnalytics:
+
+    @pytest.mark.asyncio
+    async def test_results_cached_until_next_transaction(self, new_test_coin, session):
+        analytics = PortfolioAnalytics(max_workers=1, cache_size=8)
+        transaction_data = operation(buy=1, average_price=100)
+        end = date.today() + timedelta(days=1)
+        start = end - timedelta(days=30)
+
+        try:
+            await process_coin_transaction(session, transaction_data)
+            first = await analytics.get(session, "testuser", start, end)
+            assert first.end_value == pytest.approx(100)
+            assert await analytics.get(session, "testuser", start, end) is first
+
+            await process_coin_transaction(session, transaction_data)
+            second = await analytics.get(session, "testuser", start, end)
+            assert second is not first
+            assert second.end_value == pytest.approx(200)
+        finally:
+            analytics.shutdown()
+
+    @pytest.mark.asyncio
+    async def test_user_not_found(self, session):
+        with pytest.raises(HTTPException) as exc_info:
+            await PortfolioAnalytics(max_workers=1).get(session, "nobody", date(2026, 1, 1), date(2026, 2, 1))
+
+        assert exc_info.value.status_code == status.HTTP_404_NOT_FOUND
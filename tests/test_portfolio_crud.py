@@ -0,0 +1,163 @@
+import math
+from datetime import date, datetime, timezone
+
+import pytest
+from sqlalchemy import select, update
+from fastapi import HTTPException, status
+
+from tests.fixtures import session, session_factory, new_test_user, new_test_coin, router, operation
+from api.schemas import UserActionSchema, CoinActionSchema
+from api.database.models import CoinTransactionsORM, PortfolioSnapshotsORM
+from api.crud.users_crud import create_user
+from api.crud.coins_crud import add_coin_for_user
+from api.crud.transactions_crud import process_coin_transaction
+from api.crud.portfolio_crud import (
+    lttb,
+    refresh_portfolio_snapshots,
+    refresh_daily_portfolio_snapshots,
+    get_portfolio_chart,
+    get_transactions_until,
+)
+from api.services.portfolio_snapshots import PortfolioSnapshotter
+
+
+class TestLttb:
+
+    def test_short_series_is_kept(self):
+        points = [(x, x * 2) for x in range(5)]
+        assert lttb(points, 10) == [0, 1, 2, 3, 4]
+
+    def test_downsampled_size_and_ends(self):
+        points = [(x, math.sin(x / 10)) for x in range(1000)]
+        selected = lttb(points, 50)
+
+        assert len(selected) == 50
+        assert selected[0] == 0
+        assert selected[-1] == 999
+        assert selected == sorted(selected)
+
+    def test_keeps_spike(self):
+        points = [(x, 100.0 if x == 517 else 0.0) for x in range(1000)]
+        assert 517 in lttb(points, 20)
+
+
+class TestPortfolioSnapshots:
+
+    @pytest.mark.asyncio
+    async def test_refresh_position(self, new_test_coin, session):
+        transaction = await process_coin_transaction(session, operation(buy=2, average_price=100))
+
+        written = await refresh_portfolio_snapshots(
+            session, date(2026, 1, 1), positions=[(transaction.user_id, transaction.coin_id)]
+        )
+
+        assert written == 1
+        snapshot = (await session.execute(select(PortfolioSnapshotsORM))).scalar_one()
+        assert snapshot.holdings == 2
+        assert snapshot.last_price == 100
+        assert snapshot.value == 200
+
+    @pytest.mark.asyncio
+    async def test_daily_snapshot_folds_only_the_transactions_of_its_day(self, new_test_coin, session):
+        # 23:30 UTC on January 1st, and half an hour later on January 2nd
+        for buy, price, added in ((2, 100, datetime(2026, 1, 1, 23, 30)), (1, 130, datetime(2026, 1, 2, 0, 0))):
+            transaction = await process_coin_transaction(session, operation(buy=buy, average_price=price))
+            await session.execute(
+                update(CoinTransactionsORM)
+                .where(CoinTransactionsORM.id == transaction.id)
+                .values(date_added=added.replace(tzinfo=timezone.utc))
+            )
+            await session.commit()
+
+        assert await refresh_daily_portfolio_snapshots(session, date(2025, 12, 31)) == 0
+        assert await refresh_daily_portfolio_snapshots(session, date(2026, 1, 1)) == 1
+        assert await refresh_daily_portfolio_snapshots(session, date(2026, 1, 2)) == 1
+
+        snapshots = (await session.execute(select(PortfolioSnapshotsORM).order_by(PortfolioSnapshotsORM.day))).scalars().all()
+        assert [(snapshot.day, snapshot.holdings, snapshot.last_price) for snapshot in snapshots] == [
+            (date(2026, 1, 1), 2, 100),
+            (date(2026, 1, 2), 3, 130),
+        ]
+
+    @pytest.mark.asyncio
+    async def test_refresh_same_day_updates_snapshot(self, new_test_coin, session):
+        await process_coin_transaction(session, operation(buy=2, average_price=100))
+        await refresh_portfolio_snapshots(session, date(2026, 1, 1), positions=[(1, 1)])
+        await process_coin_transaction(session, operation(buy=1, average_price=130))
+        await refresh_portfolio_snapshots(session, date(2026, 1, 1), positions=[(1, 1)])
+
+        snapshot = (await session.execute(select(PortfolioSnapshotsORM))).scalar_one()
+        assert snapshot.holdings == 3
+        assert snapshot.value == 390
+
+
+class TestPortfolioSnapshotter:
+
+    @pytest.mark.asyncio
+    async def test_positions_are_refreshed_on_their_shard(self, router):
+        snapshotter = PortfolioSnapshotter()
+        for shard, buy in ((0, 2), (1, 5)):
+            username = next(f"user{index}" for index in range(1000) if router.shard_for(f"user{index}") == shard)
+            async with router.session_factory_for(username)() as session:
+                await create_user(UserActionSchema(username=username, email=f"{username}@example.com", password="StrongPassword12!"), session)
+                await add_coin_for_user(CoinActionSchema(username=username, coin_name="Bitcoin", coin_symbol="BTC"), session)
+                transaction = await process_coin_transaction(session, operation(username, buy=buy, average_price=100))
+            # both shards number their first user and coin 1
+            snapshotter.mark_dirty(transaction.user_id, transaction.coin_id, shard)
+
+        assert await snapshotter.flush() == 2
+
+        for helper, holdings in zip(router.helpers, (2, 5)):
+            async with helper.async_session_factory() as session:
+                assert (await session.execute(select(PortfolioSnapshotsORM.holdings))).scalar_one() == holdings
+
+    @pytest.mark.asyncio
+    async def test_disabled_snapshotter_keeps_no_marks(self, new_test_coin, session, session_factory):
+        transaction = await process_coin_transaction(session, operation(buy=2, average_price=100))
+        snapshotter = PortfolioSnapshotter(session_factories=[session_factory], flush_interval_s=60)
+        snapshotter.enabled = False
+
+        snapshotter.mark_dirty(transaction.user_id, transaction.coin_id)
+
+        assert await snapshotter.flush() == 0
+
+
+class TestGetPortfolioChart:
+
+    @pytest.mark.asyncio
+    async def test_chart_carries_previous_snapshot(self, new_test_coin, session):
+        await process_coin_transaction(session, operation(buy=1, average_price=100))
+        await refresh_portfolio_snapshots(session, date(2026, 1, 1), positions=[(1, 1)])
+        await process_coin_transaction(session, operation(buy=1, average_price=200))
+        await refresh_portfolio_snapshots(session, date(2026, 1, 5), positions=[(1, 1)])
+
+        result = await get_portfolio_chart(session, "testuser", date(2026, 1, 3), date(2026, 1, 10), max_points=100)
+        assert [(point.day, point.value) for point in result.points] == [(date(2026, 1, 5), 400)]
+
+        result = await get_portfolio_chart(session, "testuser", date(2026, 1, 1), date(2026, 1, 10), max_points=100)
+        assert [point.value for point in result.points] == [100, 400]
+
+    @pytest.mark.asyncio
+    async def test_chart_user_not_found(self, session):
+        with pytest.raises(HTTPException) as exc_info:
+            await get_portfolio_chart(session, "nonexistentuser", date(2026, 1, 1), date(2026, 1, 10), max_points=100)
+
+        assert exc_info.value.status_code == status.HTTP_404_NOT_FOUND
+
+
+class TestGetTransactionsUntil:
+
+    @pytest.mark.asyncio
+    async def test_end_is_the_utc_day_boundary(self, new_test_coin, session):
+        for added in (datetime(2026, 1, 1, 23, 30), datetime(2026, 1, 2, 0, 0)):
+            transaction = await process_coin_transaction(session, operation(buy=1, average_price=100))
+            await session.execute(
+                update(CoinTransactionsORM)
+                .where(CoinTransactionsORM.id == transaction.id)
+                .values(date_added=added.replace(tzinfo=timezone.utc))
+            )
+            await session.commit()
+
+        transactions = await get_transactions_until(session, transaction.user_id, date(2026, 1, 1))
+
+        assert len(transactions) == 1
@@ -0,0 +1,121 @@
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+import pytest
+from fastapi import HTTPException, status
+
+from tests.fixtures import session, new_test_user, new_test_coin, operation
+from api.crud.transactions_crud import process_coin_transaction
+from api.services.portfolio_simulator import (
+    HEADER_BYTES,
+    PortfolioSimulator,
+    simulate_batch,
+    correlation_cholesky,
+)
+
+
+def run_batches(days: int, paths: int, batch_paths: int, start_values, volatility: float, correlation: float = 0.5):
+    start_values = np.array(start_values, dtype=np.float64)
+    cholesky = correlation_cholesky(len(start_values), correlation)
+    shm = SharedMemory(create=True, size=HEADER_BYTES + (days + 1) * paths * 8)
+    try:
+        for batch, first_path in enumerate(range(0, paths, batch_paths)):
+            assert simulate_batch(
+                shm.name, days, paths, first_path, min(batch_paths, paths - first_path),
+                start_values, cholesky, 0.0, volatility, batch,
+            )
+        return np.ndarray((days + 1, paths), dtype=np.float64, buffer=shm.buf, offset=HEADER_BYTES).copy()
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+class TestSimulateBatch:
+
+    def test_zero_volatility_keeps_the_value(self):
+        values = run_batches(days=10, paths=600, batch_paths=250, start_values=[100, 50], volatility=0)
+
+        assert values == pytest.approx(np.full((11, 600), 150))
+
+    def test_batches_fill_every_path(self):
+        values = run_batches(days=30, paths=1000, batch_paths=300, start_values=[100], volatility=0.8)
+
+        assert np.all(values[0] == 100)
+        assert np.all(values > 0)
+        # every path moved away from the start
+        assert np.all(values[-1] != 100)
+        # GBM without drift keeps the expected value
+        assert values[-1].mean() == pytest.approx(100, rel=0.05)
+
+    def test_cancelled_batch_stops(self):
+        shm = SharedMemory(create=True, size=HEADER_BYTES + 11 * 100 * 8)
+        try:
+            shm.buf[0] = 1
+            assert not simulate_batch(shm.name, 10, 100, 0, 100, np.array([1.0]), np.eye(1), 0.0, 0.5, 0)
+        finally:
+            shm.close()
+            shm.unlink()
+
+    def test_correlated_coins(self):
+        cholesky = correlation_cholesky(3, 0.6)
+
+        assert cholesky @ cholesky.T == pytest.approx(np.array([[1, 0.6, 0.6], [0.6, 1, 0.6], [0.6, 0.6, 1]]))
+
+
+class TestPortfolioSimulator:
+
+    @pytest.mark.asyncio
+    async def test_bands_cached_per_input(self, new_test_coin, session):
+        simulator = PortfolioSimulator(max_workers=1, batch_paths=200, timeout_s=30, cache_size=8)
+        transaction_data = operation(buy=2, average_price=100)
+
+        try:
+            await process_coin_transaction(session, transaction_data)
+            first = await simulator.simulate(session, "testuser", days=30, paths=500, volatility=0.5, correlation=0.5)
+
+            assert first.start_value == pytest.approx(200)
+            assert len(first.points) == 31
+            assert first.points[0].p5 == pytest.approx(200)
+            last = first.points[-1]
+            assert last.p5 < last.p25 < last.p50 < last.p75 < last.p95
+
+            again = await simulator.simulate(session, "testuser", days=30, paths=500, volatility=0.5, correlation=0.5)
+            assert again == first
+            assert len(simulator._cache) == 1
+
+            await process_coin_transaction(session, transaction_data)
+            changed = await simulator.simulate(session, "testuser", days=30, paths=500, volatility=0.5, correlation=0.5)
+            assert changed.start_value == pytest.approx(400)
+        finally:
+            simulator.shutdown()
+
+    @pytest.mark.asyncio
+    async def test_time_box(self, new_test_coin, session):
+        simulator = PortfolioSimulator(max_workers=1, batch_paths=1000, timeout_s=0.001, cache_size=8)
+        transaction_data = operation(buy=1, average_price=100)
+
+        try:
+            await process_coin_transaction(session, transaction_data)
+            with pytest.raises(HTTPException) as exc_info:
+                await simulator.simulate(session, "testuser", days=1000, paths=5000, volatility=0.5, correlation=0.5)
+        finally:
+            simulator.shutdown()
+
+        assert exc_info.value.status_code == status.HTTP_504_GATEWAY_TIMEOUT
+        assert not simulator._jobs
+
+    @pytest.mark.asyncio
+    async def test_empty_portfolio(self, new_test_user, session):
+        simulator = PortfolioSimulator(max_workers=1)
+
+        result = await simulator.simulate(session, "testuser", days=5, paths=100, volatility=0.5, correlation=0.5)
+
+        assert result.start_value == 0
+        assert [point.p95 for point in result.points] == [0.0] * 6
+
+    @pytest.mark.asyncio
+    async def test_user_not_found(self, session):
+        with pytest.raises(HTTPException) as exc_info:
+            await PortfolioSimulator(max_workers=1).simulate(session, "nobody", days=5, paths=100, volatility=0.5, correlation=0.5)
+
+        assert exc_info.value.status_code == status.HTTP_404_NOT_FOUND
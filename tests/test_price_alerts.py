@@ -0,0 +1,202 @@
+import asyncio
+from decimal import Decimal
+
+import pytest
+from fastapi import HTTPException, status
+
+from tests.fixtures import session, new_test_user, new_test_coin, session_factory, operation
+from api.config import get_settings
+from api.schemas import PriceAlertActionSchema, UserActionSchema
+from api.crud.users_crud import delete_user_by_username
+from api.crud.price_alerts_crud import (
+    create_price_alert,
+    get_price_alerts_for_user,
+    delete_price_alert,
+    load_active_price_alerts,
+    mark_price_alerts_triggered,
+)
+from api.services.price_alerts import PriceAlertIndex, PriceAlertEngine, price_alert_engine
+from api.views.transactions_views import create_coin_transaction_endpoint
+
+BTC, ETH = 1, 2
+
+
+def alert(direction: str, threshold: float, coin_symbol: str = "BTC") -> PriceAlertActionSchema:
+    coin_name = "Bitcoin" if coin_symbol == "BTC" else "Ethereum"
+    return PriceAlertActionSchema(
+        username="testuser", coin_name=coin_name, coin_symbol=coin_symbol, direction=direction, threshold=threshold
+    )
+
+
+class TestPriceAlertIndex:
+
+    def test_crossing_up_fires_above_alerts_in_range(self):
+        index = PriceAlertIndex()
+        index.load([(1, BTC, "above", 100), (2, BTC, "above", 105), (3, BTC, "above", 110), (4, BTC, "below", 95)])
+
+        direction, fired = index.match(BTC, 100, 105)
+
+        assert direction == "above"
+        # a threshold equal to the last price was already reached, the new price counts as reached
+        assert fired == [(2, 105)]
+        assert len(index) == 3
+
+    def test_crossing_down_fires_below_alerts_in_range(self):
+        index = PriceAlertIndex()
+        index.load([(1, BTC, "below", 90), (2, BTC, "below", 95), (3, BTC, "below", 100), (4, BTC, "above", 99)])
+
+        direction, fired = index.match(BTC, 100, 90)
+
+        assert direction == "below"
+        assert sorted(fired) == [(1, 90), (2, 95)]
+
+    def test_alerts_fire_once(self):
+        index = PriceAlertIndex()
+        index.add(1, BTC, "above", 100)
+
+        assert index.match(BTC, 90, 110)[1] == [(1, 100)]
+        index.match(BTC, 110, 90)
+        assert index.match(BTC, 90, 110)[1] == []
+
+    def test_coins_are_separate(self):
+        index = PriceAlertIndex()
+        index.add(1, BTC, "above", 100)
+        index.add(2, ETH, "above", 100)
+
+        assert index.match(ETH, 90, 110)[1] == [(2, 100)]
+        assert index.match(ETH, 90, 110)[1] == []
+        assert len(index) == 1
+
+    def test_remove_among_equal_thresholds(self):
+        index = PriceAlertIndex()
+        for alert_id in range(5):
+            index.add(alert_id, BTC, "below", 50)
+
+        assert index.remove(3, BTC, "below", 50)
+        assert not index.remove(3, BTC, "below", 50)
+        assert sorted(alert_id for alert_id, _ in index.match(BTC, 60, 40)[1]) == [0, 1, 2, 4]
+
+    def test_remove_a_threshold_read_back_as_decimal(self):
+        index = PriceAlertIndex()
+        index.add(1, BTC, "above", 0.1)
+
+        assert index.remove(1, BTC, "above", Decimal("0.1000000000"))
+        assert len(index) == 0
+
+
+class TestPriceAlertsCrud:
+
+    @pytest.mark.asyncio
+    async def test_create_list_delete(self, new_test_coin, session):
+        created = await create_price_alert(session, alert("above", 70000))
+
+        alerts = (await get_price_alerts_for_user(session, "testuser")).alerts
+        assert [(a.id, a.coin_symbol, a.direction, a.threshold, a.triggered_at) for a in alerts] == [
+            (created.id, "BTC", "above", 70000, None)
+        ]
+
+        deleted = await delete_price_alert(session, "testuser", created.id)
+        assert tuple(deleted) == (created.id, created.catalog_id, "above", 70000)
+        assert (await get_price_alerts_for_user(session, "testuser")).alerts == []
+
+    @pytest.mark.asyncio
+    async def test_coin_must_be_held(self, new_test_user, session):
+        with pytest.raises(HTTPException) as exc_info:
+            await create_price_alert(session, alert("above", 100, coin_symbol="ETH"))
+
+        assert exc_info.value.status_code == status.HTTP_404_NOT_FOUND
+
+    @pytest.mark.asyncio
+    async def test_delete_other_users_alert(self, new_test_coin, session):
+        created = await create_price_alert(session, alert("below", 10))
+
+        with pytest.raises(HTTPException) as exc_info:
+            await delete_price_alert(session, "someone", created.id)
+
+        assert exc_info.value.status_code == status.HTTP_404_NOT_FOUND
+
+    @pytest.mark.asyncio
+    async def test_triggered_once_and_not_for_deleted_users(self, new_test_coin, session):
+        first = await create_price_alert(session, alert("above", 100))
+        second = await create_price_alert(session, alert("above", 200))
+
+        assert await mark_price_alerts_triggered(session, [first.id]) == [first.id]
+        assert await mark_price_alerts_triggered(session, [first.id]) == []
+        assert [row.id for row in await load_active_price_alerts(session)] == [second.id]
+
+        await delete_user_by_username(
+            UserActionSchema(username="testuser", email="test@example.com", password="StrongPassword12!"), session
+        )
+        assert await load_active_price_alerts(session) == []
+        assert await mark_price_alerts_triggered(session, [second.id]) == []
+
+
+class TestPriceAlertEngine:
+
+    @pytest.mark.asyncio
+    async def test_tick_queues_and_delivers(self, new_test_coin, session, session_factory):
+        engine = PriceAlertEngine([session_factory], queue_size=10, delivery_batch=10, reload_interval_s=60)
+        up = await create_price_alert(session, alert("above", 110))
+        down = await create_price_alert(session, alert("below", 90))
+        await engine.load()
+
+        # the first price only sets the baseline
+        assert engine.tick(up.catalog_id, 100) == 0
+        assert engine.tick(up.catalog_id, 120) == 1
+        assert engine.tick(up.catalog_id, 80) == 1
+        assert await engine.deliver_once() == 2
+
+        session.expire_all()
+        alerts = (await get_price_alerts_for_user(session, "testuser")).alerts
+        assert {a.id for a in alerts if a.triggered_at is not None} == {up.id, down.id}
+        assert len(engine) == 0
+
+    @pytest.mark.asyncio
+    async def test_full_queue_drops_until_reload(self, new_test_coin, session, session_factory):
+        engine = PriceAlertEngine([session_factory], queue_size=1, delivery_batch=10, reload_interval_s=60)
+        for threshold in (101, 102, 103):
+            await create_price_alert(session, alert("above", threshold))
+        await engine.load()
+
+        engine.tick(1, 100)
+        assert engine.tick(1, 110) == 1
+        assert engine.dropped == 2
+        assert await engine.deliver_once() == 1
+
+        # the dropped alerts were not triggered and come back with the next load
+        await engine.load()
+        assert len(engine) == 2
+
+    @pytest.mark.asyncio
+    async def test_start_and_stop(self, new_test_coin, session, session_factory):
+        engine = PriceAlertEngine([session_factory], queue_size=10, delivery_batch=10, reload_interval_s=60)
+        created = await create_price_alert(session, alert("above", 110))
+
+        await engine.start()
+        try:
+            engine.tick(created.catalog_id, 100)
+            engine.tick(created.catalog_id, 110)
+            for _ in range(100):
+                await asyncio.sleep(0.01)
+                if not await load_active_price_alerts(session):
+                    break
+        finally:
+            await engine.stop()
+
+        session.expire_all()
+        alerts = (await get_price_alerts_for_user(session, "testuser")).alerts
+        assert alerts[0].triggered_at is not None
+
+    @pytest.mark.asyncio
+    async def test_transactions_tick_only_when_enabled(self, new_test_coin, session, monkeypatch):
+        ticks = []
+        monkeypatch.setattr(price_alert_engine, "tick", lambda catalog_id, price: ticks.append((catalog_id, price)))
+        transaction_data = operation(buy=1, average_price=100)
+
+        monkeypatch.setattr(get_settings().alerts, "enabled", False)
+        await create_coin_transaction_endpoint(transaction_data, session)
+        assert ticks == []
+
+        monkeypatch.setattr(get_settings().alerts, "enabled", True)
+        await create_coin_transaction_endpoint(transaction_data, session)
+        assert ticks == [(BTC, 100)]
@@ -0,0 +1,172 @@
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import select, func
+from fastapi import HTTPException, status
+
+from tests.fixtures import session, new_test_user, new_test_coin, session_factory, router, operation
+from api.schemas import CoinActionSchema, UserActionSchema
+from api.database.models import UsersORM, CoinsORM, CoinTransactionsORM, CoinStatisticsORM
+from api.crud.users_crud import create_user, delete_user_by_username
+from api.crud.coins_crud import add_coin_for_user, delete_coin_for_user, get_all_coins_for_user
+from api.crud.coin_search_crud import coin_search_index
+from api.crud.statistics_crud import read_coin_statistics
+from api.crud.transactions_crud import process_coin_transaction
+from api.crud.purge_crud import delete_in_batches, purge_deleted
+from api.crud.export_crud import stream_export
+from api.crud.portfolio_crud import refresh_portfolio_snapshots, get_portfolio_chart
+from api.services.portfolio_analytics import PortfolioAnalytics
+from api.services.purge_worker import PurgeWorker
+
+BITCOIN = CoinActionSchema(username="testuser", coin_name="Bitcoin", coin_symbol="BTC")
+TEST_USER = UserActionSchema(username="testuser", email="test@example.com", password="StrongPassword12!")
+
+
+async def count(session, model) -> int:
+    return (await session.execute(select(func.count()).select_from(model))).scalar_one()
+
+
+async def add_transactions(session, number: int) -> None:
+    for _ in range(number):
+        await process_coin_transaction(session, operation(buy=1, average_price=10))
+
+
+class TestSoftDeleteCoin:
+
+    @pytest.mark.asyncio
+    async def test_deleted_coin_is_hidden(self, new_test_coin, session):
+        await add_transactions(session, 2)
+
+        await delete_coin_for_user(BITCOIN, session)
+
+        assert (await get_all_coins_for_user("testuser", session)).coins == []
+        assert await count(session, CoinTransactionsORM) == 2
+        with pytest.raises(HTTPException) as exc_info:
+            await read_coin_statistics(session, "testuser", "Bitcoin", "BTC")
+        assert exc_info.value.status_code == status.HTTP_404_NOT_FOUND
+
+    @pytest.mark.asyncio
+    async def test_deleted_coin_leaves_chart_analytics_and_export(self, new_test_user, new_test_coin, session, session_factory):
+        await add_transactions(session, 2)
+        today = date.today()
+        await refresh_portfolio_snapshots(session, today, positions=[(new_test_user.id, 1)])
+        analytics = PortfolioAnalytics(max_workers=1, cache_size=8)
+
+        try:
+            assert (await analytics.get(session, "testuser", today - timedelta(days=1), today)).end_value == 20
+
+            await delete_coin_for_user(BITCOIN, session)
+
+            # the cached analytics of the portfolio before the deletion are not reused
+            assert (await analytics.get(session, "testuser", today - timedelta(days=1), today)).end_value == 0
+        finally:
+            analytics.shutdown()
+
+        chart = await get_portfolio_chart(session, "testuser", today - timedelta(days=1), today, max_points=10)
+        assert chart.points == []
+        for table in ("transactions", "statistics"):
+            chunks = [chunk async for chunk in stream_export(session_factory, new_test_user.id, table, "ndjson", batch_size=10)]
+            assert b"".join(chunks) == b""
+
+    @pytest.mark.asyncio
+    async def test_coin_can_be_added_again(self, new_test_coin, session):
+        await add_transactions(session, 1)
+        await delete_coin_for_user(BITCOIN, session)
+
+        await add_coin_for_user(BITCOIN, session)
+        await add_transactions(session, 1)
+
+        # the new coin starts with fresh statistics
+        statistics = await read_coin_statistics(session, "testuser", "Bitcoin", "BTC")
+        assert statistics.transactions_count == 1
+
+    @pytest.mark.asyncio
+    async def test_deleted_twice(self, new_test_coin, session):
+        await delete_coin_for_user(BITCOIN, session)
+
+        with pytest.raises(HTTPException) as exc_info:
+            await delete_coin_for_user(BITCOIN, session)
+        assert exc_info.value.status_code == status.HTTP_404_NOT_FOUND
+
+
+class TestSoftDeleteUser:
+
+    @pytest.mark.asyncio
+    async def test_user_can_register_again(self, new_test_coin, session):
+        await delete_user_by_username(TEST_USER, session)
+
+        user = await create_user(TEST_USER, session)
+
+        assert user.username == "testuser"
+        assert (await get_all_coins_for_user("testuser", session)).coins == []
+
+    @pytest.mark.asyncio
+    async def test_coins_leave_search_index(self, new_test_coin, session):
+        await delete_user_by_username(TEST_USER, session)
+
+        assert coin_search_index.search("bit")[0].holders == 0
+
+
+class TestPurge:
+
+    @pytest.mark.asyncio
+    async def test_delete_in_batches(self, new_test_coin, session):
+        await add_transactions(session, 5)
+
+        deleted = await delete_in_batches(
+            session, CoinTransactionsORM, CoinTransactionsORM.buy > 0, batch_size=2, pause_s=0
+        )
+
+        assert deleted == 5
+        assert await count(session, CoinTransactionsORM) == 0
+
+    @pytest.mark.asyncio
+    async def test_purge_deleted_coin(self, new_test_coin, session):
+        await add_transactions(session, 3)
+        await delete_coin_for_user(BITCOIN, session)
+
+        assert await purge_deleted(session, batch_size=2, pause_s=0) == (1, 0)
+
+        assert await count(session, CoinsORM) == 0
+        assert await count(session, CoinTransactionsORM) == 0
+        assert await count(session, CoinStatisticsORM) == 0
+        assert await count(session, UsersORM) == 1
+
+    @pytest.mark.asyncio
+    async def test_purge_deleted_user(self, new_test_coin, session):
+        await add_transactions(session, 3)
+        await delete_user_by_username(TEST_USER, session)
+
+        assert await purge_deleted(session, batch_size=2, pause_s=0) == (1, 1)
+
+        assert await count(session, UsersORM) == 0
+        assert await count(session, CoinTransactionsORM) == 0
+
+    @pytest.mark.asyncio
+    async def test_nothing_to_purge(self, new_test_coin, session):
+        await add_transactions(session, 1)
+
+        assert await purge_deleted(session, batch_size=2, pause_s=0) == (0, 0)
+        assert await count(session, CoinTransactionsORM) == 1
+
+
+class TestPurgeWorker:
+
+    @pytest.mark.asyncio
+    async def test_purges_every_shard(self, router):
+        for shard in (0, 1):
+            username = next(f"user{index}" for index in range(1000) if router.shard_for(f"user{index}") == shard)
+            user_data = UserActionSchema(username=username, email=f"{username}@example.com", password="StrongPassword12!")
+            async with router.session_factory_for(username)() as session:
+                await create_user(user_data, session)
+                await delete_user_by_username(user_data, session)
+        worker = PurgeWorker(batch_size=100, pause_s=0, interval_s=60)
+
+        try:
+            assert await worker.run_once() == (0, 2)
+        finally:
+            await worker.leader_lock.release()
+
+        for helper in router.helpers:
+            async with helper.async_session_factory() as session:
+                assert await count(session, UsersORM) == 0
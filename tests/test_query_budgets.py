@@ -0,0 +1,145 @@
+"""
+Round-trip budgets of the CRUD functions; raise a budget only together with the change that needs it.
+"""
+
+import pytest
+
+from tests.fixtures import session, new_test_user, new_test_coin, operation
+from tests.query_counter import assert_max_queries, count_queries
+from api.schemas import (
+    UserActionSchema,
+    CoinActionSchema,
+    BulkCoinActionSchema,
+)
+from api.crud.users_crud import create_user, read_all_users, read_user_by_username, delete_user_by_username
+from api.crud.coins_crud import (
+    add_coin_for_user,
+    get_all_coins_for_user,
+    delete_coin_for_user,
+    add_coins_for_user,
+    delete_coins_for_user,
+)
+from api.crud.coin_search_crud import search_coins
+from api.crud.statistics_crud import read_coin_statistics
+from api.crud.transactions_crud import process_coin_transaction
+
+BITCOIN_OPERATION = operation(buy=1, average_price=100)
+
+
+def bulk(*symbols: str) -> BulkCoinActionSchema:
+    return BulkCoinActionSchema(
+        username="testuser", coins=[{"coin_name": f"Coin {symbol}", "coin_symbol": symbol} for symbol in symbols]
+    )
+
+
+class TestQueryCounter:
+
+    @pytest.mark.asyncio
+    async def test_budget_exceeded_lists_sql(self, new_test_user, session):
+        with pytest.raises(AssertionError) as exc_info:
+            with assert_max_queries(session, 0):
+                await read_user_by_username("testuser", session)
+
+        assert "FROM users" in str(exc_info.value)
+
+
+class TestUsersQueryBudgets:
+
+    @pytest.mark.asyncio
+    async def test_create_user(self, session):
+        with assert_max_queries(session, 1):
+            await create_user(UserActionSchema(username="alice", email="alice@example.com", password="StrongPassword12!"), session)
+
+    @pytest.mark.asyncio
+    async def test_read_user(self, new_test_user, session):
+        with assert_max_queries(session, 1):
+            await read_user_by_username("testuser", session)
+
+    @pytest.mark.asyncio
+    async def test_read_all_users_is_one_query(self, session):
+        for index in range(5):
+            await create_user(
+                UserActionSchema(username=f"user{index}", email=f"user{index}@example.com", password="StrongPassword12!"),
+                session,
+            )
+
+        with assert_max_queries(session, 1):
+            await read_all_users(session)
+
+    @pytest.mark.asyncio
+    async def test_delete_user(self, new_test_user, session):
+        user_data = UserActionSchema(username="testuser", email="test@example.com", password="StrongPassword12!")
+
+        with count_queries(session) as counter:
+            await delete_user_by_username(user_data, session)
+
+        # the lookup and marking the user and their coins as deleted; dependent rows are purged later
+        assert len(counter) == 3, counter.report()
+
+
+class TestCoinsQueryBudgets:
+
+    @pytest.mark.asyncio
+    async def test_add_new_catalog_coin(self, new_test_user, session):
+        # user, catalog lookup, catalog insert, catalog re-read, coin insert
+        with assert_max_queries(session, 5):
+            await add_coin_for_user(CoinActionSchema(username="testuser", coin_name="Bitcoin", coin_symbol="BTC"), session)
+
+    @pytest.mark.asyncio
+    async def test_add_cached_catalog_coin(self, new_test_coin, session):
+        await delete_coin_for_user(CoinActionSchema(username="testuser", coin_name="Bitcoin", coin_symbol="BTC"), session)
+
+        with assert_max_queries(session, 2):
+            await add_coin_for_user(CoinActionSchema(username="testuser", coin_name="Bitcoin", coin_symbol="BTC"), session)
+
+    @pytest.mark.asyncio
+    async def test_get_all_coins_is_one_query(self, new_test_user, session):
+        await add_coins_for_user(bulk("AAA", "BBB", "CCC", "DDD"), session)
+
+        with assert_max_queries(session, 1):
+            await get_all_coins_for_user(username="testuser", session=session)
+
+    @pytest.mark.asyncio
+    async def test_delete_coin(self, new_test_coin, session):
+        with assert_max_queries(session, 1):
+            await delete_coin_for_user(CoinActionSchema(username="testuser", coin_name="Bitcoin", coin_symbol="BTC"), session)
+
+    @pytest.mark.asyncio
+    async def test_bulk_add_does_not_grow_with_coins(self, new_test_user, session):
+        with assert_max_queries(session, 5):
+            await add_coins_for_user(bulk(*(f"C{index}" for index in range(20))), session)
+
+    @pytest.mark.asyncio
+    async def test_bulk_delete(self, new_test_user, session):
+        await add_coins_for_user(bulk("AAA", "BBB", "CCC"), session)
+
+        with assert_max_queries(session, 1):
+            await delete_coins_for_user(bulk("AAA", "BBB", "CCC"), session)
+
+    @pytest.mark.asyncio
+    async def test_search_does_not_query(self, new_test_coin, session):
+        with assert_max_queries(session, 0):
+            await search_coins(session, "bit")
+
+
+class TestTransactionsQueryBudgets:
+
+    @pytest.mark.asyncio
+    async def test_first_transaction(self, new_test_coin, session):
+        # coin, statistics row, statistics insert, transaction insert
+        with assert_max_queries(session, 4):
+            await process_coin_transaction(session, BITCOIN_OPERATION)
+
+    @pytest.mark.asyncio
+    async def test_next_transaction(self, new_test_coin, session):
+        await process_coin_transaction(session, BITCOIN_OPERATION)
+
+        with assert_max_queries(session, 4):
+            await process_coin_transaction(session, BITCOIN_OPERATION)
+
+    @pytest.mark.asyncio
+    async def test_read_statistics(self, new_test_coin, session):
+        await process_coin_transaction(session, BITCOIN_OPERATION)
+
+        with assert_max_queries(session, 1):
+            await read_coin_statistics(session, "testuser", "Bitcoin", "BTC")
@@ -0,0 +1,127 @@
+import httpx
+import pytest
+from fastapi import FastAPI
+from pydantic import BaseModel
+
+from api.config import RateLimitConfig, RateLimitRule
+from api.middlewares.rate_limit import InMemoryBackend, RateLimitMiddleware
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class UsernameBody(BaseModel):
+    username: str
+
+
+def make_app(config: RateLimitConfig) -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(RateLimitMiddleware, config=config, backend=InMemoryBackend())
+
+    @app.get("/users/{username}")
+    async def read_user(username: str):
+        return {"username": username}
+
+    @app.post("/coins/")
+    async def add_coin(body: UsernameBody):
+        return body
+
+    return app
+
+
+def client_for(app: FastAPI) -> httpx.AsyncClient:
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+
+
+class TestInMemoryBackend:
+
+    @pytest.mark.asyncio
+    async def test_burst_then_refill(self):
+        clock = FakeClock()
+        backend = InMemoryBackend(clock=clock)
+
+        assert [await backend.acquire("user", rate=2, burst=3) for _ in range(3)] == [0, 0, 0]
+        assert await backend.acquire("user", rate=2, burst=3) == pytest.approx(0.5)
+
+        clock.now = 0.5
+        assert await backend.acquire("user", rate=2, burst=3) == 0
+
+    @pytest.mark.asyncio
+    async def test_buckets_are_per_key(self):
+        backend = InMemoryBackend(clock=FakeClock())
+
+        assert await backend.acquire("alice", rate=1, burst=1) == 0
+        assert await backend.acquire("alice", rate=1, burst=1) > 0
+        assert await backend.acquire("bob", rate=1, burst=1) == 0
+
+    @pytest.mark.asyncio
+    async def test_least_recently_used_buckets_dropped(self):
+        backend = InMemoryBackend(max_keys=2, clock=FakeClock())
+
+        for key in ("a", "b", "c"):
+            await backend.acquire(key, rate=1, burst=1)
+
+        # "a" was dropped and starts with a full bucket again
+        assert await backend.acquire("a", rate=1, burst=1) == 0
+        assert await backend.acquire("c", rate=1, burst=1) > 0
+
+
+class TestRateLimitMiddleware:
+
+    @pytest.mark.asyncio
+    async def test_user_limit_from_path(self):
+        app = make_app(RateLimitConfig(user_rate=0.1, user_burst=2, routes={}))
+
+        async with client_for(app) as client:
+            statuses = [(await client.get("/users/alice")).status_code for _ in range(3)]
+            other = await client.get("/users/bob")
+            limited = await client.get("/users/alice")
+
+        assert statuses == [200, 200, 429]
+        assert other.status_code == 200
+        assert limited.headers["Retry-After"] == "10"
+
+    @pytest.mark.asyncio
+    async def test_username_case_and_spaces_share_a_bucket(self):
+        app = make_app(RateLimitConfig(user_rate=0.1, user_burst=2, routes={}))
+
+        async with client_for(app) as client:
+            statuses = [
+                (await client.get("/users/alice")).status_code,
+                (await client.get("/users/Alice")).status_code,
+                (await client.post("/coins/", json={"username": " ALICE "})).status_code,
+            ]
+
+        assert statuses == [200, 200, 429]
+
+    @pytest.mark.asyncio
+    async def test_route_limit_from_body(self):
+        config = RateLimitConfig(user_rate=100, user_burst=100, routes={"POST /coins/": RateLimitRule(rate=0.1, burst=1)})
+        app = make_app(config)
+
+        async with client_for(app) as client:
+            first = await client.post("/coins/", json={"username": "alice"})
+            second = await client.post("/coins/", json={"username": "alice"})
+            other_user = await client.post("/coins/", json={"username": "bob"})
+            other_route = await client.get("/users/alice")
+
+        # the body is still readable by the endpoint after the middleware looked at it
+        assert first.status_code == 200 and first.json() == {"username": "alice"}
+        assert second.status_code == 429
+        assert other_user.status_code == 200
+        assert other_route.status_code == 200
+
+    @pytest.mark.asyncio
+    async def test_disabled(self):
+        app = make_app(RateLimitConfig(enabled=False, user_rate=0.1, user_burst=1))
+
+        async with client_for(app) as client:
+            statuses = [(await client.get("/users/alice")).status_code for _ in range(3)]
+
+        assert statuses == [200, 200, 200]
@@ -0,0 +1,115 @@
+import httpx
+import pytest
+from fastapi import APIRouter, Depends, FastAPI, HTTPException, status
+from sqlalchemy import select
+
+from tests.fixtures import router
+from api.schemas import UserActionSchema, CoinActionSchema
+from api.database.models import CoinCatalogORM
+from api.database.lazy_session import SessionReleasingRoute
+from api.database.shard_router import ConsistentHashRing, ShardRouter
+from api.crud.users_crud import create_user, read_all_users, merge_user_lists, delete_user_by_username
+from api.crud.coins_crud import add_coin_for_user
+
+
+def usernames_on(router: ShardRouter, shard: int, count: int) -> list[str]:
+    usernames = (f"user{index}" for index in range(1000))
+    return [username for username in usernames if router.shard_for(username) == shard][:count]
+
+
+async def add_user(router: ShardRouter, username: str) -> None:
+    async with router.session_factory_for(username)() as session:
+        await create_user(
+            UserActionSchema(username=username, email=f"{username}@example.com", password="StrongPassword12!"), session
+        )
+
+
+class TestConsistentHashRing:
+
+    def test_keys_spread_over_shards(self):
+        ring = ConsistentHashRing(4)
+        counts = [0] * 4
+        for index in range(4000):
+            counts[ring.shard_for(f"user{index}")] += 1
+
+        assert all(700 < count < 1300 for count in counts)
+
+    def test_new_shard_only_takes_keys(self):
+        before, after = ConsistentHashRing(4), ConsistentHashRing(5)
+        keys = [f"user{index}" for index in range(4000)]
+
+        moved = [key for key in keys if before.shard_for(key) != after.shard_for(key)]
+
+        assert all(after.shard_for(key) == 4 for key in moved)
+        assert len(moved) < len(keys) / 3
+
+
+class TestShardRouter:
+
+    @pytest.mark.asyncio
+    async def test_fan_out_reads_every_shard(self, router):
+        first, second = usernames_on(router, 0, 1)[0], usernames_on(router, 1, 1)[0]
+        await add_user(router, first)
+        await add_user(router, second)
+
+        async with router.session_factory_for(first)() as session:
+            assert [user.username for user in (await read_all_users(session)).users] == [first]
+
+        users = merge_user_lists(await router.fan_out(read_all_users))
+        assert sorted(user.username for user in users.users) == sorted([first, second])
+
+    @pytest.mark.asyncio
+    async def test_request_session_on_user_shard(self, router):
+        username = usernames_on(router, 1, 1)[0]
+        api_router = APIRouter(route_class=SessionReleasingRoute)
+
+        @api_router.get("/{username}")
+        async def which_shard(username: str, session=Depends(router.session_getter)):
+            return {"primary": router.is_primary(session)}
+
+        @api_router.post("/")
+        async def which_shard_from_body(user: dict, session=Depends(router.session_getter)):
+            return {"primary": router.is_primary(session)}
+
+        app = FastAPI()
+        app.include_router(api_router)
+
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            by_path = await client.get(f"/{username.upper()}")
+            by_body = await client.post("/", json={"username": username})
+
+        assert by_path.json() == {"primary": False}
+        assert by_body.json() == {"primary": False}
+
+    @pytest.mark.asyncio
+    async def test_catalog_ids_shared_across_shards(self, router):
+        username = usernames_on(router, 1, 1)[0]
+        await add_user(router, username)
+
+        async with router.session_factory_for(username)() as session:
+            await add_coin_for_user(CoinActionSchema(username=username, coin_name="Bitcoin", coin_symbol="BTC"), session)
+            shard_catalog = (await session.execute(select(CoinCatalogORM.id, CoinCatalogORM.name))).all()
+
+        async with router.primary.async_session_factory() as session:
+            primary_catalog = (await session.execute(select(CoinCatalogORM.id, CoinCatalogORM.name))).all()
+
+        assert shard_catalog == primary_catalog == [(1, "Bitcoin")]
+
+    @pytest.mark.asyncio
+    async def test_emails_are_unique_across_shards(self, router):
+        first, second = usernames_on(router, 0, 1)[0], usernames_on(router, 1, 1)[0]
+        first_user = UserActionSchema(username=first, email="shared@example.com", password="StrongPassword12!")
+        second_user = UserActionSchema(username=second, email="shared@example.com", password="StrongPassword12!")
+        async with router.session_factory_for(first)() as session:
+            await create_user(first_user, session)
+
+        async with router.session_factory_for(second)() as session:
+            with pytest.raises(HTTPException) as exc_info:
+                await create_user(second_user, session)
+        assert exc_info.value.status_code == status.HTTP_409_CONFLICT
+
+        # the email is free again once its user is deleted
+        async with router.session_factory_for(first)() as session:
+            await delete_user_by_username(first_user, session)
+        async with router.session_factory_for(second)() as session:
+            assert (await create_user(second_user, session)).username == second
@@ -0,0 +1,95 @@
+import httpx
+import pytest
+from fastapi import FastAPI
+from sqlalchemy import select, text
+
+from tests.fixtures import session, new_test_user
+from api.config import SlowQueryConfig, get_settings
+from api.crud.users_crud import read_user_by_username
+from api.database.slow_queries import SlowQueryLog, slow_query_log, is_select
+from api.views.admin_views import router as admin_router
+
+
+def make_log(environment: str = "development", **config) -> SlowQueryLog:
+    config = {"threshold_ms": 0, "explain_sample_ratio": 1.0} | config
+    return SlowQueryLog(SlowQueryConfig(**config), environment=environment, sample=lambda: 0.0)
+
+
+class TestSlowQueryLog:
+
+    @pytest.mark.asyncio
+    async def test_records_statement_parameters_and_caller(self, new_test_user, session):
+        log = make_log()
+        log.install()
+        try:
+            await read_user_by_username("testuser", session)
+        finally:
+            log.uninstall()
+
+        [record] = log.recent()
+        assert record.statement.lstrip().startswith("SELECT")
+        assert "testuser" in record.parameters
+        assert record.caller == "api.crud.users_crud.read_user_by_username"
+        assert record.duration_ms >= 0
+        # SQLite plans come from EXPLAIN QUERY PLAN
+        assert "users" in record.plan
+
+    @pytest.mark.asyncio
+    async def test_statements_under_the_threshold_are_ignored(self, session):
+        log = make_log(threshold_ms=60_000)
+        log.install()
+        try:
+            await session.execute(select(1))
+        finally:
+            log.uninstall()
+
+        assert log.recent() == []
+
+    @pytest.mark.asyncio
+    async def test_buffer_keeps_the_newest(self, session):
+        log = make_log(buffer_size=2, explain_sample_ratio=0)
+        log.install()
+        try:
+            for number in range(3):
+                await session.execute(text("SELECT :number"), {"number": number})
+        finally:
+            log.uninstall()
+
+        assert [record.parameters for record in log.recent()] == ["(2,)", "(1,)"]
+        assert log.recent()[0].plan is None
+
+    @pytest.mark.asyncio
+    async def test_never_explains_in_production_or_writes(self, session):
+        log = make_log(environment="production")
+        log.install()
+        try:
+            await session.execute(select(1))
+        finally:
+            log.uninstall()
+
+        assert log.recent()[0].plan is None
+        assert is_select("  select 1")
+        assert not is_select("WITH deleted AS (DELETE FROM users RETURNING id) SELECT * FROM deleted")
+        assert not is_select("UPDATE users SET email = ''")
+
+
+class TestSlowQueriesEndpoint:
+
+    @pytest.mark.asyncio
+    async def test_requires_the_admin_token(self, monkeypatch):
+        app = FastAPI()
+        app.include_router(admin_router, prefix="/admin")
+        transport = httpx.ASGITransport(app=app)
+
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            monkeypatch.setattr(get_settings().slow_queries, "admin_token", None)
+            assert (await client.get("/admin/slow-queries")).status_code == 404
+
+            monkeypatch.setattr(get_settings().slow_queries, "admin_token", "secret")
+            assert (await client.get("/admin/slow-queries", headers={"X-Admin-Token": "wrong"})).status_code == 403
+
+            response = await client.get("/admin/slow-queries", headers={"X-Admin-Token": "secret"})
+
+        assert response.status_code == 200
+        assert response.json()["threshold_ms"] == slow_query_log.config.threshold_ms
+        assert isinstance(response.json()["queries"], list)
@@ -0,0 +1,117 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from fastapi import HTTPException, status
+
+from tests.fixtures import session, new_test_user, new_test_coin, operation
+from api.config import get_settings
+from api.database.models import CoinStatisticsORM
+from api.crud.transactions_crud import process_coin_transaction
+from api.crud.statistics_crud import read_coin_statistics, merge_statistics_shards, merge_idle_statistics_shards
+from api.crud.leaderboard_crud import coin_leaderboards
+
+
+@pytest.fixture
+def sharded_test_user(monkeypatch):
+    statistics_settings = get_settings().statistics
+    monkeypatch.setattr(statistics_settings, "sharded_user_ids", {1})
+    monkeypatch.setattr(statistics_settings, "shards", 4)
+
+
+async def write_transactions(session):
+    for _ in range(20):
+        await process_coin_transaction(session, operation(buy=1, paid=10))
+    await process_coin_transaction(session, operation(sell=4, paid=60))
+
+
+async def statistics_rows(session) -> list[CoinStatisticsORM]:
+    return (await session.execute(select(CoinStatisticsORM).order_by(CoinStatisticsORM.shard))).scalars().all()
+
+
+class TestReadCoinStatistics:
+
+    @pytest.mark.asyncio
+    async def test_read_single_row(self, new_test_coin, session):
+        await write_transactions(session)
+
+        result = await read_coin_statistics(session, "testuser", "Bitcoin", "BTC")
+
+        assert len(await statistics_rows(session)) == 1
+        assert result.buy_total == 20
+        assert result.invested_avg == 10
+        assert result.realized_avg == 15
+        assert result.holdings == 16
+        assert result.transactions_count == 21
+
+    @pytest.mark.asyncio
+    async def test_read_sums_shards(self, sharded_test_user, new_test_coin, session):
+        await write_transactions(session)
+
+        result = await read_coin_statistics(session, "testuser", "Bitcoin", "BTC")
+
+        assert len(await statistics_rows(session)) > 1
+        assert result.buy_total == 20
+        assert result.invested_total == 200
+        assert result.invested_avg == 10
+        assert result.realized_avg == 15
+        assert result.holdings == 16
+        assert result.transactions_count == 21
+
+    @pytest.mark.asyncio
+    async def test_read_not_found(self, new_test_coin, session):
+        with pytest.raises(HTTPException) as exc_info:
+            await read_coin_statistics(session, "testuser", "Bitcoin", "BTC")
+
+        assert exc_info.value.status_code == status.HTTP_404_NOT_FOUND
+
+
+class TestMergeStatisticsShards:
+
+    @pytest.mark.asyncio
+    async def test_merge_into_single_row(self, sharded_test_user, new_test_coin, session):
+        await write_transactions(session)
+        before = await read_coin_statistics(session, "testuser", "Bitcoin", "BTC")
+
+        assert await merge_statistics_shards(session, user_id=1, coin_id=1)
+        await session.commit()
+
+        rows = await statistics_rows(session)
+        assert len(rows) == 1
+        assert rows[0].shard == 0
+        assert rows[0].invested_avg == 10
+        after = await read_coin_statistics(session, "testuser", "Bitcoin", "BTC")
+        assert after.model_dump(exclude={"updated_at"}) == before.model_dump(exclude={"updated_at"})
+
+    @pytest.mark.asyncio
+    async def test_merge_nothing_to_do(self, new_test_coin, session):
+        await write_transactions(session)
+
+        assert not await merge_statistics_shards(session, user_id=1, coin_id=1)
+
+    @pytest.mark.asyncio
+    async def test_merge_only_idle_positions(self, sharded_test_user, new_test_coin, session):
+        await write_transactions(session)
+
+        assert await merge_idle_statistics_shards(session, idle_seconds=3600) == 0
+
+        await session.execute(update(CoinStatisticsORM).values(updated_at=datetime(2024, 1, 1)))
+        await session.commit()
+
+        assert await merge_idle_statistics_shards(session, idle_seconds=3600) == 1
+        assert len(await statistics_rows(session)) == 1
+
+
+class TestShardedPositionHoldings:
+
+    @pytest.mark.asyncio
+    async def test_leaderboard_sums_shards_without_autoflush(self, sharded_test_user, new_test_coin, session):
+        # the application sessions are built with autoflush=False
+        session_factory = async_sessionmaker(session.bind, autoflush=False, expire_on_commit=False, class_=AsyncSession)
+        async with session_factory() as application_session:
+            await process_coin_transaction(application_session, operation(buy=2, paid=10))
+            await process_coin_transaction(application_session, operation(buy=1, paid=10))
+
+        # Bitcoin is the first coin of the catalog
+        assert coin_leaderboards.top(1) == (1, [("testuser", 3.0)])
@@ -0,0 +1,144 @@
+import orjson
+import httpx
+import pytest
+import pytest_asyncio
+from fastapi import FastAPI
+
+from tests.fixtures import session, new_test_user, new_test_coin, operation
+from api.config import TracingConfig
+from api.database.sql_tracing import sql_tracing
+from api.middlewares.tracing import TracingMiddleware
+from api.crud.transactions_crud import process_coin_transaction
+from api.services.tracing import tracer, Tracer, FileSpanExporter, InMemorySpanExporter, parse_traceparent
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+
+
+@pytest_asyncio.fixture
+async def exported():
+    """Trace every request with the module tracer into memory and the SQL listeners installed."""
+
+    config, exporter = tracer.config, tracer.exporter
+    tracer.config = TracingConfig(enabled=True, sample_ratio=1.0)
+    tracer.exporter = InMemorySpanExporter()
+    sql_tracing.install()
+    try:
+        yield tracer.exporter
+    finally:
+        sql_tracing.uninstall()
+        tracer.finished.clear()
+        tracer.config, tracer.exporter = config, exporter
+
+
+class TestTracer:
+
+    def test_parse_traceparent(self):
+        assert parse_traceparent(f"00-{TRACE_ID}-00f067aa0ba902b7-01") == (TRACE_ID, "00f067aa0ba902b7", True)
+        assert parse_traceparent(f"00-{TRACE_ID}-00f067aa0ba902b7-00")[2] is False
+        assert parse_traceparent("00-abc-def-01") is None
+        assert parse_traceparent(None) is None
+
+    def test_sampling_is_decided_at_the_root(self):
+        sampled = Tracer(TracingConfig(enabled=True, sample_ratio=0.5), InMemorySpanExporter(), sample=lambda: 0.7)
+
+        with sampled.root_span("GET /") as root:
+            assert root is None
+            with sampled.span("child") as child:
+                assert child is None
+        assert not sampled.finished
+
+        # an upstream service that sampled the trace wins over the local ratio
+        with sampled.root_span("GET /", traceparent=f"00-{TRACE_ID}-00f067aa0ba902b7-01") as root:
+            with sampled.span("child") as child:
+                assert child.trace_id == TRACE_ID
+                assert child.parent_id == root.span_id
+        assert [span.name for span in sampled.finished] == ["child", "GET /"]
+        assert sampled.finished[1].parent_id == "00f067aa0ba902b7"
+
+    def test_disabled_tracer_records_nothing(self):
+        disabled = Tracer(TracingConfig(enabled=False, sample_ratio=1.0), InMemorySpanExporter())
+
+        with disabled.root_span("GET /") as root:
+            assert root is None
+
+    def test_full_queue_drops_spans(self):
+        small = Tracer(TracingConfig(enabled=True, sample_ratio=1.0, queue_size=2), InMemorySpanExporter())
+
+        with small.root_span("GET /"):
+            for _ in range(3):
+                with small.span("child"):
+                    pass
+
+        assert len(small.finished) == 2
+        assert small.dropped == 2
+
+    @pytest.mark.asyncio
+    async def test_file_exporter_writes_otlp_json(self, tmp_path):
+        path = tmp_path / "traces.jsonl"
+        file_tracer = Tracer(TracingConfig(enabled=True, sample_ratio=1.0, export_batch=2), FileSpanExporter(str(path), "test"))
+
+        with file_tracer.root_span("GET /", {"http.method": "GET"}):
+            with file_tracer.span("child", {"rows": 3}):
+                pass
+
+        assert await file_tracer.export_once() == 2
+        document = orjson.loads(path.read_bytes().splitlines()[0])
+        resource_spans = document["resourceSpans"][0]
+        assert resource_spans["resource"]["attributes"][0]["value"] == {"stringValue": "test"}
+        spans = resource_spans["scopeSpans"][0]["spans"]
+        assert [span["name"] for span in spans] == ["child", "GET /"]
+        assert spans[0]["attributes"] == [{"key": "rows", "value": {"intValue": "3"}}]
+        assert spans[0]["parentSpanId"] == spans[1]["spanId"]
+
+
+class TestTransactionSpans:
+
+    @pytest.mark.asyncio
+    async def test_steps_statements_and_commit_are_traced(self, new_test_coin, session, exported):
+        with tracer.root_span("POST /transactions/") as root:
+            await process_coin_transaction(session, operation(buy=1, paid=10))
+        await tracer.export_once()
+
+        spans = {span.name: span for span in exported.spans}
+        process = spans["transactions_crud.process_coin_transaction"]
+        assert process.parent_id == root.span_id
+        assert process.attributes == {"enduser.id": "testuser", "coin.symbol": "BTC"}
+        for step in ("new_transaction_record", "update_coin_statistics"):
+            assert spans[f"transactions_crud.{step}"].parent_id == process.span_id
+        # the coin lookup is a step of building the transaction record
+        assert spans["transactions_crud.get_coin_or_raise_error"].parent_id == spans["transactions_crud.new_transaction_record"].span_id
+        assert spans["transactions_crud.get_coin_or_raise_error"].attributes["coin.name"] == "Bitcoin"
+
+        statements = [span for span in exported.spans if span.name.startswith("db ")]
+        assert {span.attributes["db.operation"] for span in statements} >= {"SELECT", "INSERT"}
+        assert all(span.trace_id == root.trace_id for span in statements)
+        assert "db.commit" in spans
+        assert spans["db.pool.checkout"].trace_id == root.trace_id
+
+    @pytest.mark.asyncio
+    async def test_untraced_requests_create_no_spans(self, new_test_coin, session, exported):
+        await process_coin_transaction(session, operation(buy=1, paid=10))
+
+        assert not tracer.finished
+
+
+class TestTracingMiddleware:
+
+    @pytest.mark.asyncio
+    async def test_root_span_is_named_after_the_route(self, exported):
+        app = FastAPI()
+        app.add_middleware(TracingMiddleware)
+
+        @app.get("/users/{username}")
+        async def read_user(username: str):
+            return {}
+
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            response = await client.get("/users/alice")
+        await tracer.export_once()
+
+        assert response.status_code == 200
+        [root] = exported.spans
+        assert root.name == "GET /users/{username}"
+        assert root.attributes["http.status_code"] == 200
+        assert root.attributes["enduser.id"] == "alice"
@@ -0,0 +1,103 @@
+import asyncio
+
+import pytest
+from sqlalchemy import select
+from fastapi import HTTPException
+
+from tests.fixtures import session, session_factory, new_test_user, new_test_coin, router, operation
+from api.schemas import UserActionSchema, CoinActionSchema
+from api.database.models import CoinStatisticsORM
+from api.crud.users_crud import create_user
+from api.crud import transactions_crud
+from api.crud.coins_crud import add_coin_for_user
+from api.services.transactions_coalescer import TransactionsCoalescer
+
+
+class CountingSessionFactory:
+    def __init__(self, session_factory):
+        self.session_factory = session_factory
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return self.session_factory()
+
+
+class TestTransactionsCoalescer:
+
+    def test_disabled_with_zero_window(self):
+        assert not TransactionsCoalescer(window_ms=0, max_batch=10).enabled
+
+    @pytest.mark.asyncio
+    async def test_concurrent_transactions_share_one_commit(self, new_test_coin, session, session_factory):
+        factory = CountingSessionFactory(session_factory)
+        coalescer = TransactionsCoalescer(session_factory=factory, window_ms=20, max_batch=100)
+
+        await asyncio.gather(*(coalescer.submit(operation(buy=1, paid=10)) for _ in range(10)))
+
+        assert factory.calls == 1
+        statistics = (await session.execute(select(CoinStatisticsORM))).scalar_one()
+        assert statistics.buy_total == 10
+        assert statistics.transactions_count == 10
+
+    @pytest.mark.asyncio
+    async def test_full_batch_is_written_without_waiting(self, new_test_coin, session_factory):
+        factory = CountingSessionFactory(session_factory)
+        coalescer = TransactionsCoalescer(session_factory=factory, window_ms=60_000, max_batch=3)
+
+        await asyncio.wait_for(
+            asyncio.gather(*(coalescer.submit(operation(buy=1, paid=10)) for _ in range(3))),
+            timeout=5,
+        )
+
+        assert factory.calls == 1
+
+    @pytest.mark.asyncio
+    async def test_error_is_delivered_to_every_request(self, new_test_user, session_factory):
+        coalescer = TransactionsCoalescer(session_factory=session_factory, window_ms=20, max_batch=100)
+
+        results = await asyncio.gather(
+            *(coalescer.submit(operation(buy=1, paid=10)) for _ in range(3)),
+            return_exceptions=True,
+        )
+
+        assert all(isinstance(result, HTTPException) and result.status_code == 404 for result in results)
+
+    @pytest.mark.asyncio
+    async def test_failing_transaction_does_not_fail_its_batch(self, new_test_coin, session, session_factory, monkeypatch):
+        apply_transaction = transactions_crud.apply_transaction_to_statistics
+
+        def reject_five(statistics_record, transaction):
+            if transaction.buy == 5:
+                raise ValueError("rejected")
+            return apply_transaction(statistics_record, transaction)
+
+        monkeypatch.setattr(transactions_crud, "apply_transaction_to_statistics", reject_five)
+        coalescer = TransactionsCoalescer(session_factory=session_factory, window_ms=20, max_batch=100)
+        await coalescer.submit(operation(buy=1, paid=10))
+
+        results = await asyncio.gather(
+            *(coalescer.submit(operation(buy=buy, paid=10)) for buy in (1, 5, 1)),
+            return_exceptions=True,
+        )
+
+        assert results[0] is None and results[2] is None
+        assert isinstance(results[1], HTTPException) and results[1].status_code == 500
+        statistics = (await session.execute(select(CoinStatisticsORM))).scalar_one()
+        assert statistics.buy_total == 3
+        assert statistics.transactions_count == 3
+
+    @pytest.mark.asyncio
+    async def test_batches_are_written_on_the_user_shard(self, router):
+        username = next(f"user{index}" for index in range(1000) if router.shard_for(f"user{index}") == 1)
+        async with router.session_factory_for(username)() as session:
+            await create_user(UserActionSchema(username=username, email="user@example.com", password="StrongPassword12!"), session)
+            await add_coin_for_user(CoinActionSchema(username=username, coin_name="Bitcoin", coin_symbol="BTC"), session)
+        coalescer = TransactionsCoalescer(window_ms=20, max_batch=100)
+
+        transaction_data = operation(username, buy=1, paid=10)
+        await asyncio.gather(*(coalescer.submit(transaction_data) for _ in range(3)))
+
+        async with router.session_factory_for(username)() as session:
+            statistics = (await session.execute(select(CoinStatisticsORM))).scalar_one()
+        assert statistics.transactions_count == 3
@@ -0,0 +1,109 @@
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import select, event, insert
+from fastapi import HTTPException, status
+
+from tests.fixtures import session, new_test_user, new_test_coin, operation
+from api.database.models import CoinStatisticsORM, CoinTransactionsORM
+from api.crud.transactions_crud import process_coin_transaction, process_coin_transactions_batch
+
+
+async def get_statistics(session) -> CoinStatisticsORM:
+    query = await session.execute(select(CoinStatisticsORM))
+    return query.scalar_one()
+
+
+class TestProcessCoinTransaction:
+
+    @pytest.mark.asyncio
+    async def test_first_transaction_creates_statistics(self, new_test_coin, session):
+        await process_coin_transaction(session, operation(buy=2, paid=100))
+
+        statistics = await get_statistics(session)
+        assert statistics.buy_total == 2
+        assert statistics.invested_total == 100
+        assert statistics.invested_avg == 50
+        assert statistics.holdings == 2
+        assert statistics.transactions_count == 1
+
+    @pytest.mark.asyncio
+    async def test_next_transaction_updates_statistics(self, new_test_coin, session):
+        await process_coin_transaction(session, operation(buy=2, paid=100))
+        await process_coin_transaction(session, operation(sell=1, paid=80))
+
+        statistics = await get_statistics(session)
+        assert statistics.holdings == 1
+        assert statistics.realized_total == 80
+        assert statistics.realized_avg == 80
+        assert statistics.transactions_count == 2
+
+    @pytest.mark.asyncio
+    async def test_concurrent_first_transaction(self, new_test_user, new_test_coin, session):
+        def insert_first(orm_execute_state):
+            # another transaction creates the statistics row between the lookup and the insert of this one
+            if orm_execute_state.is_insert and orm_execute_state.statement.table.name == "coin_statistics":
+                orm_execute_state.session.connection().execute(
+                    insert(CoinStatisticsORM).values(
+                        user_id=new_test_user.id, coin_id=1, buy_total=1, invested_total=50, invested_avg=50,
+                        holdings=1, transactions_count=1,
+                    )
+                )
+
+        event.listen(session.sync_session, "do_orm_execute", insert_first)
+        try:
+            await process_coin_transaction(session, operation(buy=2, paid=100))
+        finally:
+            event.remove(session.sync_session, "do_orm_execute", insert_first)
+
+        statistics = await get_statistics(session)
+        assert statistics.buy_total == 3
+        assert statistics.invested_total == 150
+        assert statistics.holdings == 3
+        assert statistics.transactions_count == 2
+
+    @pytest.mark.asyncio
+    async def test_coin_not_found(self, new_test_user, session):
+        with pytest.raises(HTTPException) as exc_info:
+            await process_coin_transaction(session, operation(buy=1, paid=10))
+
+        assert exc_info.value.status_code == status.HTTP_404_NOT_FOUND
+        assert "Coin 'Bitcoin' (BTC) not found for user 'testuser'." in str(exc_info.value.detail)
+
+
+class TestProcessCoinTransactionsBatch:
+
+    @pytest.mark.asyncio
+    async def test_batch_matches_sequential_processing(self, new_test_coin, session):
+        await process_coin_transactions_batch(
+            session,
+            [operation(buy=2, paid=100), operation(buy=2, paid=140), operation(sell=1, paid=90, fee=1)],
+        )
+
+        statistics = await get_statistics(session)
+        assert statistics.buy_total == 4
+        assert statistics.sell_total == 1
+        assert statistics.invested_total == 240
+        assert statistics.invested_avg == 60
+        assert statistics.holdings == 3
+        assert statistics.fee_total == 1
+        assert statistics.transactions_count == 3
+
+        transactions = (await session.execute(select(CoinTransactionsORM))).scalars().all()
+        assert len(transactions) == 3
+
+    @pytest.mark.asyncio
+    async def test_amounts_add_up_exactly(self, new_test_coin, session):
+        await process_coin_transaction(session, operation(buy=0.1, paid=0.1))
+        await process_coin_transactions_batch(session, [operation(buy=0.1, paid=0.1), operation(buy=0.1, paid=0.1)])
+
+        statistics = await get_statistics(session)
+        assert statistics.holdings == Decimal("0.3")
+        assert statistics.invested_total == Decimal("0.3")
+
+    @pytest.mark.asyncio
+    async def test_batch_coin_not_found(self, new_test_user, session):
+        with pytest.raises(HTTPException) as exc_info:
+            await process_coin_transactions_batch(session, [operation(buy=1, paid=10)])
+
+        assert exc_info.value.status_code == status.HTTP_404_NOT_FOUND
@@ -1,5 +1,7 @@
 import hashlib
+from datetime import datetime
 
+import orjson
 import pytest
 from sqlalchemy import select
 from fastapi import HTTPException
@@ -7,7 +9,15 @@ from fastapi import HTTPException
 from tests.fixtures import session
 from api.database.models import UsersORM
 from api.schemas import UserActionSchema
-from api.crud.users_crud import create_user, read_all_users, read_user_by_username, delete_user_by_username
+from api.crud.users_crud import (
+    create_user,
+    read_all_users,
+    read_user_by_username,
+    delete_user_by_username,
+    user_info,
+    read_users_version,
+)
+from api.views.responses import trusted_response
 
 
 class TestCreateUser:
@@ -104,10 +114,14 @@ class TestDeleteUserByUsername:
         assert result.username == user_data.username
         assert result.email == user_data.email
 
-        # Verify user no longer exists
+        # Verify user is marked as deleted and no longer readable
         query = await session.execute(select(UsersORM).where(UsersORM.username == user_data.username))
-        user = query.scalar_one_or_none()
-        assert user is None
+        user = query.scalar_one()
+        assert user.deleted_at is not None
+
+        with pytest.raises(HTTPException) as exc:
+            await read_user_by_username(user_data.username, session)
+        assert exc.value.status_code == 404
 
     @pytest.mark.asyncio
     async def test_delete_user_by_username_not_found(self, session):
@@ -121,3 +135,39 @@ class TestDeleteUserByUsername:
             exc.value.detail
             == "User with username 'nonexistent' and the provided email and password not found for deletion."
         )
+
+
+class TestReadUsersVersion:
+
+    @pytest.mark.asyncio
+    async def test_version_changes_on_create_and_delete(self, session):
+        first = UserActionSchema(username="first", email="first@example.com", password="StrongPassword12!")
+        second = UserActionSchema(username="second", email="second@example.com", password="StrongPassword12!")
+
+        empty = await read_users_version(session)
+        await create_user(first, session)
+        created = await read_users_version(session)
+        await create_user(second, session)
+        await delete_user_by_username(second, session)
+        # same number of users as before, but the list changed
+        replaced = await read_users_version(session)
+
+        assert len({empty, created, replaced}) == 3
+        assert created[0] == replaced[0] == 1
+        assert await read_users_version(session) == replaced
+
+
+class TestTrustedResponses:
+
+    def test_user_info_skips_validation(self):
+        stored_user = UsersORM(id=1, username="admin", email="legacy@example.com", registered_at=datetime(2026, 1, 1))
+
+        user = user_info(stored_user)
+
+        assert user.username == "admin"
+        assert orjson.loads(trusted_response(user).body) == {
+            "id": 1,
+            "username": "admin",
+            "email": "legacy@example.com",
+            "registered_at": "2026-01-01T00:00:00",
+        }